@@ -0,0 +1,274 @@
+# 调度结果的后处理：把 res 展平为一张按列存放的表，用 NumPy 分组/向量运算给出
+# 各车次偏移量、汇总指标、完整交路链与按 (车站, 股道) 排序的占用时间线
+#   python analysis.py [--data data] [--repeat 5] [--check]
+# 与 plan2.py 各统计单元的口径相同：
+# - 偏移量：最后一条记录无发车（到达终点）的车次，始发发车与终到到达相对理想时刻的偏移（跨日按 86400 取模）
+# - 交路链：由前车 -> 后车串成的完整链（链首为没有前车的车次；成环的交路从环上最小车次ID开始）
+# - 股道时间线：同 decompose.build_track_res，每条股道上的 (车次ID, 到达, 发车) 按到/发中较晚者排序，同时刻保持车次ID、站序顺序
+# 只依赖车次与交路信息的部分（理想时刻、交路链、交路跨日检查）在构造时计算；每次分析只展平 res 并做数组运算，
+# 可在搜索的每次迭代后运行。
+import gc
+import time
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+
+from network import NetworkIndex
+from scheduler import ResultRow
+
+
+# 展平的结果表：第 i 行为车次 tid[i] 在站序 rank[i] 的结果行；同一车次的行连续，车次按ID排序
+# starts[k]、starts[k + 1] 为第 k 个有结果的车次 train[k] 的行范围
+@dataclass
+class ScheduleTable:
+    tid: np.ndarray
+    rank: np.ndarray
+    sid: np.ndarray
+    slot: np.ndarray        # 股道槽位（未选股道且不在通过股道表中为 -1）
+    arrive: np.ndarray      # -999 表示无到达
+    depart: np.ndarray      # -999 表示无发车
+    train: np.ndarray
+    starts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.tid)
+
+
+# 各车次的偏移量（按车次ID索引，未到终点的车次为 0）
+@dataclass
+class Deviations:
+    finished: np.ndarray    # 是否到达终点
+    setoff: np.ndarray      # 始发发车偏移（实际 - 理想）
+    achieve: np.ndarray     # 终到到达偏移
+    total: np.ndarray       # |setoff| + |achieve|
+
+
+# 按股道槽位分段的占用时间线：槽位 s 的记录为下标 [offsets[s], offsets[s + 1])
+@dataclass
+class TrackTimelines:
+    offsets: np.ndarray
+    tid: np.ndarray
+    arrive: np.ndarray
+    depart: np.ndarray
+    net: NetworkIndex
+
+    def get(self, sid, track) -> list[tuple[int, int, int]]:
+        slot = self.net.slot_of.get((sid, track))
+        if slot is None:
+            return []
+        a, b = self.offsets[slot], self.offsets[slot + 1]
+        return list(zip(self.tid[a:b].tolist(), self.arrive[a:b].tolist(), self.depart[a:b].tolist()))
+
+    # 与 decompose.build_track_res 相同形式的字典：(车站ID, 股道名) -> [(车次ID, 到达, 发车)]
+    def as_dict(self) -> dict[tuple[int, str], list[tuple[int, int, int]]]:
+        net = self.net
+        rows = list(zip(self.tid.tolist(), self.arrive.tolist(), self.depart.tolist()))
+        offsets = self.offsets.tolist()
+        return {(net.track_station[s], net.track_names[s]): rows[offsets[s]:offsets[s + 1]]
+                for s in np.flatnonzero(np.diff(self.offsets)).tolist()}
+
+
+class ScheduleAnalysis:
+    def __init__(self, info, net: NetworkIndex) -> None:
+        self.checi = info['车次信息']
+        self.exchanges = info['交路信息']
+        self.pass_tracks = info['列车通过股道']
+        self.net = net
+        self.tids = sorted(self.checi)
+        # 股道槽位查找表：[车站ID, 股道名编号] -> 槽位，最后一列（编号 -1）对应未知股道名
+        self.track_ids: dict[str, int] = {}
+        for _, track in net.slot_of:
+            self.track_ids.setdefault(track, len(self.track_ids))
+        self.slot_table = np.full((max(net.track_station, default=0) + 1, len(self.track_ids) + 1), -1, dtype=np.int64)
+        for (sid, track), slot in net.slot_of.items():
+            self.slot_table[sid, self.track_ids[track]] = slot
+        n = max(self.checi, default=0) + 1
+        self.ideal_setoff = np.zeros(n, dtype=np.int64)
+        self.ideal_achieve = np.zeros(n, dtype=np.int64)
+        for tid, ts in self.checi.items():
+            self.ideal_setoff[tid] = ts.ideally_time_setoff
+            self.ideal_achieve[tid] = ts.ideally_time_achieve
+        # 交路：前车 -> 后车（只取两车都在车次信息中的交路）
+        prev = np.array([tid for tid, exchange in self.exchanges.items() if tid in self.checi and exchange[0] in self.checi],
+                        dtype=np.int64)
+        nxt = np.array([self.exchanges[tid][0] for tid in prev.tolist()], dtype=np.int64)
+        self.exchange_pairs = np.stack([prev, nxt], axis=1) if len(prev) else np.zeros((0, 2), dtype=np.int64)
+        # 交路跨日：前车理想到达晚于后车理想发车（后车对齐时加一天）
+        self.cross_day = self.exchange_pairs[self.ideal_achieve[prev] > self.ideal_setoff[nxt]] if len(prev) else self.exchange_pairs
+        self.chains = self._chains(prev, nxt, n)
+
+    # 完整交路链：沿前车指针倍增求各车次的链首与链内位置，再按 (链首, 位置) 排序后切分
+    @staticmethod
+    def _chains(prev: np.ndarray, nxt: np.ndarray, n: int) -> list[list[int]]:
+        if not len(prev):
+            return []
+        before = np.full(n, -1, dtype=np.int64)
+        before[nxt] = prev
+        members = np.union1d(prev, nxt)
+        p = np.where(before >= 0, before, np.arange(n))
+        depth = (before >= 0).astype(np.int64)
+        for _ in range(max(1, n.bit_length())):
+            if (p[p] == p).all():
+                break
+            depth = depth + depth[p]
+            p = p[p]
+        # 倍增后仍未到达链首（没有前车的车次）的车次在环上：从环上最小车次ID开始依次编号
+        on_cycle = members[before[p[members]] >= 0]
+        if len(on_cycle):
+            after = np.full(n, -1, dtype=np.int64)
+            after[prev] = nxt
+            seen = set()
+            for tid in on_cycle.tolist():
+                if tid in seen:
+                    continue
+                cycle = [tid]
+                k = after[tid]
+                while k != tid:
+                    cycle.append(int(k))
+                    k = after[k]
+                head = min(cycle)
+                i = cycle.index(head)
+                for d, k in enumerate(cycle[i:] + cycle[:i]):
+                    p[k] = head
+                    depth[k] = d
+                seen.update(cycle)
+        head = p[members]
+        order = np.lexsort((depth[members], head))
+        members, head = members[order], head[order]
+        cuts = np.flatnonzero(head[1:] != head[:-1]) + 1
+        return [chain.tolist() for chain in np.split(members, cuts)]
+
+    # 展平 res（与 Scheduler.res 相同形式）
+    # 结果行是分散在内存中的对象，每行一次读出全部字段，股道名经查找表转为槽位；
+    # 读出时新建大量元组，与 Scheduler.run() 相同，期间暂停分代 GC，避免反复扫描已加载的数据
+    def table(self, res: list[list[ResultRow]]) -> ScheduleTable:
+        train = [tid for tid in self.tids if res[tid]]
+        counts = np.array([len(res[tid]) for tid in train], dtype=np.int64)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            rows = [(r.station_id, r.track, r.achieve_time, r.setoff_time) for tid in train for r in res[tid]]
+        finally:
+            if gc_enabled:
+                gc.enable()
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        train = np.array(train, dtype=np.int64)
+        tid = np.repeat(train, counts)
+        if rows:
+            sids, tracks, arrive, depart = zip(*rows)
+        else:
+            sids = tracks = arrive = depart = ()
+        sid = np.array(sids, dtype=np.int64)
+        track_get = self.track_ids.get
+        slot = self.slot_table[sid, np.array([track_get(track, -1) for track in tracks], dtype=np.int64)] if rows \
+            else np.zeros(0, dtype=np.int64)
+        # 未选股道的记录（始发即失败）取通过股道表，与 plan2.py 的股道时间线相同
+        slot_get = self.net.slot_of.get
+        for i in np.flatnonzero(slot < 0).tolist():
+            track = self.pass_tracks.get((int(tid[i]), int(sid[i])))
+            if track is not None:
+                slot[i] = slot_get((int(sid[i]), track), -1)
+        return ScheduleTable(tid=tid, rank=np.arange(len(tid)) - np.repeat(starts[:-1], counts), sid=sid, slot=slot,
+                             arrive=np.array(arrive, dtype=np.int64), depart=np.array(depart, dtype=np.int64),
+                             train=train, starts=starts)
+
+    def deviations(self, table: ScheduleTable) -> Deviations:
+        n = len(self.ideal_setoff)
+        first = table.starts[:-1]
+        last = table.starts[1:] - 1
+        train = table.train
+        done = table.depart[last] == -999
+        setoff = np.zeros(n, dtype=np.int64)
+        achieve = np.zeros(n, dtype=np.int64)
+        finished = np.zeros(n, dtype=bool)
+        t = train[done]
+        finished[t] = True
+        setoff[t] = table.depart[first[done]] % 86400 - self.ideal_setoff[t]
+        achieve[t] = table.arrive[last[done]] % 86400 - self.ideal_achieve[t]
+        return Deviations(finished=finished, setoff=setoff, achieve=achieve, total=np.abs(setoff) + np.abs(achieve))
+
+    # 汇总指标
+    def kpis(self, table: ScheduleTable, fail_set, deviations: Deviations = None) -> dict[str, float]:
+        d = deviations if deviations is not None else self.deviations(table)
+        finished = d.finished
+        n_finished = int(finished.sum())
+        total = d.total[finished]
+        return {
+            'trains': len(self.tids),
+            'rows': len(table),
+            'finished': n_finished,
+            'failed': len(fail_set),
+            'total_deviation': int(total.sum()),
+            'mean_deviation': float(total.mean()) if n_finished else 0.0,
+            'max_deviation': int(total.max()) if n_finished else 0,
+            'on_time': int((total == 0).sum()),
+            'setoff_delay': int(np.maximum(d.setoff[finished], 0).sum()),
+            'achieve_delay': int(np.maximum(d.achieve[finished], 0).sum()),
+        }
+
+    # 股道占用时间线
+    def track_timelines(self, table: ScheduleTable) -> TrackTimelines:
+        keep = np.flatnonzero(table.slot >= 0)
+        slot = table.slot[keep]
+        key = np.maximum(table.arrive[keep], table.depart[keep])
+        order = keep[np.lexsort((key, slot))]           # lexsort 稳定：同一时刻保持车次ID、站序顺序
+        offsets = np.searchsorted(table.slot[order], np.arange(len(self.net.track_names) + 1))
+        return TrackTimelines(offsets=offsets, tid=table.tid[order], arrive=table.arrive[order],
+                              depart=table.depart[order], net=self.net)
+
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+    from scheduler import Scheduler, SchedulerConfig
+    from decompose import build_track_res
+    from validate import ScheduleValidator
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--repeat', type=int, default=5, help="重复分析次数（取最短耗时）")
+    parser.add_argument('--check', action='store_true', help="与 plan2.py 各统计单元的逐个循环比较")
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    info = loader.load()
+    net = loader.get('整数索引')
+    scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+    scheduler.run()
+    analysis = ScheduleAnalysis(info, net)
+    best = None
+    for _ in range(args.repeat):
+        t = time.perf_counter()
+        table = analysis.table(scheduler.res)
+        kpis = analysis.kpis(table, scheduler.fail_set)
+        timelines = analysis.track_timelines(table)
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"分析耗时 {best * 1000:.1f}ms（{len(table)} 行）")
+    for name, value in kpis.items():
+        print(f"{name}: {value}")
+    print(f"交路链 {len(analysis.chains)} 条，跨日交路 {len(analysis.cross_day)} 对，"
+          f"股道时间线 {int((np.diff(timelines.offsets) > 0).sum())} 条")
+
+    if args.check:
+        t = time.perf_counter()
+        total = sum(scheduler.train_deviation(tid) for tid in scheduler.checi)
+        track_res = build_track_res(scheduler.res, info)
+        elapsed = time.perf_counter() - t
+        # plan2.py 的交路链构建：链首 -> 其后各车次
+        train, tail_tids = {}, {}
+        for i, exchange in info['交路信息'].items():
+            if i in tail_tids:
+                head = tail_tids.pop(i)
+                train[head].append(exchange[0])
+                tail_tids[exchange[0]] = head
+            else:
+                train[i] = [exchange[0]]
+                tail_tids[exchange[0]] = i
+        chains = sorted(sorted([head] + tail) for head, tail in train.items())
+        same = (total == kpis['total_deviation'], track_res == timelines.as_dict(),
+                sorted(sum(chains, [])) == sorted(sum(analysis.chains, [])))
+        print(f"逐个循环耗时 {elapsed * 1000:.1f}ms；总偏移量、股道时间线、交路链车次{'一致' if all(same) else '不一致'} {same}")
+        report = ScheduleValidator(info, net).check(scheduler.res)
+        print(f"约束{'满足' if report.ok else '不满足'}，{report.summary()}")
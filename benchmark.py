@@ -0,0 +1,460 @@
+# 性能基准
+#   python benchmark.py load    [--data 数据目录] [--repeat 重复次数]   逐行 iterrows 解析（原实现）与向量化解析的逐表耗时
+#   python benchmark.py compact [--data 数据目录] [--repeat 重复次数]   车次对象与紧凑数组表示的内存占用与全路径遍历耗时
+#   python benchmark.py pipeline [--data 目录 ...] [--sizes 车次数 ...] [--out 结果.json]
+#                                                                 全流程分阶段耗时、事件吞吐与峰值堆内存，多规模输出扩展曲线
+#   python benchmark.py compare 基线.json 新结果.json [--threshold 0.1]   对比两次 pipeline 结果，超过阈值的变慢阶段以非零退出码报告
+import argparse
+import contextlib
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+import dataloader
+from dataloader import RunRuler, TrainStation, TrainService
+from scheduler import Scheduler
+
+
+# ---------------- 原逐行解析实现（作为正确性与速度基线） ----------------
+def _legacy_stop_tracks(data):
+    stop_tracks = {}
+    for idx, row in data.iterrows():
+        tid = int(row['列车序号'])
+        sid = int(row['车站'].strip('站'))
+        gudao = str(row['股道集合']).strip('\"').split(',')
+        if (tid, sid) not in stop_tracks:
+            stop_tracks[(tid, sid)] = gudao
+    return stop_tracks
+
+def _legacy_pass_tracks(data):
+    pass_tracks = {}
+    for idx, row in data.iterrows():
+        tid = int(row['列车序号'])
+        sid = int(row['车站'].strip('站'))
+        gudao = row['股道集合']
+        if (tid, sid) not in pass_tracks:
+            pass_tracks[(tid, sid)] = gudao
+    return pass_tracks
+
+def _legacy_tracks(data):
+    tracks = {}
+    for idx, row in data.iterrows():
+        sid = int(row['车站名称'].strip('站'))
+        gudao = row['股道名称']
+        if sid not in tracks:
+            tracks[sid] = []
+        tracks[sid].append(gudao)
+    return tracks
+
+def _legacy_qujian(data):
+    qujian = {}
+    for idx, row in data.iterrows():
+        sr = row['区间名称'].split('-')
+        sr0 = int(sr[0].strip('站'))
+        sr1 = int(sr[1].strip('站'))
+        qujian[(sr0, sr1)] = (row['区间行别'], row['区间性质'])
+    return qujian
+
+def _legacy_run_ruler(data, qujian):
+    run_ruler = {}
+    for idx, row in data.iterrows():
+        name = row['标尺名称'].strip('运行标尺')
+        sr = row['区间名称'].split('-')
+        sr0 = int(sr[0].strip('站'))
+        sr1 = int(sr[1].strip('站'))
+        type, property = qujian[(sr0, sr1)]
+        run_ruler[(int(name), sr0, sr1)] = RunRuler(
+            type=type,
+            property=property,
+            runtime=int(row['运行时分（上行）']) if type == '上行' else int(row['运行时分（下行）']),
+            start=int(row['起车附加（上行）']) if type == '上行' else int(row['起车附加（下行）']),
+            stop=int(row['停车附加（上行）']) if type == '上行' else int(row['停车附加（下行）']),
+        )
+    return run_ruler
+
+def _legacy_checi(data, run_ruler):
+    checi = {}
+    ts = None
+    for idx, row in data.iterrows():
+        if ts is None or ts.id != int(row['列车序号']):
+            if ts is not None:
+                checi[ts.id] = ts
+            ts = TrainService()
+            ts.id = int(row['列车序号'])
+        if pd.notna(row['到点']) and int(row['到点']) > 0:
+            ts.ideally_time_achieve = int(row['到点'])
+        if pd.notna(row['发点']) and int(row['发点']) > 0:
+            ts.ideally_time_setoff = int(row['发点'])
+        sr = row['停站时间范围'].split(',')
+        try:
+            rid = int(row['运行标尺'].strip('运行标尺'))
+            tmp = row['区间名称'].split('-')
+            ruler_info_in_use = run_ruler[(
+                rid,
+                int(tmp[0].strip('站')),
+                int(tmp[1].strip('站'))
+            )]
+        except:
+            ruler_info_in_use = None
+        ts.path.append(
+            TrainStation(
+                id=int(row['车站名称'].strip('站')),
+                ruler_info=ruler_info_in_use,
+                stop_time_range=(int(sr[0]), int(sr[1])),
+                stop_strategy=row['停站要求'],
+                is_ideal_stop=(row['理想停站'] == "是")
+            )
+        )
+    if ts is not None:
+        checi[ts.id] = ts
+    return checi
+
+def _legacy_exchanges(data):
+    exchanges = {}
+    for idx, exchange in data.iterrows():
+        prev_ts_id = int(exchange['前车序号'])
+        next_ts_id = int(exchange['后车序号'])
+        station_id = int(exchange['接续车站'].strip('站'))
+        min_exchange_time = int(exchange['最小接续时间'])
+        max_exchange_time = int(exchange['最大接续时间'])
+        exchanges[prev_ts_id] = (next_ts_id, station_id, min_exchange_time, max_exchange_time)
+    return exchanges
+
+def _legacy_entrances(data):
+    entrances = {}
+    for idx, row in data.iterrows():
+        eid = int(row['进路序号'])
+        curr_sid = int(row['车站名称'].strip('站'))
+        sr = row['区间名称'].split('-')
+        sr1 = int(sr[0].strip('站'))
+        sr2 = int(sr[1].strip('站'))
+        prev_sid = sr1 if curr_sid == sr2 else sr2
+        entrances[(curr_sid, prev_sid, row['股道名称'], row['作业类型'])] = eid
+    return entrances
+
+def _legacy_min_time_gaps(data):
+    min_time_gaps = {}
+    for idx, row in data.iterrows():
+        min_time_gaps[(int(row['前车进路序号']), int(row['后车进路序号']))] = int(row['最小间隔时间'])
+    return min_time_gaps
+
+
+# 结构化比较：TrainService 没有 __eq__，按属性逐一比较
+def same(a, b) -> bool:
+    if isinstance(a, TrainService) and isinstance(b, TrainService):
+        return vars(a) == vars(b)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a.keys()) == list(b.keys()) and all(same(a[k], b[k]) for k in a)
+    return a == b
+
+def _timeit(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+# 逐表对比：(表名, CSV 文件, 逐行实现, 向量化实现)；依赖表（区间、运行标尺）先解析后传入
+def bench_load(data_dir: str = "data", repeat: int = 3) -> list[tuple[str, float, float]]:
+    frames = {name: dataloader._read(data_dir, name) for name in
+              ["列车停站股道", "列车通过股道", "股道", "区间", "运行标尺", "列车", "交路", "进路", "间隔时间"]}
+    qujian = dataloader._parse_qujian(frames["区间"])
+    run_ruler = dataloader._parse_run_ruler(frames["运行标尺"], qujian)
+    cases = [
+        ("列车停站股道", lambda d: _legacy_stop_tracks(d), dataloader._parse_stop_tracks),
+        ("列车通过股道", lambda d: _legacy_pass_tracks(d), dataloader._parse_pass_tracks),
+        ("股道", lambda d: _legacy_tracks(d), dataloader._parse_tracks),
+        ("区间", lambda d: _legacy_qujian(d), dataloader._parse_qujian),
+        ("运行标尺", lambda d: _legacy_run_ruler(d, qujian), lambda d: dataloader._parse_run_ruler(d, qujian)),
+        ("列车", lambda d: _legacy_checi(d, run_ruler), lambda d: dataloader._parse_checi(d, run_ruler)),
+        ("交路", lambda d: _legacy_exchanges(d), dataloader._parse_exchanges),
+        ("进路", lambda d: _legacy_entrances(d), dataloader._parse_entrances),
+        ("间隔时间", lambda d: _legacy_min_time_gaps(d), dataloader._parse_min_time_gaps),
+    ]
+    results = []
+    print(f"{'表':<8}{'行数':>10}{'iterrows(s)':>14}{'向量化(s)':>12}{'加速比':>10}")
+    for name, legacy, vectorized in cases:
+        data = frames[name]
+        t_old, out_old = _timeit(lambda: legacy(data), repeat)
+        t_new, out_new = _timeit(lambda: vectorized(data), repeat)
+        assert same(out_old, out_new), f"{name}: 向量化解析结果与逐行解析不一致"
+        print(f"{name:<8}{len(data):>10}{t_old:>14.4f}{t_new:>12.4f}{t_old / max(t_new, 1e-9):>9.1f}x")
+        results.append((name, t_old, t_new))
+    total_old = sum(r[1] for r in results)
+    total_new = sum(r[2] for r in results)
+    print(f"{'合计':<8}{'':>10}{total_old:>14.4f}{total_new:>12.4f}{total_old / max(total_new, 1e-9):>9.1f}x")
+    return results
+
+
+# 全路径遍历：累加各站的区间运行时分（含起车附加，停站时含停车附加），与 plan2 推算下一站到达时刻的方式一致
+def _sweep(checi) -> int:
+    total = 0
+    for ts in checi.values():
+        for station in ts.path:
+            r = station.ruler_info
+            if r is not None:
+                total += r.runtime + r.start
+                if station.is_ideal_stop:
+                    total += r.stop
+    return total
+
+def _sweep_vectorized(c) -> int:
+    runtime = c.runtime.astype(np.int64) + c.start + np.where(c.is_ideal_stop, c.stop, 0)
+    return int(runtime[c.has_ruler].sum())
+
+# 保留在内存中的结构大小（tracemalloc 统计构造完成后仍存活的分配）
+def _retained(build):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    out = build()
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return size, out
+
+def bench_compact(data_dir: str = "data", repeat: int = 3) -> dict[str, float]:
+    data = dataloader._read(data_dir, "列车")
+    run_ruler = dataloader._parse_run_ruler(dataloader._read(data_dir, "运行标尺"), dataloader._parse_qujian(dataloader._read(data_dir, "区间")))
+    mem_obj, checi = _retained(lambda: dataloader._parse_checi(data, run_ruler))
+    mem_arr, compact = _retained(lambda: dataloader._parse_compact_checi(data, run_ruler))
+    t_obj, total_obj = _timeit(lambda: _sweep(checi), repeat)
+    t_view, total_view = _timeit(lambda: _sweep(compact), repeat)
+    t_vec, total_vec = _timeit(lambda: _sweep_vectorized(compact), repeat)
+    assert total_obj == total_view == total_vec, "紧凑表示的遍历结果与车次对象不一致"
+    n_stops = len(data)
+    print(f"车次 {len(checi)}，途经站 {n_stops}")
+    print(f"{'':<12}{'内存(MB)':>10}{'字节/站':>10}{'遍历(s)':>10}")
+    print(f"{'车次对象':<12}{mem_obj / 2**20:>10.2f}{mem_obj / max(n_stops, 1):>10.0f}{t_obj:>10.4f}")
+    print(f"{'紧凑+视图':<12}{mem_arr / 2**20:>10.2f}{mem_arr / max(n_stops, 1):>10.0f}{t_view:>10.4f}")
+    print(f"{'紧凑+向量化':<12}{'':>10}{'':>10}{t_vec:>10.4f}")
+    return {'mem_obj': mem_obj, 'mem_compact': mem_arr, 'sweep_obj': t_obj, 'sweep_view': t_view, 'sweep_vectorized': t_vec}
+
+
+# ---------------- 全流程基准 ----------------
+# plan2.py 按 "# %%" 切分为单元：第一个单元为加载（由 TableLoader 逐表计时代替），
+# 第二个单元为构造并运行 Scheduler（分为 init 与 events 两个阶段计时），其后为调度结束后的统计/后处理单元
+PLAN2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan2.py")
+# plan2 实际使用的表（按依赖顺序，逐表计时时依赖已在前面构建）
+PIPELINE_TABLES = ['车站股道', '列车停站股道', '列车通过股道', '区间', '运行标尺', '车次信息',
+                   '交路信息', '进路信息', '间隔时间', '整数索引', '候选股道']
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _plan2_cells(path: str = PLAN2) -> list[tuple[str, str]]:
+    cells, name, lines = [], None, []
+    for line in open(path, encoding="utf-8"):
+        if line.startswith("# %%"):
+            if name is not None:
+                cells.append((name, "".join(lines)))
+            # 单元名取标题中冒号/括号前的部分
+            name, lines = line[4:].strip().split('：')[0].split('（')[0], []
+        lines.append(line)
+    cells.append((name, "".join(lines)))
+    return cells
+
+
+# 运行一次全流程，返回各阶段耗时（秒）；trace_memory 时同时返回各阶段峰值堆内存（字节，tracemalloc）
+# timeout 秒内事件循环未结束时中止，后处理阶段跳过
+def run_pipeline(data_dir: str, trace_memory: bool = False, timeout: int = 600) -> dict:
+    phases, peaks = {}, {}
+    current = [None]
+
+    @contextlib.contextmanager
+    def phase(key):
+        current[0] = key
+        if trace_memory:
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        yield
+        phases[key] = time.perf_counter() - t0
+        if trace_memory:
+            peaks[key] = tracemalloc.get_traced_memory()[1]
+
+    if trace_memory:
+        tracemalloc.start()
+    scheduler = None
+    status = "ok"
+    try:
+        # 加载或初始化失败时记录出错的阶段并提前返回
+        try:
+            loader = dataloader.TableLoader(data_dir)
+            for name in PIPELINE_TABLES:
+                with phase(f"load.{name}"):
+                    loader.get(name)
+            info = {name: loader.get(name) for name in dataloader.INFO_TABLES}
+            with phase("init"), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                scheduler = Scheduler.from_loader(loader)
+        except Exception as e:
+            status = f"{current[0]}: {type(e).__name__}: {e}"
+        cells = _plan2_cells()
+        if scheduler is None:
+            return {'trains': 0, 'stops': 0, 'phases': phases, 'peaks': peaks, 'events': 0, 'queue': None,
+                    'fails': None, 'status': status}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            def on_alarm(signum, frame):
+                raise _Timeout()
+            handler = signal.signal(signal.SIGALRM, on_alarm)
+            signal.alarm(timeout)
+            try:
+                with phase("events"):
+                    scheduler.run()
+            except _Timeout:
+                status = "timeout"
+            finally:
+                signal.alarm(0)
+                signal.signal(signal.SIGALRM, handler)
+
+            if status == "ok":
+                # 与 plan2 第二个单元结束时的命名一致
+                # 第一个单元中的输出设置：不打印、不写出结果文件
+                ns = {'__name__': 'plan2', 'loader': loader, 'info': info, 'checi': info['车次信息'],
+                      'scheduler': scheduler, 'res': scheduler.res, 'fail_set': scheduler.fail_set,
+                      'exchanges': info['交路信息'], 'VERBOSE': 0, 'OUTPUT': None}
+                for name, src in cells[2:]:
+                    try:
+                        with phase(f"post.{name}"):
+                            exec(compile(src, PLAN2, "exec"), ns)
+                    except Exception as e:
+                        status = f"post.{name}: {type(e).__name__}: {e}"
+                        break
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    queue = scheduler.queue.stats()
+    events = queue['popped']
+    return {
+        'trains': len(info['车次信息']),
+        'stops': sum(len(ts.path) for ts in info['车次信息'].values()),
+        'phases': phases,
+        'peaks': peaks,
+        'events': events,
+        'queue': queue,
+        'fails': len(scheduler.fail_set),
+        'status': status,
+    }
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(PLAN2)).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+    }
+
+
+# 对每个数据目录（或按 sizes 生成的合成数据）运行全流程：耗时取 repeat 次中各阶段最小值，另跑一次统计峰值堆内存
+def bench_pipeline(data_dirs: list[str], sizes: list[int] = (), repeat: int = 1, seed: int = 0,
+                   memory: bool = True, timeout: int = 600, out: str = None) -> dict:
+    import generator
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = [(d, d) for d in data_dirs]
+        for n in sizes:
+            d = os.path.join(tmp, f"trains{n}")
+            # 车站数随车次数增长，保持线路密度大致不变
+            generator.generate(d, n_stations=max(12, n // 10), n_lines=max(1, n // 200), n_trains=n, seed=seed)
+            targets.append((f"synthetic:{n}:seed{seed}", d))
+        for label, d in targets:
+            best = None
+            for _ in range(repeat):
+                r = run_pipeline(d, timeout=timeout)
+                if best is None:
+                    best = r
+                else:
+                    best['phases'] = {k: min(v, r['phases'].get(k, v)) for k, v in best['phases'].items()}
+            if memory:
+                best['peaks'] = run_pipeline(d, trace_memory=True, timeout=timeout)['peaks']
+            best['data'] = label
+            best['total'] = sum(best['phases'].values())
+            best['events_per_sec'] = best['events'] / best['phases']['events'] if best['phases'].get('events') else None
+            best['peak_heap'] = max(best['peaks'].values(), default=None)
+            runs.append(best)
+            _print_run(best)
+    result = {'meta': _meta(), 'runs': runs}
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+    if len(runs) > 1:
+        print(f"{'数据':<28}{'车次':>8}{'事件':>10}{'总耗时(s)':>12}{'事件/秒':>12}{'峰值堆(MB)':>12}")
+        for r in runs:
+            eps = f"{r['events_per_sec']:.0f}" if r['events_per_sec'] else "-"
+            peak = f"{r['peak_heap'] / 2**20:.1f}" if r['peak_heap'] else "-"
+            print(f"{r['data']:<28}{r['trains']:>8}{r['events']:>10}{r['total']:>12.3f}{eps:>12}{peak:>12}")
+    return result
+
+
+def _print_run(r: dict) -> None:
+    print(f"== {r['data']}：车次 {r['trains']}，途经站 {r['stops']}，事件 {r['events']}，失败 {r['fails']}，状态 {r['status']}")
+    q = r['queue']
+    if q is not None:
+        print(f"事件队列：入队 {q['scheduled']}，被取代 {q['superseded']}（{q['stale_ratio']:.1%}），堆峰值 {q['peak_size']}，待处理峰值 {q['peak_live']}")
+    print(f"{'阶段':<36}{'耗时(s)':>10}{'峰值堆(MB)':>12}")
+    for key, t in r['phases'].items():
+        peak = r['peaks'].get(key)
+        print(f"{key:<36}{t:>10.4f}{peak / 2**20 if peak is not None else float('nan'):>12.2f}")
+
+
+# 按 (数据, 阶段) 对比两份 pipeline 结果；new/old - 1 超过 threshold 视为变慢
+def compare(old_path: str, new_path: str, threshold: float = 0.1, min_seconds: float = 0.01) -> bool:
+    old = {r['data']: r for r in json.load(open(old_path, encoding="utf-8"))['runs']}
+    new = {r['data']: r for r in json.load(open(new_path, encoding="utf-8"))['runs']}
+    regressed = False
+    print(f"{'数据':<28}{'阶段':<36}{'基线(s)':>10}{'新(s)':>10}{'变化':>9}")
+    for data, r in new.items():
+        if data not in old:
+            continue
+        for key, t in r['phases'].items():
+            t0 = old[data]['phases'].get(key)
+            if t0 is None:
+                continue
+            change = t / max(t0, 1e-9) - 1
+            # 太短的阶段计时噪声大，不参与判定
+            flag = change > threshold and max(t, t0) >= min_seconds
+            regressed |= flag
+            print(f"{data:<28}{key:<36}{t0:>10.4f}{t:>10.4f}{change:>+8.0%}{' !' if flag else ''}")
+        for key in ('fails', 'events'):
+            if r[key] != old[data][key]:
+                print(f"{data:<28}{key} 变化：{old[data][key]} -> {r[key]}")
+    return not regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('bench', choices=['load', 'compact', 'pipeline', 'compare'])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--data', action='append')
+    parser.add_argument('--repeat', type=int, default=None)
+    parser.add_argument('--sizes', type=int, nargs='*', default=[])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--timeout', type=int, default=600)
+    parser.add_argument('--out')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+    if args.bench == 'pipeline':
+        bench_pipeline(args.data or ([] if args.sizes else ["data"]), args.sizes, args.repeat or 1, args.seed,
+                       not args.no_memory, args.timeout, args.out)
+    elif args.bench == 'compare':
+        sys.exit(0 if compare(args.files[0], args.files[1], args.threshold) else 1)
+    else:
+        {'load': bench_load, 'compact': bench_compact}[args.bench]((args.data or ["data"])[0], args.repeat or 3)
@@ -0,0 +1,167 @@
+# 车次路径的紧凑表示：所有车次的途经站按列存放在扁平 NumPy 数组中，
+# 第 i 个车次的途经站为下标 [offsets[i], offsets[i+1])。
+# 通过 __slots__ 视图对象保持 checi[tid].path[rank].id 这类访问方式不变。
+from collections.abc import Mapping, Sequence
+import numpy as np
+
+
+# 运行标尺视图（对应 RunRuler）
+class RulerView:
+    __slots__ = ('_c', '_k')
+
+    def __init__(self, c: 'CompactCheci', k: int) -> None:
+        self._c = c
+        self._k = k
+
+    @property
+    def type(self) -> str:
+        return self._c.direction_names[self._c.direction[self._k]]
+
+    @property
+    def runtime(self) -> int:
+        return int(self._c.runtime[self._k])
+
+    @property
+    def start(self) -> int:
+        return int(self._c.start[self._k])
+
+    @property
+    def stop(self) -> int:
+        return int(self._c.stop[self._k])
+
+    @property
+    def property(self) -> str:
+        return self._c.property_names[self._c.property[self._k]]
+
+
+# 途经站视图（对应 TrainStation）
+class StationView:
+    __slots__ = ('_c', '_k')
+
+    def __init__(self, c: 'CompactCheci', k: int) -> None:
+        self._c = c
+        self._k = k
+
+    @property
+    def id(self) -> int:
+        return int(self._c.station_id[self._k])
+
+    @property
+    def ruler_info(self) -> RulerView:
+        return RulerView(self._c, self._k) if self._c.has_ruler[self._k] else None
+
+    @property
+    def stop_time_range(self) -> tuple[int, int]:
+        return (int(self._c.stop_min[self._k]), int(self._c.stop_max[self._k]))
+
+    @property
+    def stop_strategy(self) -> str:
+        code = self._c.stop_strategy[self._k]
+        return self._c.stop_strategy_names[code] if code >= 0 else None
+
+    @property
+    def is_ideal_stop(self) -> bool:
+        return bool(self._c.is_ideal_stop[self._k])
+
+
+# 车次路径视图（对应 TrainService.path），支持负下标
+class PathView(Sequence):
+    __slots__ = ('_c', '_lo', '_hi')
+
+    def __init__(self, c: 'CompactCheci', lo: int, hi: int) -> None:
+        self._c = c
+        self._lo = lo
+        self._hi = hi
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    def __getitem__(self, rank):
+        if isinstance(rank, slice):
+            return [StationView(self._c, k) for k in range(self._lo, self._hi)[rank]]
+        n = self._hi - self._lo
+        if rank < 0:
+            rank += n
+        if not 0 <= rank < n:
+            raise IndexError(rank)
+        return StationView(self._c, self._lo + rank)
+
+    def __iter__(self):
+        c = self._c
+        for k in range(self._lo, self._hi):
+            yield StationView(c, k)
+
+
+# 车次视图（对应 TrainService）
+class TrainView:
+    __slots__ = ('_c', '_i')
+
+    def __init__(self, c: 'CompactCheci', i: int) -> None:
+        self._c = c
+        self._i = i
+
+    @property
+    def id(self) -> int:
+        return int(self._c.train_id[self._i])
+
+    @property
+    def ideally_time_setoff(self) -> int:
+        return int(self._c.ideally_time_setoff[self._i])
+
+    @property
+    def ideally_time_achieve(self) -> int:
+        return int(self._c.ideally_time_achieve[self._i])
+
+    @property
+    def path(self) -> PathView:
+        return PathView(self._c, int(self._c.offsets[self._i]), int(self._c.offsets[self._i + 1]))
+
+
+# 车次信息的紧凑表示：车次ID -> TrainView
+# 车次级数组长度为车次数；站级数组长度为全部途经站数
+# 编码列（stop_strategy、direction、property）以 -1 表示缺省，其余为对应 *_names 的下标
+class CompactCheci(Mapping):
+    def __init__(self, train_id: np.ndarray, offsets: np.ndarray,
+                 ideally_time_setoff: np.ndarray, ideally_time_achieve: np.ndarray,
+                 station_id: np.ndarray, stop_min: np.ndarray, stop_max: np.ndarray,
+                 stop_strategy: np.ndarray, stop_strategy_names: list[str],
+                 is_ideal_stop: np.ndarray, has_ruler: np.ndarray,
+                 runtime: np.ndarray, start: np.ndarray, stop: np.ndarray,
+                 direction: np.ndarray, direction_names: list[str],
+                 property: np.ndarray, property_names: list[str]) -> None:
+        # 车次级
+        self.train_id = train_id
+        self.offsets = offsets
+        self.ideally_time_setoff = ideally_time_setoff
+        self.ideally_time_achieve = ideally_time_achieve
+        # 站级：停站信息
+        self.station_id = station_id
+        self.stop_min = stop_min
+        self.stop_max = stop_max
+        self.stop_strategy = stop_strategy
+        self.stop_strategy_names = stop_strategy_names
+        self.is_ideal_stop = is_ideal_stop
+        # 站级：进入该站所用区间的运行标尺
+        self.has_ruler = has_ruler
+        self.runtime = runtime
+        self.start = start
+        self.stop = stop
+        self.direction = direction
+        self.direction_names = direction_names
+        self.property = property
+        self.property_names = property_names
+        # 车次ID -> 车次下标（同一车次ID出现多段时以最后一段为准，与 dict 构造一致）
+        self._index = {tid: i for i, tid in enumerate(train_id.tolist())}
+
+    def __getitem__(self, tid: int) -> TrainView:
+        return TrainView(self, self._index[tid])
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # 数组占用的字节数
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
@@ -1,7 +1,14 @@
 # from enum import Enum
+import os
+from collections.abc import Mapping
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
 
+from snapshot import Snapshot, table_version
+from compact import CompactCheci
+from network import build_network_index, build_candidate_table
+
 # 标尺信息
 # @dataclass
 # class RunRuler:
@@ -53,165 +60,357 @@ class TrainService:
         self.path: list[TrainStation] = []
 
 
-# 加载数据（返回必要数据，主要是车次信息）
-def load() -> dict[str, any]:
-    # 列车停站股道字典：(车次ID, 车站ID) -> 停站股道列表
-    fname = "data/列车停站股道.csv"
-    data = pd.read_csv(fname, header=0)
-    stop_tracks: dict[tuple[int,int], list[str]] = {}
-    for idx, row in data.iterrows():
-        tid = int(row['列车序号'])
-        sid = int(row['车站'].strip('站'))
-        gudao = str(row['股道集合']).strip('\"').split(',')
-        if (tid, sid) not in stop_tracks:
-            stop_tracks[(tid, sid)] = gudao
-
-    # 列车通过股道字典：(车次ID, 车站ID) -> 股道ID
-    fname = "data/列车通过股道.csv"
-    data = pd.read_csv(fname, header=0)
-    pass_tracks: dict[tuple[int, int], str] = {}
-    for idx, row in data.iterrows():
-        tid = int(row['列车序号'])
-        sid = int(row['车站'].strip('站'))
-        gudao = row['股道集合']
-        if (tid, sid) not in pass_tracks:
-            pass_tracks[(tid, sid)] = gudao
-    
-    fname = "data/股道.csv"
-    data = pd.read_csv(fname, header=0)
+# 站点名称解析：'站4950' -> 4950（整列向量化）
+def _station_ids(col: pd.Series) -> pd.Series:
+    return col.str.strip('站').astype(int)
+
+# 区间名称解析：'站4950-站738' -> (4950, 738)
+def _interval_ids(col: pd.Series) -> tuple[pd.Series, pd.Series]:
+    sr = col.str.split('-', expand=True)
+    return _station_ids(sr[0]), _station_ids(sr[1])
+
+# 可缺省的整数列（如始发站的运行标尺、区间名称）：无法解析的置为 NaN
+def _optional_ids(col: pd.Series, prefix: str) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(col):
+        return pd.Series(np.nan, index=col.index)
+    return pd.to_numeric(col.str.strip(prefix), errors='coerce')
+
+# 列车停站股道字典：(车次ID, 车站ID) -> 停站股道列表（同键保留首条）
+def _parse_stop_tracks(data: pd.DataFrame) -> dict[tuple[int, int], list[str]]:
+    tid = data['列车序号'].astype(int)
+    sid = _station_ids(data['车站'])
+    gudao = data['股道集合'].astype(str).str.strip('\"').str.split(',')
+    first = ~pd.DataFrame({'tid': tid, 'sid': sid}).duplicated().to_numpy()
+    return dict(zip(
+        zip(tid[first].tolist(), sid[first].tolist()),
+        gudao[first].tolist(),
+    ))
+
+# 列车通过股道字典：(车次ID, 车站ID) -> 股道ID（同键保留首条）
+def _parse_pass_tracks(data: pd.DataFrame) -> dict[tuple[int, int], str]:
+    tid = data['列车序号'].astype(int)
+    sid = _station_ids(data['车站'])
+    first = ~pd.DataFrame({'tid': tid, 'sid': sid}).duplicated().to_numpy()
+    return dict(zip(
+        zip(tid[first].tolist(), sid[first].tolist()),
+        data['股道集合'][first].tolist(),
+    ))
+
+# 车站股道字典：车站ID -> 股道名称列表（保持文件中的顺序）
+def _parse_tracks(data: pd.DataFrame) -> dict[int, list[str]]:
     tracks: dict[int, list[str]] = {}
-    for idx, row in data.iterrows():
-        sid = int(row['车站名称'].strip('站'))
-        gudao = row['股道名称']
+    for sid, gudao in zip(_station_ids(data['车站名称']).tolist(), data['股道名称'].tolist()):
         if sid not in tracks:
             tracks[sid] = []
         tracks[sid].append(gudao)
-            
-    fname = "data/区间.csv"
-    data = pd.read_csv(fname, header=0)
-    qujian: dict[tuple[int, int], tuple[str, str]] = {}
-
-    for idx, row in data.iterrows():
-        sr = row['区间名称'].split('-')
-        sr0 = int(sr[0].strip('站'))
-        sr1 = int(sr[1].strip('站'))
-        qujian[(sr0, sr1)] = (row['区间行别'], row['区间性质'])
-
-    # 运行标尺信息
-    # 通过标尺ID索引：(标尺名称, 区间), e.g., 运行标尺360,站4950-站738
-    #   tuple[int, int, int] = (-1, -1, -1)
-    fname = "data/运行标尺.csv"
-    data = pd.read_csv(fname, header=0)
-    run_ruler: dict[tuple[int, int, int], RunRuler] = {}
-    for idx, row in data.iterrows():
-        name = row['标尺名称'].strip('运行标尺')
-        sr = row['区间名称'].split('-')
-        sr0 = int(sr[0].strip('站'))
-        sr1 = int(sr[1].strip('站'))
-        type, property = qujian[(sr0, sr1)]
-        run_ruler[(int(name), sr0, sr1)] = RunRuler(
-            type=type,
-            property=property,
-            runtime=int(row['运行时分（上行）']) if type == '上行' else int(row['运行时分（下行）']),
-            start=int(row['起车附加（上行）']) if type == '上行' else int(row['起车附加（下行）']),
-            stop=int(row['停车附加（上行）']) if type == '上行' else int(row['停车附加（下行）']),
-        )
+    return tracks
 
-    # 车次信息
-    fname = "data/列车.csv"
-    data = pd.read_csv(fname, header=0)
-    checi: dict[int, TrainService] = {}
+# 区间字典：(起点站ID, 终点站ID) -> (区间行别, 区间性质)
+def _parse_qujian(data: pd.DataFrame) -> dict[tuple[int, int], tuple[str, str]]:
+    sr0, sr1 = _interval_ids(data['区间名称'])
+    return dict(zip(
+        zip(sr0.tolist(), sr1.tolist()),
+        zip(data['区间行别'].tolist(), data['区间性质'].tolist()),
+    ))
 
-    ts = None
-    for idx, row in data.iterrows():
-        # print(f"xuhao: {int(row['列车序号'])}")
-        if ts is None or ts.id != int(row['列车序号']):
-            # print(int(row['列车序号']), ts.id if ts else None)
-            if ts is not None:
-                # print(len(ts.path))
-                checi[ts.id] = ts
-            ts = TrainService()
-            # 车次ID
-            ts.id = int(row['列车序号'])
-
-        # 车次理想发车、到车时间
-        if pd.notna(row['到点']) and int(row['到点']) > 0:
-            ts.ideally_time_achieve = int(row['到点'])
-        if pd.notna(row['发点']) and int(row['发点']) > 0:
-            ts.ideally_time_setoff = int(row['发点'])
-
-        # 车次途径站点信息
-        sr = row['停站时间范围'].split(',')
-        try:
-            rid = int(row['运行标尺'].strip('运行标尺'))
-            tmp = row['区间名称'].split('-')
-            ruler_info_in_use = run_ruler[(
-                rid,
-                int(tmp[0].strip('站')),
-                int(tmp[1].strip('站'))
-            )]
-
-        except:
-            ruler_info_in_use = None
-        ts.path.append(
-            TrainStation(
-                id=int(row['车站名称'].strip('站')),
-                ruler_info=ruler_info_in_use,
-                stop_time_range=(int(sr[0]), int(sr[1])),
-                stop_strategy=row['停站要求'],
-                is_ideal_stop=(row['理想停站'] == "是")
-            )
+# 运行标尺信息
+# 通过标尺ID索引：(标尺名称, 区间), e.g., 运行标尺360,站4950-站738
+#   tuple[int, int, int] = (-1, -1, -1)
+def _parse_run_ruler(data: pd.DataFrame, qujian: dict[tuple[int, int], tuple[str, str]]) -> dict[tuple[int, int, int], RunRuler]:
+    name = data['标尺名称'].str.strip('运行标尺').astype(int)
+    sr0, sr1 = _interval_ids(data['区间名称'])
+    keys = list(zip(name.tolist(), sr0.tolist(), sr1.tolist()))
+    types, properties = zip(*[qujian[k[1:]] for k in keys]) if keys else ((), ())
+    # 按区间行别选择上行/下行列
+    is_up = np.array(types) == '上行'
+    def _by_type(up: str, down: str) -> list[int]:
+        return pd.Series(np.where(is_up, data[up].to_numpy(), data[down].to_numpy())).astype(int).tolist()
+    return dict(zip(keys, [
+        RunRuler(type=t, property=p, runtime=r, start=s0, stop=s1)
+        for t, p, r, s0, s1 in zip(
+            types,
+            properties,
+            _by_type('运行时分（上行）', '运行时分（下行）'),
+            _by_type('起车附加（上行）', '起车附加（下行）'),
+            _by_type('停车附加（上行）', '停车附加（下行）'),
         )
+    ]))
 
-    if ts is not None:
-        checi[ts.id] = ts
+# 列车表的列式解析结果（车次对象与紧凑表示共用）
+def _checi_columns(data: pd.DataFrame) -> dict[str, any]:
+    n = len(data)
+    tid = data['列车序号'].astype(int).to_numpy()
+    # 每段连续同车次行的起止下标
+    starts = np.flatnonzero(np.r_[True, tid[1:] != tid[:-1]]) if n else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], n].astype(np.int64)
+    run_id = np.repeat(np.arange(len(starts)), ends - starts)
 
-    # 交路信息 前车id -> (后车id，站次，最小候车时间，最大候车时间)
-    fname = "data/交路.csv"
-    data = pd.read_csv(fname, header=0)
-    exchanges : dict[int, (int, int, int, int)] = {}
-    for idx, exchange in data.iterrows():
-        prev_ts_id = int(exchange['前车序号'])
-        next_ts_id = int(exchange['后车序号'])
-        station_id = int(exchange['接续车站'].strip('站'))
-        min_exchange_time = int(exchange['最小接续时间'])
-        max_exchange_time = int(exchange['最大接续时间'])
-        exchanges[prev_ts_id] = (next_ts_id, station_id, min_exchange_time, max_exchange_time)
-    
-    fname = "data/进路.csv"
-    data = pd.read_csv(fname, header=0)
-    entrances : dict[(int, int, int, str), int] = {}
-    for idx, row in data.iterrows():
-        eid = int(row['进路序号'])
-        curr_sid = int(row['车站名称'].strip('站'))
-        sr = row['区间名称'].split('-')
-        sr1 = int(sr[0].strip('站'))
-        sr2 = int(sr[1].strip('站'))
-        prev_sid = sr1 if curr_sid == sr2 else sr2
-        track = row['股道名称']
-        track_class = row['作业类型']
-        entrances[(curr_sid, prev_sid, track, track_class)] = eid
-
-    fname = "data/间隔时间.csv"
-    data = pd.read_csv(fname, header = 0)
-    min_time_gaps : dict[(int, int), int] = {}
-    for idx, row in data.iterrows():
-        eid1 = int(row['前车进路序号'])
-        eid2 = int(row['后车进路序号'])
-        min_time_gap = int(row['最小间隔时间'])
-        min_time_gaps[(eid1, eid2)] = min_time_gap
+    # 车次理想发车、到车时间：取该段内最后一个大于 0 的到点/发点
+    def _last_positive(col: pd.Series) -> np.ndarray:
+        t = np.trunc(pd.to_numeric(col).to_numpy(dtype=float))
+        t[~(t > 0)] = np.nan
+        return pd.Series(t).groupby(run_id).last().fillna(0).astype(int).to_numpy()
 
+    # 车次途径站点信息
+    sr = data['停站时间范围'].str.split(',', expand=True)
+    rid = _optional_ids(data['运行标尺'], '运行标尺')
+    if not pd.api.types.is_numeric_dtype(data['区间名称']):
+        tmp = data['区间名称'].str.split('-', expand=True).reindex(columns=[0, 1])
+        sr0 = _optional_ids(tmp[0], '站')
+        sr1 = _optional_ids(tmp[1], '站')
+    else:
+        sr0 = sr1 = pd.Series(np.nan, index=data.index)
     return {
-        '车站股道': tracks,
-        '列车停站股道': stop_tracks,
-        '列车通过股道': pass_tracks,
-        '运行标尺': run_ruler,
-        '车次信息': checi,
-        '交路信息': exchanges,
-        '进路信息': entrances,
-        '间隔时间': min_time_gaps,
+        'tid': tid,
+        'starts': starts,
+        'ends': ends,
+        'achieve': _last_positive(data['到点']),
+        'setoff': _last_positive(data['发点']),
+        'station_id': _station_ids(data['车站名称']).to_numpy(),
+        'stop_min': sr[0].astype(int).to_numpy() if n else np.zeros(0, dtype=int),
+        'stop_max': sr[1].astype(int).to_numpy() if n else np.zeros(0, dtype=int),
+        # 运行标尺键 (标尺ID, 区间起点, 区间终点)，无法解析的行 valid 为 False
+        'valid': (rid.notna() & sr0.notna() & sr1.notna()).to_numpy(),
+        'rid': rid.fillna(-1).astype(int).to_numpy(),
+        'sr0': sr0.fillna(-1).astype(int).to_numpy(),
+        'sr1': sr1.fillna(-1).astype(int).to_numpy(),
+        'stop_strategy': data['停站要求'],
+        'is_ideal_stop': (data['理想停站'] == "是").to_numpy(),
     }
 
+# 车次信息：车次ID -> TrainService（连续的同车次行构成一条路径）
+def _parse_checi(data: pd.DataFrame, run_ruler: dict[tuple[int, int, int], RunRuler]) -> dict[int, TrainService]:
+    checi: dict[int, TrainService] = {}
+    cols = _checi_columns(data)
+    ruler_keys = zip(cols['rid'].tolist(), cols['sr0'].tolist(), cols['sr1'].tolist())
+    stations = [
+        TrainStation(
+            id=sid,
+            ruler_info=run_ruler.get(key) if ok else None,
+            stop_time_range=(lo, hi),
+            stop_strategy=strategy,
+            is_ideal_stop=ideal,
+        )
+        for sid, key, ok, lo, hi, strategy, ideal in zip(
+            cols['station_id'].tolist(),
+            ruler_keys,
+            cols['valid'].tolist(),
+            cols['stop_min'].tolist(),
+            cols['stop_max'].tolist(),
+            cols['stop_strategy'].tolist(),
+            cols['is_ideal_stop'].tolist(),
+        )
+    ]
+
+    achieve = cols['achieve'].tolist()
+    setoff = cols['setoff'].tolist()
+    for i, (s, e) in enumerate(zip(cols['starts'].tolist(), cols['ends'].tolist())):
+        ts = TrainService()
+        ts.id = int(cols['tid'][s])
+        ts.ideally_time_achieve = achieve[i]
+        ts.ideally_time_setoff = setoff[i]
+        ts.path = stations[s:e]
+        checi[ts.id] = ts
+    return checi
+
+# 紧凑车次信息：全部途经站存放于扁平数组，按车次偏移量切分（见 compact.py）
+def _parse_compact_checi(data: pd.DataFrame, run_ruler: dict[tuple[int, int, int], RunRuler]) -> CompactCheci:
+    cols = _checi_columns(data)
+    rulers = pd.DataFrame(
+        [(*key, r.runtime, r.start, r.stop, r.type, r.property) for key, r in run_ruler.items()],
+        columns=['rid', 'sr0', 'sr1', 'runtime', 'start', 'stop', 'type', 'property'],
+    )
+    stops = pd.DataFrame({'rid': cols['rid'], 'sr0': cols['sr0'], 'sr1': cols['sr1']})
+    m = stops.merge(rulers, how='left', on=['rid', 'sr0', 'sr1'])
+    has_ruler = cols['valid'] & m['runtime'].notna().to_numpy()
+    strategy, strategy_names = pd.factorize(cols['stop_strategy'])
+    direction, direction_names = pd.factorize(m['type'])
+    prop, property_names = pd.factorize(m['property'])
+    return CompactCheci(
+        train_id=cols['tid'][cols['starts']],
+        offsets=np.r_[cols['starts'], len(data)].astype(np.int64),
+        ideally_time_setoff=cols['setoff'].astype(np.int32),
+        ideally_time_achieve=cols['achieve'].astype(np.int32),
+        station_id=cols['station_id'].astype(np.int32),
+        stop_min=cols['stop_min'].astype(np.int32),
+        stop_max=cols['stop_max'].astype(np.int32),
+        stop_strategy=strategy.astype(np.int8),
+        stop_strategy_names=list(strategy_names),
+        is_ideal_stop=cols['is_ideal_stop'].astype(bool),
+        has_ruler=has_ruler,
+        runtime=m['runtime'].fillna(0).to_numpy().astype(np.int32),
+        start=m['start'].fillna(0).to_numpy().astype(np.int32),
+        stop=m['stop'].fillna(0).to_numpy().astype(np.int32),
+        direction=np.where(has_ruler, direction, -1).astype(np.int8),
+        direction_names=list(direction_names),
+        property=np.where(has_ruler, prop, -1).astype(np.int8),
+        property_names=list(property_names),
+    )
+
+# 交路信息 前车id -> (后车id，站次，最小候车时间，最大候车时间)
+def _parse_exchanges(data: pd.DataFrame) -> dict[int, tuple[int, int, int, int]]:
+    return dict(zip(
+        data['前车序号'].astype(int).tolist(),
+        zip(
+            data['后车序号'].astype(int).tolist(),
+            _station_ids(data['接续车站']).tolist(),
+            data['最小接续时间'].astype(int).tolist(),
+            data['最大接续时间'].astype(int).tolist(),
+        ),
+    ))
+
+# 进路信息 (当前站ID, 相邻站ID, 股道, 作业类型) -> 进路ID
+def _parse_entrances(data: pd.DataFrame) -> dict[tuple[int, int, str, str], int]:
+    curr_sid = _station_ids(data['车站名称']).to_numpy()
+    sr1, sr2 = _interval_ids(data['区间名称'])
+    prev_sid = np.where(curr_sid == sr2.to_numpy(), sr1.to_numpy(), sr2.to_numpy())
+    return dict(zip(
+        zip(curr_sid.tolist(), prev_sid.tolist(), data['股道名称'].tolist(), data['作业类型'].tolist()),
+        data['进路序号'].astype(int).tolist(),
+    ))
+
+# 间隔时间 (前车进路ID, 后车进路ID) -> 最小间隔时间
+def _parse_min_time_gaps(data: pd.DataFrame) -> dict[tuple[int, int], int]:
+    return dict(zip(
+        zip(data['前车进路序号'].astype(int).tolist(), data['后车进路序号'].astype(int).tolist()),
+        data['最小间隔时间'].astype(int).tolist(),
+    ))
+
+# 进路间隔索引（派生表）：
+# - former_index[eid] = [(next_eid, gap), ...]
+# - latter_index[eid] = [(prev_eid, gap), ...]
+def build_time_gap_index(min_time_gaps: dict[tuple[int, int], int]) -> tuple[dict[int, list[tuple[int, int]]], dict[int, list[tuple[int, int]]]]:
+    time_gap_former_index: dict[int, list[tuple[int, int]]] = {}
+    time_gap_latter_index: dict[int, list[tuple[int, int]]] = {}
+    for (prev_eid, next_eid), time_gap in min_time_gaps.items():
+        if prev_eid not in time_gap_former_index:
+            time_gap_former_index[prev_eid] = []
+        time_gap_former_index[prev_eid].append((next_eid, time_gap))
+        if next_eid not in time_gap_latter_index:
+            time_gap_latter_index[next_eid] = []
+        time_gap_latter_index[next_eid].append((prev_eid, time_gap))
+    return time_gap_former_index, time_gap_latter_index
+
+# 表注册：名称 -> (源 CSV 文件, 依赖表, 构造函数)
+# 构造函数的参数依次为各源文件的 DataFrame 与各依赖表
+TABLES: dict[str, tuple[tuple[str, ...], tuple[str, ...], any]] = {
+    '车站股道': (("股道",), (), _parse_tracks),
+    '列车停站股道': (("列车停站股道",), (), _parse_stop_tracks),
+    '列车通过股道': (("列车通过股道",), (), _parse_pass_tracks),
+    '区间': (("区间",), (), _parse_qujian),
+    '运行标尺': (("运行标尺",), ('区间',), _parse_run_ruler),
+    '车次信息': (("列车",), ('运行标尺',), _parse_checi),
+    '紧凑车次信息': (("列车",), ('运行标尺',), _parse_compact_checi),
+    '交路信息': (("交路",), (), _parse_exchanges),
+    '进路信息': (("进路",), (), _parse_entrances),
+    '间隔时间': (("间隔时间",), (), _parse_min_time_gaps),
+    # 派生索引：不属于 load() 返回的 info，通过 TableLoader.get() 按需获取
+    '间隔时间索引': ((), ('间隔时间',), build_time_gap_index),
+    # 整数化索引：股道槽位、作业类型编码、进路连续编号与进路间隔图（见 network.py）
+    '整数索引': ((), ('车站股道', '列车停站股道', '列车通过股道', '进路信息', '间隔时间'), build_network_index),
+    # 每个车次、每个站序的候选股道及其进路编号（已剔除缺少所需进路的股道）
+    '候选股道': ((), ('车次信息', '整数索引', '交路信息'), build_candidate_table),
+}
+
+# 构造函数版本：修改某张表的构造逻辑（或其输出结构）时递增对应条目，使该表及依赖它的表的旧快照失效
+# 未列出的表版本为 1；'整数索引' 与 '候选股道' 在引入候选股道（TrackCandidate、fanout）时已变更过一次
+BUILDER_VERSIONS: dict[str, int] = {
+    '整数索引': 2,
+    '候选股道': 2,
+}
+
+# load() 返回的 info 所含的表
+INFO_TABLES = ['车站股道', '列车停站股道', '列车通过股道', '运行标尺', '车次信息', '交路信息', '进路信息', '间隔时间']
+
+def _read(data_dir: str, name: str) -> pd.DataFrame:
+    return pd.read_csv(os.path.join(data_dir, f"{name}.csv"), header=0)
+
+# 按表加载并缓存结果；给定 cache_dir 时使用磁盘快照，只重建源文件或依赖发生变化的表
+# compact 为 True 时，'车次信息' 使用紧凑的数组表示（CompactCheci）
+class TableLoader:
+    def __init__(self, data_dir: str = "data", cache_dir: str = None, compact: bool = False) -> None:
+        self.data_dir = data_dir
+        self.snapshot = Snapshot(cache_dir) if cache_dir is not None else None
+        self.aliases: dict[str, str] = {'车次信息': '紧凑车次信息'} if compact else {}
+        self.tables: dict[str, any] = {}
+        self._versions: dict[str, str] = {}
+
+    def _version(self, name: str) -> str:
+        if name not in self._versions:
+            files, deps, _ = TABLES[name]
+            self._versions[name] = table_version(
+                name,
+                BUILDER_VERSIONS.get(name, 1),
+                [self.snapshot.file_digest(os.path.join(self.data_dir, f"{f}.csv")) for f in files],
+                [self._version(dep) for dep in deps],
+            )
+        return self._versions[name]
+
+    # 还原快照中对依赖表对象的引用
+    def _resolve(self, ref: tuple[str, any]) -> any:
+        dep, key = ref
+        table = self.tables.get(dep)
+        if table is None:
+            table = self.get(dep)
+        return table[key]
+
+    def get(self, name: str) -> any:
+        name = self.aliases.get(name, name)
+        if name in self.tables:
+            return self.tables[name]
+        files, deps, build = TABLES[name]
+        value = None
+        if self.snapshot is not None:
+            version = self._version(name)
+            cached = self.snapshot.read(name, version, self._resolve)
+            if cached is not None:
+                value = cached[0]
+        if value is None:
+            value = build(*[_read(self.data_dir, f) for f in files], *[self.get(dep) for dep in deps])
+            if self.snapshot is not None:
+                self.snapshot.write(name, version, value, {dep: self.get(dep) for dep in deps})
+        self.tables[name] = value
+        if self.snapshot is not None:
+            self.snapshot.flush()
+        return value
+
+    def load(self) -> dict[str, any]:
+        return {name: self.get(name) for name in INFO_TABLES}
+
+# 按需加载的 info：首次访问某个键时才解析该表（及其依赖表）
+class LazyInfo(Mapping):
+    def __init__(self, loader: TableLoader, tables: list[str]) -> None:
+        self.loader = loader
+        self._tables = list(tables)
+
+    def __getitem__(self, name: str) -> any:
+        if name not in self._tables:
+            raise KeyError(name)
+        return self.loader.get(name)
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    # 已解析的表
+    def loaded(self) -> list[str]:
+        return [name for name in self._tables if self.loader.aliases.get(name, name) in self.loader.tables]
+
+# 加载数据（返回必要数据，主要是车次信息）
+# cache_dir 非空时启用磁盘快照（热启动直接读取快照）
+# tables 非空时只加载指定的表，返回按需解析的 LazyInfo；依赖表（如 运行标尺 依赖 区间）自动加载
+# compact 为 True 时 '车次信息' 为数组表示的 CompactCheci，访问方式与 dict[int, TrainService] 相同
+def load(data_dir: str = "data", cache_dir: str = None, tables: list[str] = None, compact: bool = False) -> dict[str, any]:
+    loader = TableLoader(data_dir, cache_dir, compact)
+    if tables is None:
+        return loader.load()
+    for name in tables:
+        if name not in TABLES:
+            raise ValueError(f"未知的表：{name}")
+    return LazyInfo(loader, tables)
+
 
 if __name__ == '__main__':
     import pdb; 
@@ -0,0 +1,178 @@
+# 路网分解：按列车之间的相互影响把调度拆成互不相关的子问题，分别在子进程中调度后合并结果
+#   python decompose.py [--data data] [--workers 4] [--check]
+# 列车之间只通过三种途径相互影响：共用股道、进路（同一股道上的进路、间隔时间表中相连的进路）、交路接续。
+# 以股道、进路、车次为结点做并查集，连通分量内的车次才需要一起调度；各分量独立调度的结果与整体调度相同
+# （随机股道选择策略除外：随机数序列与分量的划分有关）。
+import gc
+import os
+import time
+import argparse
+import multiprocessing
+
+from network import NetworkIndex, TrackCandidate
+from scheduler import Scheduler, SchedulerConfig, ResultRow
+
+# 子进程继承的数据：(info, 整数索引, 候选股道, 调度参数)，由 run_components 在创建进程池前设置
+_shared: tuple = None
+
+
+# 干涉图的连通分量：返回车次ID列表的列表（各分量内按车次ID排序，分量按最小车次ID排序）
+def interference_components(checi, net: NetworkIndex, candidates: dict[int, list[list[TrackCandidate]]],
+                            exchanges: dict[int, tuple[int, int, int, int]]) -> list[list[int]]:
+    n_slots = len(net.track_names)
+    n_entrances = len(net.entrance_ids)
+    train_base = n_slots + n_entrances       # 结点：股道槽位、进路编号（偏移 n_slots）、车次（偏移 train_base）
+    parent = list(range(train_base + max(checi, default=0) + 1))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a: int, b: int) -> None:
+        a, b = find(a), find(b)
+        if a != b:
+            parent[b] = a
+
+    # 进路属于其股道
+    for slot, by_neighbor in enumerate(net.entrance_of):
+        for by_worktype in by_neighbor.values():
+            for e in by_worktype:
+                if e is not None:
+                    union(slot, n_slots + e)
+    # 间隔时间表中相连的进路
+    for e, successors in enumerate(net.gap_former):
+        for e2, _ in successors:
+            union(n_slots + e, n_slots + e2)
+    # 车次与其全部候选股道（调度中只会使用候选股道及其进路）
+    for tid in checi:
+        for cands in candidates[tid]:
+            for cand in cands:
+                union(train_base + tid, cand.slot)
+    # 交路接续：后车在前车的终到股道始发
+    for tid, exchange in exchanges.items():
+        if tid in checi and exchange[0] in checi:
+            union(train_base + tid, train_base + exchange[0])
+
+    components: dict[int, list[int]] = {}
+    for tid in sorted(checi):
+        components.setdefault(find(train_base + tid), []).append(tid)
+    return list(components.values())
+
+
+# 把分量装入至多 n_groups 组，使各组工作量（途经站数之和）尽量均衡：按工作量从大到小放入当前最轻的组
+def pack_components(checi, components: list[list[int]], n_groups: int) -> list[list[int]]:
+    weight = [sum(len(checi[tid].path) for tid in component) for component in components]
+    groups: list[list[int]] = [[] for _ in range(max(1, min(n_groups, len(components))))]
+    loads = [0] * len(groups)
+    for k in sorted(range(len(components)), key=lambda k: -weight[k]):
+        g = loads.index(min(loads))
+        groups[g].extend(components[k])
+        loads[g] += weight[k]
+    return [sorted(group) for group in groups if group]
+
+
+# 调度一组车次：返回 ([(车次ID, 结果行)], 失败车次)
+def _run_group(tids: list[int]) -> tuple[list[tuple[int, list[ResultRow]]], list[int]]:
+    info, net, candidates, config = _shared
+    checi = info['车次信息']
+    exchanges = info['交路信息']
+    sub = dict(info)
+    sub['车次信息'] = {tid: checi[tid] for tid in tids}
+    sub['交路信息'] = {tid: exchanges[tid] for tid in tids if tid in exchanges}
+    scheduler = Scheduler(sub, config, net=net, candidates=candidates)
+    scheduler.run()
+    return [(tid, scheduler.res[tid]) for tid in tids], scheduler.fail_set
+
+
+# 分解后并行调度并合并：返回 (res, fail_set, 分量列表)
+# res 与 Scheduler.res 的形式相同（按车次ID索引）；fail_set 按组依次拼接，与整体调度的失败车次集合相同、顺序可能不同
+# workers 为 1 或平台不支持 fork 时在主进程中依次调度各组
+def run_components(info, net: NetworkIndex, candidates: dict[int, list[list[TrackCandidate]]],
+                   config: SchedulerConfig = None, workers: int = None) -> tuple[list[list[ResultRow]], list[int], list[list[int]]]:
+    global _shared
+    checi = info['车次信息']
+    config = config or SchedulerConfig(verbose=False)
+    components = interference_components(checi, net, candidates, info['交路信息'])
+    workers = workers or os.cpu_count() or 1
+    _shared = (info, net, candidates, config)
+    res: list[list[ResultRow]] = [[] for _ in range(max(checi, default=0) + 1)]
+    fail_set: list[int] = []
+    if workers == 1 or len(components) == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        outputs = map(_run_group, pack_components(checi, components, 1))
+        pool = None
+    else:
+        # 组数取进程数的数倍，分量大小不均时各进程的负载仍较均衡
+        groups = pack_components(checi, components, 4 * workers)
+        groups.sort(key=lambda group: -sum(len(checi[tid].path) for tid in group))
+        # 子进程继承已加载的数据（写时复制）；冻结 GC 追踪，避免子进程的 GC 写共享页面
+        gc.freeze()
+        pool = multiprocessing.get_context('fork').Pool(min(workers, len(groups)))
+        outputs = pool.imap(_run_group, groups)
+    try:
+        for rows, fails in outputs:
+            for tid, r in rows:
+                res[tid] = r
+            fail_set.extend(fails)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            gc.unfreeze()
+    return res, fail_set, components
+
+
+# 股道时间线（与 plan2.py 的股道时间线聚合单元相同）：(车站ID, 股道名) -> [(车次ID, 到达, 发车)]，按到/发中较晚者排序
+# 未选定股道且不在通过股道表中的记录（始发即失败的车次）没有占用股道，跳过
+def build_track_res(res: list[list[ResultRow]], info) -> dict[tuple[int, str], list[tuple[int, int, int]]]:
+    pass_tracks = info['列车通过股道']
+    track_res: dict[tuple[int, str], list[tuple[int, int, int]]] = {}
+    for tid in range(1, len(res)):
+        for row in res[tid]:
+            sid = row.station_id
+            track = row.track
+            if track is None:
+                track = pass_tracks.get((tid, sid))
+                if track is None:
+                    continue
+            track_res.setdefault((sid, track), []).append((tid, row.achieve_time, row.setoff_time))
+    for rows in track_res.values():
+        rows.sort(key=lambda x: max(x[1], x[2]))
+    return track_res
+
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+    from validate import ScheduleValidator
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--check', action='store_true', help="与整体调度的结果逐行比较")
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    info = loader.load()
+    net = loader.get('整数索引')
+    candidates = loader.get('候选股道')
+    config = SchedulerConfig(verbose=False)
+
+    t = time.perf_counter()
+    res, fail_set, components = run_components(info, net, candidates, config, args.workers)
+    elapsed = time.perf_counter() - t
+    sizes = sorted((len(c) for c in components), reverse=True)
+    print(f"分量 {len(components)} 个，最大 {sizes[0] if sizes else 0} 个车次；"
+          f"进程数 {args.workers or os.cpu_count()}，分解调度耗时 {elapsed:.3f}s，失败 {len(fail_set)}")
+    track_res = build_track_res(res, info)
+    print(f"股道时间线：{len(track_res)} 条股道")
+
+    if args.check:
+        scheduler = Scheduler(info, config, net=net, candidates=candidates)
+        t = time.perf_counter()
+        scheduler.run()
+        elapsed = time.perf_counter() - t
+        same = scheduler.res == res and sorted(scheduler.fail_set) == sorted(fail_set)
+        print(f"整体调度耗时 {elapsed:.3f}s，结果{'相同' if same else '不同'}")
+        report = ScheduleValidator(info, net).check(res)
+        print(f"约束{'满足' if report.ok else '不满足'}，{report.summary()}")
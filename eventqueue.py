@@ -0,0 +1,119 @@
+# 带索引的事件队列：每个键（车次或进路）至多一个待处理事件，可按键取消/改期。
+# 事件为紧凑元组 (时刻, 序号, 键, 站序, 是否到达, 延迟预算)，堆操作使用 heapq。
+# 取消/改期后的旧元组仍留在堆中，但序号与 seq_of[键] 不符，弹出时跳过；
+# 失效元组多于有效元组时整体压缩重建，堆的大小不超过待处理事件数的两倍。
+# 设置 journal（见 journal.py）后，入队、弹出与取消均登记撤销操作；统计计数不回滚。
+import heapq
+
+# 压缩的最小堆大小，过小的堆不值得重建
+COMPACT_MIN = 1024
+
+
+class EventQueue:
+    def __init__(self, n_keys: int, journal=None) -> None:
+        self.heap: list[tuple[int, int, int, int, bool, int]] = []
+        self.seq_of: list[int] = [-1] * n_keys      # 键 -> 当前有效事件的序号（-1 表示无待处理事件）
+        self.pending: list[tuple] = [None] * n_keys # 键 -> 当前有效事件
+        self.journal = journal
+        self.next_seq = 0
+        self.live = 0                               # 待处理事件数
+        # 统计
+        self.scheduled = 0                          # 入队事件数
+        self.superseded = 0                         # 处理前被取消或改期的事件数
+        self.popped = 0                             # 弹出处理的事件数
+        self.peak_size = 0                          # 堆的最大长度（含失效元组）
+        self.peak_live = 0                          # 待处理事件数的最大值
+        self.compactions = 0
+
+    def __len__(self) -> int:
+        return self.live
+
+    def __bool__(self) -> bool:
+        return self.live > 0
+
+    def __contains__(self, key: int) -> bool:
+        return self.seq_of[key] >= 0
+
+    # 为键安排事件；该键已有待处理事件时取而代之
+    def push(self, key: int, time: int, rank: int = -1, is_achieve: bool = True, max_delay_time: int = 0) -> None:
+        seq = self.next_seq
+        self.next_seq = seq + 1
+        if self.journal is not None:
+            self.journal.log.append((_restore, self, key, self.seq_of[key], self.pending[key]))
+        if self.seq_of[key] >= 0:
+            self.superseded += 1
+        else:
+            self.live += 1
+            if self.live > self.peak_live:
+                self.peak_live = self.live
+        event = (time, seq, key, rank, is_achieve, max_delay_time)
+        self.seq_of[key] = seq
+        self.pending[key] = event
+        self.scheduled += 1
+        heap = self.heap
+        heapq.heappush(heap, event)
+        size = len(heap)
+        if size > self.peak_size:
+            self.peak_size = size
+        if size >= COMPACT_MIN and size > 2 * self.live:
+            self.compact()
+
+    # 取消键的待处理事件
+    def cancel(self, key: int) -> bool:
+        if self.seq_of[key] < 0:
+            return False
+        if self.journal is not None:
+            self.journal.log.append((_restore, self, key, self.seq_of[key], self.pending[key]))
+        self.seq_of[key] = -1
+        self.pending[key] = None
+        self.live -= 1
+        self.superseded += 1
+        return True
+
+    # 键的待处理事件时刻（无则 None）
+    def time_of(self, key: int) -> int:
+        return self.pending[key][0] if self.seq_of[key] >= 0 else None
+
+    # 弹出最早的有效事件：(时刻, 键, 站序, 是否到达, 延迟预算)
+    def pop(self) -> tuple[int, int, int, bool, int]:
+        heap = self.heap
+        seq_of = self.seq_of
+        while True:
+            time, seq, key, rank, is_achieve, max_delay_time = heapq.heappop(heap)
+            if seq_of[key] == seq:
+                if self.journal is not None:
+                    self.journal.log.append((_restore, self, key, seq, self.pending[key]))
+                seq_of[key] = -1
+                self.pending[key] = None
+                self.live -= 1
+                self.popped += 1
+                return time, key, rank, is_achieve, max_delay_time
+
+    # 丢弃失效元组并重建堆
+    def compact(self) -> None:
+        seq_of = self.seq_of
+        self.heap = [e for e in self.heap if seq_of[e[2]] == e[1]]
+        heapq.heapify(self.heap)
+        self.compactions += 1
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'scheduled': self.scheduled,
+            'popped': self.popped,
+            'superseded': self.superseded,
+            'stale_ratio': self.superseded / self.scheduled if self.scheduled else 0.0,
+            'peak_size': self.peak_size,
+            'peak_live': self.peak_live,
+            'compactions': self.compactions,
+        }
+
+
+# 撤销：恢复键的待处理事件（seq 为 -1 表示无）。原事件的元组可能已被弹出或在压缩时丢弃，
+# 因此重新入堆；堆中残留的同一元组在其中一份弹出后即失效，不会重复处理
+def _restore(queue: EventQueue, key: int, seq: int, event: tuple) -> None:
+    if (queue.seq_of[key] >= 0) != (seq >= 0):
+        queue.live += 1 if seq >= 0 else -1
+    queue.seq_of[key] = seq
+    queue.pending[key] = event
+    if event is not None:
+        heapq.heappush(queue.heap, event)
@@ -0,0 +1,193 @@
+# 合成时刻表生成器：按 dataloader.load() 所需格式写出全部 9 个 CSV，用于规模扩展实验
+#   python generator.py 输出目录 [--stations 36] [--trains 60] [--seed 0] ...
+# 路网由若干条线路组成，每条线路为一串相邻车站；列车在一条线路上连续运行，
+# 交路后车从前车终到站折返或续行。理想到/发时刻按 plan2 的推算方式（运行时分、起车/停车附加、最小停站）生成。
+import os
+import csv
+import random
+import argparse
+
+# 作业类型（与 network.WORKTYPES 一致）
+WORKTYPES = ['接车', '发车', '通过接车', '通过发车']
+
+
+def _write(out_dir: str, name: str, header: list[str], rows) -> None:
+    with open(os.path.join(out_dir, f"{name}.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+# 生成一组合成数据
+# - n_stations / n_lines：车站总数与线路数（车站均分到各线路）
+# - tracks_per_station：每站股道数（前两股为正线 I、II，用作通过股道）
+# - n_trains / path_len：车次数与每车途经站数范围
+# - stop_ratio：中间站停站比例（其余为通过）
+# - chain_len：交路链长度（每条链上的车次数）
+# - n_rulers：运行标尺数
+# - entrance_coverage：每个 (股道, 相邻站, 作业类型) 存在进路的概率
+# - headway_fanout：每条进路在同站内的平均后继进路数（进路间隔图密度）
+# - headway_gap：进路最小间隔时间的取值范围（秒）
+# - exchange_window：交路最小/最大接续时间（秒），后车理想发车在其间随机取
+# - seed：随机种子，相同参数与种子生成完全相同的文件
+def generate(out_dir: str = "data", n_stations: int = 36, n_lines: int = 3, tracks_per_station: int = 4,
+             n_trains: int = 60, path_len: tuple[int, int] = (4, 10), stop_ratio: float = 0.6,
+             chain_len: int = 3, n_rulers: int = 3, entrance_coverage: float = 1.0,
+             headway_fanout: float = 2.0, headway_gap: tuple[int, int] = (60, 300),
+             exchange_window: tuple[int, int] = (300, 3600), seed: int = 0) -> None:
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # 线路与车站
+    per_line = max(2, n_stations // n_lines)
+    lines = [list(range(i * per_line + 1, (i + 1) * per_line + 1)) for i in range(n_lines)]
+    stations = [sid for line in lines for sid in line]
+    tracks = {sid: (["I", "II"] + [f"{k}道" for k in range(3, tracks_per_station + 1)])[:max(1, tracks_per_station)]
+              for sid in stations}
+    _write(out_dir, "股道", ["车站名称", "股道名称"], [(f"站{sid}", t) for sid in stations for t in tracks[sid]])
+
+    # 区间：线路方向为下行，反方向为上行；同一对车站的两个方向区间性质相同
+    intervals: list[tuple[int, int, str]] = []
+    for line in lines:
+        for a, b in zip(line, line[1:]):
+            intervals.append((a, b, "下行"))
+            intervals.append((b, a, "上行"))
+    properties = {}
+    for a, b, _ in intervals:
+        key = (min(a, b), max(a, b))
+        if key not in properties:
+            properties[key] = rng.choice(["单线", "双线"])
+    _write(out_dir, "区间", ["区间名称", "区间行别", "区间性质"],
+           [(f"站{a}-站{b}", d, properties[(min(a, b), max(a, b))]) for a, b, d in intervals])
+
+    # 运行标尺：(标尺, 起点, 终点) -> 按区间行别生效的 (运行时分, 起车附加, 停车附加)
+    rulers: dict[tuple[int, int, int], tuple[int, int, int]] = {}
+    ruler_rows = []
+    for rid in range(1, n_rulers + 1):
+        for a, b, d in intervals:
+            up = (rng.randint(180, 600), rng.randint(30, 90), rng.randint(30, 90))
+            down = (rng.randint(180, 600), rng.randint(30, 90), rng.randint(30, 90))
+            rulers[(rid, a, b)] = up if d == "上行" else down
+            ruler_rows.append((f"运行标尺{rid}", f"站{a}-站{b}", up[0], down[0], up[1], down[1], up[2], down[2]))
+    _write(out_dir, "运行标尺", ["标尺名称", "区间名称", "运行时分（上行）", "运行时分（下行）", "起车附加（上行）",
+                             "起车附加（下行）", "停车附加（上行）", "停车附加（下行）"], ruler_rows)
+
+    # 车次：按交路链生成，后车从前车终到站出发
+    train_rows, stop_rows, pass_rows, exchange_rows = [], [], [], []
+    tid = 0
+    while tid < n_trains:
+        line = lines[rng.randrange(n_lines)]
+        setoff = rng.randint(1, 86399)
+        prev = None
+        for _ in range(min(chain_len, n_trains - tid)):
+            tid += 1
+            length = min(rng.randint(*path_len), len(line))
+            if prev is None:
+                pos = rng.randint(0, len(line) - length)
+                path = line[pos:pos + length]
+                if rng.random() < 0.5:
+                    path = path[::-1]
+            else:
+                # 从前车终到站续行或折返
+                pos = line.index(prev[1][-1])
+                length = max(2, min(length, max(pos + 1, len(line) - pos)))
+                forward = pos + length <= len(line)
+                backward = pos - length + 1 >= 0
+                if forward and (not backward or rng.random() < 0.5):
+                    path = line[pos:pos + length]
+                else:
+                    path = line[pos - length + 1:pos + 1][::-1]
+            rid = rng.randint(1, n_rulers)
+            stops = [k == 0 or k == len(path) - 1 or rng.random() < stop_ratio for k in range(len(path))]
+
+            # 理想时刻推算：停站发车加起车附加，到达停站加停车附加，停站时间取最小停站
+            t = setoff
+            for k, sid in enumerate(path):
+                if k > 0:
+                    runtime, start, stop = rulers[(rid, path[k - 1], sid)]
+                    t += runtime + (start if stops[k - 1] else 0) + (stop if stops[k] else 0)
+                if stops[k]:
+                    stop_min = rng.choice([60, 120, 180]) if 0 < k < len(path) - 1 else 0
+                    stop_max = stop_min + rng.choice([300, 600, 900])
+                else:
+                    stop_min = stop_max = 0
+                train_rows.append((
+                    tid, f"站{sid}",
+                    (t % 86400) or 1 if k == len(path) - 1 else 0,
+                    (setoff % 86400) or 1 if k == 0 else 0,
+                    f"{stop_min},{stop_max}",
+                    f"运行标尺{rid}" if k > 0 else None,
+                    f"站{path[k - 1]}-站{sid}" if k > 0 else None,
+                    "必停" if stops[k] else rng.choice(["选停", "禁停"]),
+                    "是" if stops[k] else "否",
+                ))
+                if stops[k]:
+                    choices = rng.sample(tracks[sid], rng.randint(1, len(tracks[sid])))
+                    stop_rows.append((tid, f"站{sid}", ",".join(choices)))
+                    t += stop_min
+                else:
+                    # 下行走 I 道，上行走 II 道
+                    downward = path[k + 1] > sid
+                    pass_rows.append((tid, f"站{sid}", tracks[sid][0 if downward or len(tracks[sid]) == 1 else 1]))
+            if prev is not None:
+                exchange_rows.append((prev[0], tid, f"站{path[0]}", exchange_window[0], exchange_window[1]))
+            prev = (tid, path)
+            setoff = t + rng.randint(*exchange_window)
+
+    _write(out_dir, "列车", ["列车序号", "车站名称", "到点", "发点", "停站时间范围", "运行标尺", "区间名称", "停站要求", "理想停站"], train_rows)
+    _write(out_dir, "列车停站股道", ["列车序号", "车站", "股道集合"], stop_rows)
+    _write(out_dir, "列车通过股道", ["列车序号", "车站", "股道集合"], pass_rows)
+    _write(out_dir, "交路", ["前车序号", "后车序号", "接续车站", "最小接续时间", "最大接续时间"], exchange_rows)
+
+    # 进路：每站每个相邻站、每股道、每种作业类型至多一条
+    neighbors: dict[int, list[int]] = {sid: [] for sid in stations}
+    for a, b, _ in intervals:
+        neighbors[a].append(b)
+    entrance_rows = []
+    station_entrances: dict[int, list[int]] = {}
+    eid = 0
+    for sid in stations:
+        for nb in neighbors[sid]:
+            for track in tracks[sid]:
+                for worktype in WORKTYPES:
+                    if rng.random() >= entrance_coverage:
+                        continue
+                    eid += 1
+                    # 区间名称两种书写方向均可，loader 以当前站之外的一端作为相邻站
+                    name = f"站{nb}-站{sid}" if rng.random() < 0.5 else f"站{sid}-站{nb}"
+                    entrance_rows.append((eid, f"站{sid}", name, track, worktype))
+                    station_entrances.setdefault(sid, []).append(eid)
+    _write(out_dir, "进路", ["进路序号", "车站名称", "区间名称", "股道名称", "作业类型"], entrance_rows)
+
+    # 进路间隔：同站进路之间随机连边
+    gap_rows = []
+    for eids in station_entrances.values():
+        for e1 in eids:
+            k = int(headway_fanout) + (1 if rng.random() < headway_fanout - int(headway_fanout) else 0)
+            for e2 in rng.sample(eids, min(k, len(eids))):
+                gap_rows.append((e1, e2, rng.randint(*headway_gap)))
+    _write(out_dir, "间隔时间", ["前车进路序号", "后车进路序号", "最小间隔时间"], gap_rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('out_dir')
+    parser.add_argument('--stations', type=int, default=36)
+    parser.add_argument('--lines', type=int, default=3)
+    parser.add_argument('--tracks', type=int, default=4)
+    parser.add_argument('--trains', type=int, default=60)
+    parser.add_argument('--path-len', type=int, nargs=2, default=(4, 10))
+    parser.add_argument('--stop-ratio', type=float, default=0.6)
+    parser.add_argument('--chain-len', type=int, default=3)
+    parser.add_argument('--rulers', type=int, default=3)
+    parser.add_argument('--entrance-coverage', type=float, default=1.0)
+    parser.add_argument('--headway-fanout', type=float, default=2.0)
+    parser.add_argument('--headway-gap', type=int, nargs=2, default=(60, 300))
+    parser.add_argument('--exchange-window', type=int, nargs=2, default=(300, 3600))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out_dir, n_stations=args.stations, n_lines=args.lines, tracks_per_station=args.tracks,
+             n_trains=args.trains, path_len=tuple(args.path_len), stop_ratio=args.stop_ratio,
+             chain_len=args.chain_len, n_rulers=args.rulers, entrance_coverage=args.entrance_coverage,
+             headway_fanout=args.headway_fanout, headway_gap=tuple(args.headway_gap),
+             exchange_window=tuple(args.exchange_window), seed=args.seed)
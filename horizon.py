@@ -0,0 +1,853 @@
+# 滚动时域精确优化：把一天按时刻切成相互重叠的时间窗，逐窗用混合整数规划（scipy.optimize.milp，HiGHS）
+# 重新安排窗内各车次的股道与到/发时刻，已确定的部分作为固定条件；并给出目标值的下界，得到优化方案的最优性差距
+#   python horizon.py [--data data] [--window 1800] [--step 900] [--shift 600] [--time-limit 5] [--bound] [--validate]
+# 需要可选依赖 scipy（>= 1.9）；未安装时构造 RollingHorizon 即报 ImportError，其余模块不受影响。
+#
+# 模型（与 validate.py 检查的约束一致）：
+# - 变量：每个事件（车次 × 站序）的到/发时刻（整数秒；通过站到发同一时刻），停站选股道的 0-1 变量，
+#   车次放弃（记为失败）的 0-1 变量；始发发车与终到到达的偏移量 |实际 - 理想|
+# - 运行：到达 - 前站发车 ∈ [运行时间（+起车、+停车附加）, 再加 backtrack_max_delay]（与调度模拟的到站延迟预算一致）；
+#   停站：发车 - 到达 ∈ stop_time_range；始发不早于理想发车（交路后车除外）；各事件时刻不晚于其最早可能时刻 + max_delay
+# - 交路：后车始发 - 前车终到（跨日加 86400）∈ [最小, 最大] 连接时间，后车在前车的终到股道始发（沿用调度结果的股道）
+# - 股道独占：同一股道上的占用区间（中间停站 [到达, 发车)，交路前车终到至后车始发）互不相交，
+#   始发、终到、通过的瞬时使用不落在其他车次的占用区间内；进路间隔：前车在 t 使用进路 e 后，
+#   e 的后继进路在 [t, t + 间隔) 内不能被其他车次使用。两两之间用 0-1 次序变量与大 M 约束表示“前或后”，
+#   只对时刻范围可能相交、且可能选在同一股道/相连进路的事件对建约束，股道选择变量为 0 时约束失效
+# - 放弃车次：其股道选择全为 0，全部资源约束与偏移量失效，代价 drop_penalty
+# - 目标：drop_penalty × 放弃车次数 + 未放弃车次的偏移量之和（时刻不取模，跨日后车按存储的时刻计）
+#
+# 滚动时域：按干涉图分量（见 decompose.py）分别处理；初始方案为调度模拟的结果（失败车次按最短运行时间补全）。
+# 窗 [T, T + window) 内尚未确定的事件为变量，时刻限制在当前方案 ± shift 内（并满足与前一事件的运行约束）；
+# 求解后时刻早于 T + step 的事件确定下来，其余留到下一窗重新优化；窗外以后的事件按运行约束顺延。
+# 求解超时且没有可行解时，该窗沿用当前方案。
+#
+# 下界：按调度结果的时刻把各分量的事件分成互不相交的组，每组只保留组内事件与组内约束（时刻范围为模型的
+# [最早时刻, 最早时刻 + max_delay]），车次放弃的代价按其所在组数平均分摊。任何可行方案限制在各组上都是
+# 各组问题的可行解，因此各组最优值（取求解器给出的下界）之和不大于全局最优值。组间的约束被丢弃，下界偏松。
+# 下界只对满足模型约束的方案成立：调度模拟的方案可能违反约束（其目标值可能低于下界），最优性差距只对
+# 滚动时域的方案给出，且仅当没有窗沿用调度模拟方案、validate.py 校验无违反约束时。
+import gc
+import time
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from network import NetworkIndex, TrackCandidate, JIECHE, FACHE
+from scheduler import Scheduler, SchedulerConfig, ResultRow
+from decompose import interference_components
+
+ORIGIN, MIDDLE, PASS, TERMINAL = 0, 1, 2, 3
+
+
+def _milp():
+    try:
+        from scipy.optimize import milp, Bounds, LinearConstraint
+        from scipy.sparse import coo_array
+    except ImportError as e:
+        raise ImportError("滚动时域优化需要安装 scipy（>= 1.9，提供 scipy.optimize.milp）") from e
+    return milp, Bounds, LinearConstraint, coo_array
+
+
+# 优化参数
+@dataclass
+class HorizonConfig:
+    window: int = 1800              # 时间窗长度（秒）
+    step: int = 900                 # 每窗确定的时长（秒），小于 window 时相邻窗重叠
+    shift: int = 600                # 事件时刻相对当前方案的最大移动（秒）
+    retry_shift: int = 1800         # 窗的解放弃了车次时，以此移动范围重新求解
+    max_delay: int = 86400          # 事件时刻相对其最早可能时刻的上限（模型的时刻范围）
+    drop_penalty: int = 86400       # 放弃一个车次的代价（秒）
+    time_limit: float = 5.0         # 每个模型的求解时限（秒）
+    mip_gap: float = 1e-4           # 相对最优性差距，达到即停止
+
+
+# 优化结果
+@dataclass
+class HorizonResult:
+    res: list[list[ResultRow]]
+    fail_set: list[int]
+    objective: int                  # drop_penalty × 放弃车次数 + 偏移量
+    deviation: int
+    windows: int = 0                # 求解的窗数
+    optimal: int = 0                # 其中求得最优解的窗数
+    limited: int = 0                # 超时、保留可行解的窗数
+    fallback: int = 0               # 超时且无可行解、沿用当前方案的窗数
+    seconds: float = 0.0
+    stats: dict = field(default_factory=dict)
+
+
+# 一个小型混合整数规划：逐个添加变量与约束行，最后一次求解
+class _Model:
+    def __init__(self) -> None:
+        self.lb: list[float] = []
+        self.ub: list[float] = []
+        self.cost: list[float] = []
+        self.integer: list[int] = []
+        self.row_index: list[int] = []
+        self.col_index: list[int] = []
+        self.values: list[float] = []
+        self.row_lb: list[float] = []
+        self.row_ub: list[float] = []
+
+    def var(self, lb, ub, cost=0.0, integer=True) -> int:
+        self.lb.append(lb)
+        self.ub.append(ub)
+        self.cost.append(cost)
+        self.integer.append(1 if integer else 0)
+        return len(self.lb) - 1
+
+    def row(self, terms, lb, ub) -> None:
+        r = len(self.row_lb)
+        for col, coef in terms:
+            self.row_index.append(r)
+            self.col_index.append(col)
+            self.values.append(coef)
+        self.row_lb.append(lb)
+        self.row_ub.append(ub)
+
+    # 返回 (解或 None, 是否最优, 目标值, 下界)
+    def solve(self, time_limit, mip_gap):
+        milp, Bounds, LinearConstraint, coo_array = _milp()
+        n = len(self.lb)
+        if n == 0:
+            return np.zeros(0), True, 0.0, 0.0
+        constraints = ()
+        if self.row_lb:
+            a = coo_array((self.values, (self.row_index, self.col_index)), shape=(len(self.row_lb), n)).tocsr()
+            constraints = LinearConstraint(a, self.row_lb, self.row_ub)
+        result = milp(np.array(self.cost), integrality=np.array(self.integer), bounds=Bounds(self.lb, self.ub),
+                      constraints=constraints, options={'time_limit': time_limit, 'mip_rel_gap': mip_gap})
+        bound = getattr(result, 'mip_dual_bound', None)
+        if bound is None or not np.isfinite(bound):
+            bound = result.fun if result.status == 0 else None
+        return result.x, result.status == 0, result.fun, bound
+
+
+# 时刻表达式：(变量列, 常数)，列为 -1 时为常数
+def _lo(model: _Model, expr) -> float:
+    return (model.lb[expr[0]] if expr[0] >= 0 else 0) + expr[1]
+
+
+def _hi(model: _Model, expr) -> float:
+    return (model.ub[expr[0]] if expr[0] >= 0 else 0) + expr[1]
+
+
+def _terms(expr, coef) -> list[tuple[int, float]]:
+    return [(expr[0], coef)] if expr[0] >= 0 else []
+
+
+# 窗内的一个事件：自由（变量）或已确定（常数）
+class _Event:
+    __slots__ = ('tid', 'rank', 'kind', 'a', 'd', 'choices', 'z')
+
+    def __init__(self, tid, rank, kind, a, d, choices, z) -> None:
+        self.tid = tid
+        self.rank = rank
+        self.kind = kind
+        self.a = a              # 到达时刻表达式（始发为 None；通过站与发车相同）
+        self.d = d              # 发车时刻表达式（终到为 None）
+        self.choices = choices  # [(槽位, 选择变量列或 -1)]：已确定的事件只有一个、列为 -1
+        self.z = z              # 所属车次的放弃变量列（已确定为 -1）
+
+
+class RollingHorizon:
+    def __init__(self, info, net: NetworkIndex, candidates: dict[int, list[list[TrackCandidate]]],
+                 config: HorizonConfig = None, scheduler_config: SchedulerConfig = None) -> None:
+        _milp()
+        self.info = info
+        self.net = net
+        self.candidates = candidates
+        self.config = config or HorizonConfig()
+        self.scheduler_config = scheduler_config or SchedulerConfig(verbose=False)
+        self.checi = info['车次信息']
+        self.exchanges = info['交路信息']
+        self.max_gap = max((gap for successors in net.gap_former for _, gap in successors), default=0)
+        checi = self.checi
+        # 车次的静态数据：各站序的事件类型、与前一事件的最短运行时间、停站时间范围、最早可能时刻
+        self.kind: dict[int, list[int]] = {}
+        self.run_min: dict[int, list[int]] = {}
+        self.cum_min: dict[int, list[tuple[int, int]]] = {}
+        self.cum_max: dict[int, list[tuple[int, int]]] = {}
+        self.earliest: dict[int, list[tuple[int, int]]] = {}
+        for tid, ts in checi.items():
+            path = ts.path
+            last = len(path) - 1
+            kinds, runs = [], [0]
+            for rank, station in enumerate(path):
+                kinds.append(ORIGIN if rank == 0 else TERMINAL if rank == last else MIDDLE if station.is_ideal_stop else PASS)
+                if rank > 0:
+                    r = station.ruler_info
+                    run = 0
+                    if r is not None:
+                        run = r.runtime + (r.start if kinds[rank - 1] != PASS else 0) + (r.stop if station.is_ideal_stop else 0)
+                    runs.append(run)
+            self.kind[tid] = kinds
+            self.run_min[tid] = runs
+            # 各事件（到达, 发车）相对始发发车的最短、最长历时
+            delay = self.scheduler_config.backtrack_max_delay
+            lo = hi = 0
+            cum_min, cum_max = [(0, 0)], [(0, 0)]
+            for rank in range(1, len(path)):
+                lo += runs[rank]
+                hi += runs[rank] + delay
+                a_lo, a_hi = lo, hi
+                if kinds[rank] == MIDDLE:
+                    lo += path[rank].stop_time_range[0]
+                    hi += path[rank].stop_time_range[1]
+                cum_min.append((a_lo, lo))
+                cum_max.append((a_hi, hi))
+            self.cum_min[tid] = cum_min
+            self.cum_max[tid] = cum_max
+        # 偏移量的目标时刻：理想发车，理想到达（早于理想发车时为次日）
+        self.target: dict[int, tuple[int, int]] = {}
+        for tid, ts in checi.items():
+            setoff, achieve = ts.ideally_time_setoff, ts.ideally_time_achieve
+            self.target[tid] = (setoff, achieve + 86400 if achieve < setoff else achieve)
+        # 交路：前车 <-> 后车；后车始发存为一天内的时刻，cross 为衔接时给它加上的天数（秒），由理想时刻决定
+        self.succ: dict[int, int] = {}
+        self.pred: dict[int, int] = {}
+        self.cross: dict[int, int] = {}
+        for tid, exchange in self.exchanges.items():
+            if tid in checi and exchange[0] in checi:
+                self.succ[tid] = exchange[0]
+                self.pred[exchange[0]] = tid
+                middle = self.target[tid][1] + (exchange[2] + exchange[3]) / 2 - self.target[exchange[0]][0]
+                self.cross[tid] = 86400 * max(0, round(middle / 86400))
+        # 最早可能时刻：前车先于后车（沿交路链），成环时后车始发取 0
+        done: set[int] = set()
+        for tid in sorted(checi):
+            chain = [tid]
+            while chain[-1] in self.pred and self.pred[chain[-1]] not in done and self.pred[chain[-1]] not in chain:
+                chain.append(self.pred[chain[-1]])
+            for t in reversed(chain):
+                if t not in done:
+                    self._earliest(t, done)
+                    done.add(t)
+
+    def _earliest(self, tid, done) -> None:
+        p = self.pred.get(tid)
+        if p is None:
+            start = self.checi[tid].ideally_time_setoff
+        elif p in done:
+            start = max(0, self.earliest[p][-1][0] + self.exchanges[p][2] - self.cross[p])
+        else:
+            start = 0
+        self.earliest[tid] = [(start + a, start + d) for a, d in self.cum_min[tid]]
+
+    # 事件在槽位上使用的进路：(接车或通过接车进路, 发车或通过发车进路)
+    def _entrances(self, tid, rank, slot) -> tuple[int, int]:
+        for cand in self.candidates[tid][rank]:
+            if cand.slot == slot:
+                return cand.entrance_in, cand.entrance_out
+        path = self.checi[tid].path
+        e_in = self.net.get_entrance(slot, path[rank - 1].id, JIECHE) if rank > 0 else None
+        e_out = self.net.get_entrance(slot, path[rank + 1].id, FACHE) if rank < len(path) - 1 else None
+        return e_in, e_out
+
+    # 当前方案：由调度结果得到各事件的 (到达, 发车, 槽位)；失败车次其余事件按最短运行、最短停站补全
+    def _initial_plan(self, res) -> dict[int, list[list[int]]]:
+        slot_of = self.net.slot_of
+        plan = {}
+        for tid, ts in self.checi.items():
+            rows = res[tid]
+            kinds = self.kind[tid]
+            cands = self.candidates[tid]
+            events = []
+            for rank, kind in enumerate(kinds):
+                default = cands[rank][0].slot if cands[rank] else -1
+                if rank < len(rows):
+                    row = rows[rank]
+                    slot = slot_of.get((row.station_id, row.track), default) if row.track is not None else default
+                    a = row.achieve_time if kind != ORIGIN else -999
+                    d = row.setoff_time if kind != TERMINAL else -999
+                    if kind == PASS:
+                        d = a
+                    elif kind == MIDDLE and d == -999:
+                        d = a + ts.path[rank].stop_time_range[0]
+                else:
+                    slot = default
+                    prev = events[-1][1]
+                    a = prev + self.run_min[tid][rank]
+                    d = -999 if kind == TERMINAL else a + (ts.path[rank].stop_time_range[0] if kind == MIDDLE else 0)
+                if kind == ORIGIN:
+                    a = d
+                elif kind == TERMINAL:
+                    d = a
+                events.append([a, d, slot])
+            plan[tid] = events
+        # 交路前车的终到与后车的始发使用同一股道：前车已终到时以其终到股道为准，否则以后车的始发股道为准
+        for p, s in self.succ.items():
+            if len(res[p]) == len(self.checi[p].path) and res[p][-1].track is not None:
+                plan[s][0][2] = plan[p][-1][2]
+            else:
+                plan[p][-1][2] = plan[s][0][2]
+        return plan
+
+    # 以调度模拟的结果为初始方案运行滚动时域优化
+    def run(self, res: list[list[ResultRow]] = None, components: list[list[int]] = None) -> HorizonResult:
+        t0 = time.perf_counter()
+        if res is None:
+            scheduler = Scheduler(self.info, self.scheduler_config, net=self.net, candidates=self.candidates)
+            scheduler.run()
+            res = scheduler.res
+        if components is None:
+            components = interference_components(self.checi, self.net, self.candidates, self.exchanges)
+        self.plan = self._initial_plan(res)
+        self.committed: dict[int, int] = {tid: 0 for tid in self.checi}     # 已确定的事件数（前缀）
+        self.dropped: set[int] = set()
+        self.succ_cap: dict[int, int] = {}       # 交路后车始发的上限：前车的终到占用已按该时刻确定
+        result = HorizonResult(res=[], fail_set=[], objective=0, deviation=0)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for component in components:
+                self._run_component(component, result)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        result.res = self._rows()
+        result.fail_set = sorted(self.dropped)
+        result.deviation = self.deviation(result.res, result.fail_set)
+        result.objective = self.config.drop_penalty * len(result.fail_set) + result.deviation
+        result.seconds = time.perf_counter() - t0
+        return result
+
+    # 事件的排序时刻：始发取发车，其余取到达
+    def _key(self, tid, rank) -> int:
+        a, d, _ = self.plan[tid][rank]
+        return d if rank == 0 else a
+
+    def _run_component(self, component: list[int], result: HorizonResult) -> None:
+        config = self.config
+        committed = self.committed
+        # 已确定事件的资源使用（常数），按时刻裁剪后作为各窗的固定条件
+        self._fixed: list[_Event] = []
+        remaining = set(component)
+        while remaining:
+            start = min(self._key(tid, committed[tid]) for tid in remaining)
+            end = start + config.window
+            # 窗内的自由事件：各车次从第一个未确定的事件起、时刻早于 end 的站序
+            ranks: dict[int, range] = {}
+            for tid in sorted(remaining):
+                n = len(self.plan[tid])
+                k = committed[tid]
+                while k < n and self._key(tid, k) < end:
+                    k += 1
+                if k > committed[tid]:
+                    ranks[tid] = range(committed[tid], k)
+            self._solve_window(ranks, result)
+            # 确定窗内时刻早于 start + step 的事件（各车次的前缀）；窗外的事件顺延后可能提前，留到下一窗
+            for tid, window_ranks in ranks.items():
+                if tid in self.dropped:
+                    remaining.discard(tid)
+                    continue
+                k = committed[tid]
+                while k < window_ranks.stop and self._key(tid, k) < start + config.step:
+                    self._commit(tid, k)
+                    k += 1
+                committed[tid] = k
+                if k == len(self.plan[tid]):
+                    remaining.discard(tid)
+            # 丢弃已不会与后续事件冲突的固定条件
+            if remaining:
+                horizon = min(self._key(tid, committed[tid]) for tid in remaining)
+                horizon -= max(config.shift, config.retry_shift) + self.max_gap + 1
+                self._fixed = [e for e in self._fixed if self._fixed_end(e) >= horizon]
+
+    def _fixed_end(self, event: _Event) -> int:
+        t = event.d[1] if event.d is not None else event.a[1]
+        if event.kind == TERMINAL and event.tid in self.succ:
+            s = self.succ[event.tid]
+            t = max(t, self.plan[s][0][1] + self.cross[event.tid])
+        return t
+
+    def _commit(self, tid, rank) -> None:
+        a, d, slot = self.plan[tid][rank]
+        kind = self.kind[tid][rank]
+        self._fixed.append(_Event(tid, rank, kind, (-1, a) if kind != ORIGIN else None,
+                                  (-1, d) if kind != TERMINAL else None, [(slot, -1)], -1))
+        # 交路前车的终到占用到后车始发：后车尚未确定时，其始发不再晚于当前方案
+        if kind == TERMINAL and tid in self.succ and self.committed[self.succ[tid]] == 0:
+            self.succ_cap[self.succ[tid]] = self.plan[self.succ[tid]][0][1]
+
+    # 求解一个窗，把解写回当前方案；解中放弃了车次时，放宽时刻范围到 ± retry_shift 再求解一次，取目标值较小者
+    def _solve_window(self, ranks: dict[int, range], result: HorizonResult) -> None:
+        config = self.config
+        best = None
+        for shift in (config.shift, config.retry_shift):
+            window = self._build_window(ranks, shift)
+            if window is None:
+                return
+            model, free, z_of = window
+            x, optimal, fun, _ = model.solve(config.time_limit, config.mip_gap)
+            if x is not None and (best is None or fun < best[0]):
+                best = (fun, optimal, x, free, z_of)
+            dropped = best is None or any(best[2][z] > 0.5 for z in best[4].values())
+            if not dropped or config.retry_shift <= shift:
+                break
+        result.windows += 1
+        if best is None:
+            result.fallback += 1
+            return
+        _, optimal, x, free, z_of = best
+        if optimal:
+            result.optimal += 1
+        else:
+            result.limited += 1
+        self._apply(x, free, z_of)
+
+    # 建立一个窗的模型：ranks 为各车次的自由站序；返回 (模型, 自由事件, 车次 -> 放弃变量)，没有自由事件时返回 None
+    def _build_window(self, ranks: dict[int, range], shift):
+        config = self.config
+        model = _Model()
+        free: list[_Event] = []
+        z_of: dict[int, int] = {}
+        last_free: dict[int, _Event] = {}
+        for tid, window_ranks in ranks.items():
+            z = model.var(0, 1, config.drop_penalty)
+            z_of[tid] = z
+            events = self._free_events(model, tid, window_ranks, z, shift)
+            free += events
+            last_free[tid] = events[-1]
+        if not free:
+            return None
+        by_rank = {(e.tid, e.rank): e for e in free}
+        # 时刻有意义的固定条件：与窗内事件可能的时刻范围相交
+        lo = min(_lo(model, e.a if e.a is not None else e.d) for e in free) - self.max_gap - 1
+        hi = max(_hi(model, e.d if e.d is not None else e.a) for e in free) + self.max_gap + 1
+        fixed = [e for e in self._fixed if self._fixed_end(e) >= lo and (e.a or e.d)[1] <= hi]
+        # 车次内部：运行、停站、交路、偏移量
+        for e in free:
+            self._train_rows(model, e, by_rank)
+        # 离开窗的车次：以最后一个自由事件的时刻推出的终到偏移下界计入目标
+        for tid, e in last_free.items():
+            if e.kind != TERMINAL:
+                self._late_rows(model, e, 1)
+        # 两两约束：股道独占与进路间隔
+        self._pair_rows(model, free + fixed, by_rank)
+        return model, free, z_of
+
+    # 车次 tid 在 ranks（连续的站序）上的自由事件：时刻范围由当前方案 ± shift、模型时刻范围与前一事件的运行约束确定，
+    # 逐站向前传播，保证时刻约束总有解
+    def _free_events(self, model: _Model, tid, ranks, z, shift) -> list[_Event]:
+        plan = self.plan[tid]
+        earliest = self.earliest[tid]
+        kinds = self.kind[tid]
+        path = self.checi[tid].path
+        delay = self.scheduler_config.backtrack_max_delay
+        events = []
+        prev = None             # 前一事件发车时刻的范围
+        k0 = ranks[0]
+        if k0 > 0:
+            d = plan[k0 - 1][1]
+            prev = (d, d)
+        for rank in ranks:
+            kind = kinds[rank]
+            a_plan, d_plan, slot = plan[rank]
+            ea, ed = earliest[rank]
+            if kind == ORIGIN:
+                lo, hi = self._range(d_plan, ed, None, shift)
+                if tid in self.succ_cap:
+                    hi = max(lo, min(hi, self.succ_cap[tid]))
+                d = model.var(lo, hi)
+                events.append(_Event(tid, rank, kind, None, (d, 0), self._choices(model, tid, rank, z), z))
+                prev = (lo, hi)
+                continue
+            reach = (prev[0] + self.run_min[tid][rank], prev[1] + self.run_min[tid][rank] + delay)
+            lo, hi = self._range(a_plan, ea, reach, shift)
+            a = model.var(lo, hi)
+            if kind == MIDDLE:
+                s_min, s_max = path[rank].stop_time_range
+                dlo, dhi = self._range(d_plan, ed, (lo + s_min, hi + s_max), shift)
+                d = model.var(dlo, dhi)
+                model.row([(d, 1), (a, -1)], s_min, s_max)
+                prev = (dlo, dhi)
+                events.append(_Event(tid, rank, kind, (a, 0), (d, 0), self._choices(model, tid, rank, z), z))
+            else:
+                prev = (lo, hi)
+                events.append(_Event(tid, rank, kind, (a, 0), (a, 0) if kind == PASS else None,
+                                     self._choices(model, tid, rank, z), z))
+            if rank > k0:
+                p = events[-2]
+                model.row([(a, 1), (p.d[0], -1)], self.run_min[tid][rank], self.run_min[tid][rank] + delay)
+        return events
+
+    # 时刻范围：当前方案 ± shift 与模型范围 [最早, 最早 + max_delay] 的交，再与可达范围 reach 相交；
+    # 交为空时依次放宽，可达范围总是保留
+    def _range(self, plan_t, earliest, reach, shift) -> tuple[int, int]:
+        config = self.config
+        model_lo, model_hi = earliest, earliest + config.max_delay
+        lo, hi = max(plan_t - shift, model_lo), min(plan_t + shift, model_hi)
+        if reach is None:
+            return (lo, hi) if lo <= hi else (model_lo, model_hi)
+        for lo2, hi2 in ((lo, hi), (model_lo, model_hi)):
+            l, h = max(lo2, reach[0]), min(hi2, reach[1])
+            if l <= h:
+                return l, h
+        return reach
+
+    # 股道选择变量：交路前车终到与后车始发沿用当前方案的股道，通过站只有通过股道；其余为候选股道
+    def _choices(self, model: _Model, tid, rank, z) -> list[tuple[int, int]]:
+        kind = self.kind[tid][rank]
+        if kind == PASS or (kind == ORIGIN and tid in self.pred) or (kind == TERMINAL and tid in self.succ):
+            slot = self.plan[tid][rank][2]
+            slots = [slot] if slot >= 0 else []
+        else:
+            slots = [cand.slot for cand in self.candidates[tid][rank]]
+        choices = [(slot, model.var(0, 1)) for slot in slots]
+        # 恰选一条股道，或放弃车次
+        model.row([(x, 1) for _, x in choices] + [(z, 1)], 1, 1)
+        return choices
+
+    def _train_rows(self, model: _Model, e: _Event, by_rank) -> None:
+        config = self.config
+        tid = e.tid
+        big = config.max_delay + 2 * 86400
+        # 偏移量（放弃的车次不计）
+        if e.kind == ORIGIN:
+            self._early_rows(model, e, 1)
+        elif e.kind == TERMINAL:
+            self._late_rows(model, e, 1)
+        # 交路：后车始发 - 前车终到 ∈ [最小, 最大]（跨日加 86400）；另一方尚未进入窗时以当前方案为准，放弃任一车次时失效
+        if e.kind == TERMINAL and tid in self.succ and self.succ[tid] not in self.dropped:
+            s = self.succ[tid]
+            other = by_rank.get((s, 0))
+            self._exchange_row(model, tid, e.a, other.d if other is not None else self._plan_expr(s, 0, 1),
+                               [e.z] + ([other.z] if other is not None else []), big)
+        elif e.kind == ORIGIN and tid in self.pred:
+            p = self.pred[tid]
+            last = len(self.plan[p]) - 1
+            if (p, last) not in by_rank and p not in self.dropped:
+                self._exchange_row(model, p, self._plan_expr(p, last, 0), e.d, [e.z], big)
+
+    def _plan_expr(self, tid, rank, i):
+        return (-1, self.plan[tid][rank][i])
+
+    def _exchange_row(self, model: _Model, p, a_expr, d_expr, zs, big) -> None:
+        _, _, ex_min, ex_max = self.exchanges[p]
+        cross = self.cross[p]
+        terms = _terms(d_expr, 1) + _terms(a_expr, -1)
+        const = d_expr[1] - a_expr[1] + cross
+        model.row(terms + [(z, big) for z in zs], ex_min - const, np.inf)
+        model.row(terms + [(z, -big) for z in zs], -np.inf, ex_max - const)
+
+    # 事件的股道占用：(开始, 结束) 表达式，瞬时使用的结束为开始 + 1；交路前车的终到占用到后车始发
+    def _occupancy(self, e: _Event, by_rank, relaxed=False):
+        if e.kind == MIDDLE:
+            return e.a, e.d
+        if e.kind == TERMINAL and e.tid in self.succ and self.succ[e.tid] not in self.dropped:
+            s = self.succ[e.tid]
+            other = by_rank.get((s, 0))
+            if other is not None or not relaxed:
+                d = other.d if other is not None else self._plan_expr(s, 0, 1)
+                return e.a, (d[0], d[1] + self.cross[e.tid])
+        t = e.a if e.a is not None else e.d
+        return t, (t[0], t[1] + 1)
+
+    # 事件使用的进路：[(槽位, 选择变量列, 进路编号, 时刻)]
+    def _uses(self, e: _Event) -> list[tuple[int, int, int, tuple]]:
+        uses = []
+        for slot, x in e.choices:
+            e_in, e_out = self._entrances(e.tid, e.rank, slot)
+            if e.a is not None and e_in is not None:
+                uses.append((slot, x, e_in, e.a))
+            if e.d is not None and e_out is not None:
+                uses.append((slot, x, e_out, e.d))
+        return uses
+
+    # relaxed：交路后车始发不在 by_rank 中时，前车终到的占用只计到达时刻（下界用）
+    def _pair_rows(self, model: _Model, events: list[_Event], by_rank, relaxed=False) -> None:
+        order: dict[tuple, int] = {}        # 事件对（及各自的时刻）-> 次序变量
+        # 股道独占：按槽位分组，区间与区间、区间与瞬时使用两两检查
+        by_slot: dict[int, list] = {}
+        for e in events:
+            s, t = self._occupancy(e, by_rank, relaxed)
+            point = not (e.kind == MIDDLE or (e.kind == TERMINAL and t[1] != s[1] + 1) or t[0] != s[0])
+            for slot, x in e.choices:
+                by_slot.setdefault(slot, []).append((e, x, s, t, point))
+        for items in by_slot.values():
+            if len(items) < 2:
+                continue
+            items.sort(key=lambda item: _lo(model, item[2]))
+            for i, (e1, x1, s1, t1, p1) in enumerate(items):
+                h1 = _hi(model, t1)
+                for e2, x2, s2, t2, p2 in items[i + 1:]:
+                    if _lo(model, s2) >= h1:
+                        break
+                    if e1.tid == e2.tid or (p1 and p2) or (x1 < 0 and x2 < 0):
+                        continue
+                    # e1 在前：t1 <= s2；e2 在前：t2 <= s1
+                    self._disjunction(model, order, (id(e1), id(e2), 'track'),
+                                      (s2, t1, 0), (s1, t2, 0), [x1, x2])
+        # 进路间隔：e 的使用与其后继进路的使用
+        by_entrance: dict[int, list] = {}
+        for e in events:
+            for slot, x, eid, t in self._uses(e):
+                by_entrance.setdefault(eid, []).append((e, x, t))
+        former = self.net.gap_former
+        for eid, uses in by_entrance.items():
+            for eid2, gap in former[eid]:
+                others = by_entrance.get(eid2)
+                if not others:
+                    continue
+                for e1, x1, t1 in uses:
+                    l1, h1 = _lo(model, t1), _hi(model, t1)
+                    for e2, x2, t2 in others:
+                        if e1.tid == e2.tid or (x1 < 0 and x2 < 0):
+                            continue
+                        # 禁止 t1 <= t2 < t1 + gap：t2 >= t1 + gap，或 t1 >= t2 + 1
+                        if _hi(model, t2) < l1 or _lo(model, t2) >= h1 + gap:
+                            continue
+                        self._disjunction(model, order, (id(e1), id(t1), id(e2), id(t2)),
+                                          (t2, t1, gap), (t1, t2, 1), [x1, x2])
+
+    # 二选一：X1 - Y1 >= G1（次序变量为 1）或 X2 - Y2 >= G2（为 0）；acts 中的股道选择变量均为 1 时才生效
+    def _disjunction(self, model: _Model, order, key, b1, b2, acts) -> None:
+        (x1, y1, g1), (x2, y2, g2) = b1, b2
+        m1 = g1 - (_lo(model, x1) - _hi(model, y1))
+        m2 = g2 - (_lo(model, x2) - _hi(model, y2))
+        if m1 <= 0 or m2 <= 0:
+            return              # 其中一支总成立
+        if _hi(model, x1) - _lo(model, y1) < g1:
+            m1 = None           # 第一支不可能成立，只能取第二支
+        if _hi(model, x2) - _lo(model, y2) < g2:
+            m2 = None if m1 is not None else m2
+        acts = [x for x in acts if x >= 0]
+        if m1 is None or m2 is None:
+            # 只有一支可能成立：直接约束，股道选择变量为 0 时失效
+            (xx, yy, g), m = (b2, m2) if m1 is None else (b1, m1)
+            model.row(_terms(xx, 1) + _terms(yy, -1) + [(x, -m) for x in acts],
+                      g - m * len(acts) - xx[1] + yy[1], np.inf)
+            return
+        o = order.get(key)
+        if o is None:
+            o = order[key] = model.var(0, 1)
+        n = len(acts)
+        model.row(_terms(x1, 1) + _terms(y1, -1) + [(o, -m1)] + [(x, -m1) for x in acts],
+                  g1 - m1 - m1 * n - x1[1] + y1[1], np.inf)
+        model.row(_terms(x2, 1) + _terms(y2, -1) + [(o, m2)] + [(x, -m2) for x in acts],
+                  g2 - m2 * n - x2[1] + y2[1], np.inf)
+
+    # 把窗的解写回当前方案，并按运行约束顺延窗外以后的事件
+    def _apply(self, x, free: list[_Event], z_of) -> None:
+        value = lambda expr: int(round(x[expr[0]])) if expr[0] >= 0 else expr[1]
+        for tid, z in z_of.items():
+            if x[z] > 0.5:
+                self.dropped.add(tid)
+        touched = {}
+        for e in free:
+            if e.tid in self.dropped:
+                continue
+            entry = self.plan[e.tid][e.rank]
+            if e.a is not None:
+                entry[0] = value(e.a)
+            if e.d is not None:
+                entry[1] = value(e.d)
+            if e.kind == ORIGIN:
+                entry[0] = entry[1]
+            elif e.kind == TERMINAL:
+                entry[1] = entry[0]
+            for slot, col in e.choices:
+                if x[col] > 0.5:
+                    entry[2] = slot
+            touched[e.tid] = max(touched.get(e.tid, 0), e.rank)
+        delay = self.scheduler_config.backtrack_max_delay
+        for tid, rank in touched.items():
+            plan = self.plan[tid]
+            path = self.checi[tid].path
+            for k in range(rank + 1, len(plan)):
+                run = self.run_min[tid][k]
+                a = min(max(plan[k][0], plan[k - 1][1] + run), plan[k - 1][1] + run + delay)
+                if self.kind[tid][k] == MIDDLE:
+                    s_min, s_max = path[k].stop_time_range
+                    d = min(max(plan[k][1], a + s_min), a + s_max)
+                else:
+                    d = a
+                plan[k][0], plan[k][1] = a, d
+
+    # 确定的事件写为结果行；放弃的车次只有已确定的部分（没有时写出始发行，股道未定）
+    def _rows(self) -> list[list[ResultRow]]:
+        names = self.net.track_names
+        res: list[list[ResultRow]] = [[] for _ in range(max(self.checi, default=0) + 1)]
+        for tid, ts in self.checi.items():
+            rows = []
+            for rank in range(self.committed[tid]):
+                a, d, slot = self.plan[tid][rank]
+                kind = self.kind[tid][rank]
+                rows.append(ResultRow(station_id=ts.path[rank].id, track=names[slot] if slot >= 0 else None,
+                                      setoff_time=d if kind != TERMINAL else -999,
+                                      achieve_time=a if kind != ORIGIN else -999))
+            if not rows:
+                rows.append(ResultRow(station_id=ts.path[0].id, track=None, setoff_time=self.plan[tid][0][1], achieve_time=-999))
+            res[tid] = rows
+        return res
+
+    # 偏移量（相对目标时刻，不取模）：未放弃且到达终点的车次
+    def deviation(self, res, fail_set) -> int:
+        failed = set(fail_set)
+        total = 0
+        for tid in self.checi:
+            rows = res[tid]
+            if tid in failed or rows[-1].setoff_time != -999:
+                continue
+            setoff, achieve = self.target[tid]
+            total += abs(rows[0].setoff_time - setoff) + abs(rows[-1].achieve_time - achieve)
+        return total
+
+    def objective(self, res, fail_set) -> int:
+        return self.config.drop_penalty * len(fail_set) + self.deviation(res, fail_set)
+
+    # 目标值的下界：按调度结果 res 的时刻把事件分成长 window 的互不相交的组，各组松弛问题的下界之和
+    # 返回 (下界, 组数, 其中求得最优的组数)
+    def lower_bound(self, res: list[list[ResultRow]], components: list[list[int]] = None) -> tuple[float, int, int]:
+        config = self.config
+        if components is None:
+            components = interference_components(self.checi, self.net, self.candidates, self.exchanges)
+        self.plan = self._initial_plan(res)
+        self.dropped = set()
+        self.succ_cap = {}
+        total, groups, optimal = 0.0, 0, 0
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for component in components:
+                # 各车次的事件按时刻分组（同一车次在一组内的站序连续）
+                group_of: dict[int, dict[int, list[int]]] = {}
+                for tid in component:
+                    for rank in range(len(self.plan[tid])):
+                        g = self._key(tid, rank) // config.window
+                        group_of.setdefault(g, {}).setdefault(tid, []).append(rank)
+                spans = {tid: sum(1 for g in group_of.values() if tid in g) for tid in component}
+                for g in sorted(group_of):
+                    bound, solved = self._group_bound(group_of[g], spans)
+                    total += bound
+                    groups += 1
+                    optimal += solved
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return total, groups, optimal
+
+    def _group_bound(self, trains: dict[int, list[int]], spans: dict[int, int]) -> tuple[float, bool]:
+        config = self.config
+        model = _Model()
+        free: list[_Event] = []
+        big = config.max_delay + 2 * 86400
+        for tid, ranks in trains.items():
+            share = 1 / spans[tid]
+            z = model.var(0, 1, config.drop_penalty * share)
+            events = self._relaxed_events(model, tid, ranks, z)
+            free += events
+            # 偏移量的下界：由组内第一个、最后一个事件的时刻推出，按所在组数分摊
+            self._early_rows(model, events[0], share)
+            self._late_rows(model, events[-1], share)
+        by_rank = {(e.tid, e.rank): e for e in free}
+        for e in free:
+            if e.kind == TERMINAL and e.tid in self.succ and (self.succ[e.tid], 0) in by_rank:
+                other = by_rank[(self.succ[e.tid], 0)]
+                self._exchange_row(model, e.tid, e.a, other.d, [e.z, other.z], big)
+        self._pair_rows(model, free, by_rank, relaxed=True)
+        _, optimal, _, bound = model.solve(config.time_limit, config.mip_gap)
+        return (max(bound, 0.0) if bound is not None else 0.0), optimal
+
+    # 始发偏移的下界：始发发车 ∈ [t - 最长历时, t - 最短历时]，t 为事件 e 的第一个时刻；以权重 weight 计入目标
+    def _early_rows(self, model: _Model, e: _Event, weight) -> None:
+        big = self.config.max_delay + 2 * 86400
+        setoff = self.target[e.tid][0]
+        t, i = (e.a, 0) if e.a is not None else (e.d, 1)
+        early = model.var(0, big, weight, integer=False)
+        model.row([(early, 1), (t[0], 1), (e.z, big)], setoff + self.cum_min[e.tid][e.rank][i], np.inf)
+        model.row([(early, 1), (t[0], -1), (e.z, big)], -setoff - self.cum_max[e.tid][e.rank][i], np.inf)
+
+    # 终到偏移的下界：终到到达 ∈ [t + 其后最短历时, t + 其后最长历时]，t 为事件 e 的最后一个时刻
+    def _late_rows(self, model: _Model, e: _Event, weight) -> None:
+        big = self.config.max_delay + 2 * 86400
+        achieve = self.target[e.tid][1]
+        cum_min, cum_max = self.cum_min[e.tid], self.cum_max[e.tid]
+        t, i = (e.d, 1) if e.d is not None else (e.a, 0)
+        rest_min = cum_min[-1][0] - cum_min[e.rank][i]
+        rest_max = cum_max[-1][0] - cum_max[e.rank][i]
+        late = model.var(0, big, weight, integer=False)
+        model.row([(late, 1), (t[0], -1), (e.z, big)], rest_min - achieve, np.inf)
+        model.row([(late, 1), (t[0], 1), (e.z, big)], achieve - rest_max, np.inf)
+
+    # 下界用的事件：时刻范围为模型范围（不受当前方案限制），组内相邻站序之间有运行约束
+    def _relaxed_events(self, model: _Model, tid, ranks, z) -> list[_Event]:
+        config = self.config
+        earliest = self.earliest[tid]
+        kinds = self.kind[tid]
+        path = self.checi[tid].path
+        delay = self.scheduler_config.backtrack_max_delay
+        events = []
+        for rank in ranks:
+            kind = kinds[rank]
+            ea, ed = earliest[rank]
+            choices = self._choices(model, tid, rank, z)
+            if kind == ORIGIN:
+                d = model.var(ed, ed + config.max_delay)
+                events.append(_Event(tid, rank, kind, None, (d, 0), choices, z))
+                continue
+            a = model.var(ea, ea + config.max_delay)
+            if kind == MIDDLE:
+                d = model.var(ed, ed + config.max_delay + path[rank].stop_time_range[1])
+                model.row([(d, 1), (a, -1)], *path[rank].stop_time_range)
+                events.append(_Event(tid, rank, kind, (a, 0), (d, 0), choices, z))
+            else:
+                events.append(_Event(tid, rank, kind, (a, 0), (a, 0) if kind == PASS else None, choices, z))
+            if len(events) > 1:
+                p = events[-2]
+                model.row([(a, 1), (p.d[0], -1)], self.run_min[tid][rank], self.run_min[tid][rank] + delay)
+        return events
+
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--window', type=int, default=1800)
+    parser.add_argument('--step', type=int, default=900)
+    parser.add_argument('--shift', type=int, default=600)
+    parser.add_argument('--retry-shift', type=int, default=1800)
+    parser.add_argument('--time-limit', type=float, default=5.0, help="每个模型的求解时限（秒）")
+    parser.add_argument('--bound', action='store_true', help="计算目标值的下界与最优性差距")
+    parser.add_argument('--validate', action='store_true', help="用 validate.py 校验调度模拟与优化后的方案")
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    info = loader.load()
+    net = loader.get('整数索引')
+    candidates = loader.get('候选股道')
+    config = HorizonConfig(window=args.window, step=args.step, shift=args.shift, retry_shift=args.retry_shift,
+                          time_limit=args.time_limit)
+    horizon = RollingHorizon(info, net, candidates, config)
+
+    scheduler = Scheduler(info, SchedulerConfig(verbose=False), net=net, candidates=candidates)
+    scheduler.run()
+    greedy = horizon.objective(scheduler.res, scheduler.fail_set)
+    # 调度模拟的方案不一定满足模型约束，其目标值不是模型的可行值，不与下界比较
+    print(f"调度模拟：失败 {len(scheduler.fail_set)}，偏移量 {horizon.deviation(scheduler.res, scheduler.fail_set)}，"
+          f"目标 {greedy}（不一定满足模型约束，不与下界比较）")
+    result = horizon.run(scheduler.res)
+    print(f"滚动时域：失败 {len(result.fail_set)}，偏移量 {result.deviation}，目标 {result.objective}；"
+          f"{result.windows} 个窗（最优 {result.optimal}，超时 {result.limited}，无解沿用 {result.fallback}），耗时 {result.seconds:.1f}s")
+    checked = None
+    if args.bound or args.validate:
+        from validate import ScheduleValidator
+        validator = ScheduleValidator(info, net)
+        checked = validator.check(result.res)
+    if args.bound:
+        t = time.perf_counter()
+        bound, groups, solved = horizon.lower_bound(scheduler.res)
+        print(f"下界 {bound:.0f}（{groups} 组，最优 {solved}，耗时 {time.perf_counter() - t:.1f}s）")
+        # 最优性差距只对滚动时域的方案给出，且要求其为模型的可行解：没有沿用调度模拟方案的窗、校验无违反约束
+        if result.fallback == 0 and checked.ok:
+            gap = (result.objective - bound) / result.objective if result.objective else 0.0
+            print(f"最优性差距（滚动时域方案）{gap:.1%}")
+        else:
+            print(f"最优性差距：不给出（滚动时域方案有 {result.fallback} 个窗沿用调度模拟方案、"
+                  f"违反约束 {len(checked.violations)} 条，不是模型的可行解）")
+    if args.validate:
+        print("调度模拟", validator.check(scheduler.res).summary())
+        print("滚动时域", checked.summary())
@@ -0,0 +1,309 @@
+# 调度引擎的计数、计时与决策追踪
+#   python instrument.py [--data data] [--no-events] [--no-tracks] [--no-probes] [--timing] [--trace 追踪.jsonl]
+# 插桩不改动 Scheduler 的代码：attach() 在引擎（及其事件队列）实例上以同名属性覆盖被统计的方法，
+# detach() 删除这些属性后恢复为类上的原方法。_run() 在开始时把方法绑定为局部变量，
+# 未插桩的引擎没有任何额外判断，关闭的统计项不安装对应的包装，代价为零。
+# - events：按类型统计弹出的事件（origin 始发、arrival 中间站到站、departure 中间站离站、pass 通过、terminal 终到）；
+#   失效事件数、堆的最大长度等取自 EventQueue.stats()（队列本身一直统计）。
+#   进路以不可用窗口表示（见 scheduler.py），不产生解锁事件，没有对应的事件类型
+# - tracks：get_available_tracks 与放宽预算的 backtrack_get_available_tracks 的调用次数及扫描的候选股道数
+# - probes：放宽预算的查询次数、可行次数，以及其中进路最早空闲时刻的查询次数（股道与进路交替查询的迭代数）
+# - timing：按事件类型累计处理耗时（从弹出事件到弹出下一个事件），弹出本身另计为 pop
+# - trace：逐条记录决策（选定的股道与延迟、推迟执行、失败及冲突资源、回溯等日志），可导出为 JSON lines
+# 回滚、回退撤销的事件不从统计中扣除（与 EventQueue 的统计相同）。
+import json
+import time
+import argparse
+from dataclasses import dataclass
+
+from network import FACHE
+from scheduler import Scheduler
+
+EVENT_KINDS = ('origin', 'arrival', 'departure', 'pass', 'terminal')
+
+
+# 统计项开关
+@dataclass
+class InstrumentConfig:
+    events: bool = True     # 按类型统计弹出的事件
+    tracks: bool = True     # 可用股道查询次数与扫描的候选股道数
+    probes: bool = True     # 放宽预算的查询与其中的进路空闲时刻查询
+    timing: bool = False    # 按事件类型累计耗时
+    trace: bool = False     # 决策追踪
+
+
+class Instrument:
+    def __init__(self, scheduler: Scheduler, config: InstrumentConfig = None) -> None:
+        self.scheduler = scheduler
+        self.config = config or InstrumentConfig()
+        self.attached = False
+        self.clear()
+
+    def clear(self) -> None:
+        self.events = dict.fromkeys(EVENT_KINDS, 0)
+        self.seconds = dict.fromkeys(EVENT_KINDS + ('pop',), 0.0)
+        self.track_queries = 0
+        self.backtrack_track_queries = 0
+        self.candidates_scanned = 0
+        self.backtrack_probes = 0
+        self.backtrack_feasible = 0
+        self.backtrack_iterations = 0
+        self.trace: list[dict] = []
+        self._event = None          # 正在处理的事件：(时刻, 车次ID, 站序, 是否到达, 延迟预算)
+        self._kind = None
+        self._since = None
+        self._backtracking = False  # 当前事件是否放宽了预算（追踪）
+        self._probing = False       # 是否在放宽预算的查询中（统计其中的进路查询）
+
+    # 事件类型
+    def kind_of(self, tid, rank, is_achieve) -> str:
+        path = self.scheduler.checi[tid].path
+        if not path[rank].is_ideal_stop:
+            return 'pass'
+        if rank == 0:
+            return 'origin'
+        if rank == len(path) - 1:
+            return 'terminal'
+        return 'arrival' if is_achieve else 'departure'
+
+    # 在引擎实例上安装包装；事件队列在 reset() 时重建，由包装后的 run() 在每次运行前安装
+    def attach(self) -> 'Instrument':
+        if self.attached:
+            return self
+        s = self.scheduler
+        config = self.config
+        cls = type(s)
+        s.run = self._run
+        if config.tracks or config.probes or config.trace:
+            s.get_available_tracks = self._get_available_tracks
+            s.backtrack_get_available_tracks = self._backtrack_get_available_tracks
+        if config.probes:
+            s.backtrack_check_entrance = self._backtrack_probe(cls.backtrack_check_entrance)
+            s.backtrack_check_pass = self._backtrack_probe(cls.backtrack_check_pass)
+            s.entrance_free_time = self._entrance_free_time
+        if config.trace:
+            s.choose_track = self._choose_track
+            s._fail = self._fail
+            s._log = self._log
+        self.attached = True
+        return self
+
+    def detach(self) -> None:
+        s = self.scheduler
+        for name in ('run', 'get_available_tracks', 'backtrack_get_available_tracks', 'backtrack_check_entrance',
+                     'backtrack_check_pass', 'entrance_free_time', 'choose_track', '_fail', '_log'):
+            s.__dict__.pop(name, None)
+        for name in ('pop', 'push'):
+            s.queue.__dict__.pop(name, None)
+        self.attached = False
+
+    def __enter__(self) -> 'Instrument':
+        return self.attach()
+
+    def __exit__(self, *exc) -> None:
+        self.detach()
+
+    def _run(self) -> bool:
+        s = self.scheduler
+        queue = s.queue
+        config = self.config
+        if config.events or config.timing or config.trace:
+            if 'pop' not in queue.__dict__:
+                queue.pop = self._pop(type(queue).pop.__get__(queue))
+        if config.trace and 'push' not in queue.__dict__:
+            queue.push = self._push(type(queue).push.__get__(queue))
+        self._since = time.perf_counter()
+        try:
+            return type(s).run(s)
+        finally:
+            # 最后一个事件的耗时
+            if config.timing and self._kind is not None:
+                self.seconds[self._kind] += time.perf_counter() - self._since
+            self._kind = None
+
+    def _pop(self, pop):
+        config = self.config
+        events = self.events
+        seconds = self.seconds
+        kind_of = self.kind_of
+        perf_counter = time.perf_counter
+
+        def wrapped():
+            if config.timing:
+                now = perf_counter()
+                if self._kind is not None:
+                    seconds[self._kind] += now - self._since
+                event = pop()
+                self._since = perf_counter()
+                seconds['pop'] += self._since - now
+            else:
+                event = pop()
+            self._event = event
+            self._backtracking = False
+            self._kind = kind = kind_of(event[1], event[2], event[3])
+            if config.events:
+                events[kind] += 1
+            return event
+        return wrapped
+
+    # 追踪：当前事件的车次在本事件中把自身改期到更晚时刻，即推迟执行
+    def _push(self, push):
+        def wrapped(key, t, rank=-1, is_achieve=True, max_delay_time=0):
+            event = self._event
+            if event is not None and key == event[1] and rank == event[2] and is_achieve == event[3] and t > event[0]:
+                self._record('wait', delay=t - event[0], until=t)
+            push(key, t, rank, is_achieve, max_delay_time)
+        return wrapped
+
+    def _get_available_tracks(self, ts, rank, action_time, max_delay_time):
+        if self.config.tracks:
+            self.track_queries += 1
+            self.candidates_scanned += len(self.scheduler.candidates[ts.id][rank])
+        return Scheduler.get_available_tracks(self.scheduler, ts, rank, action_time, max_delay_time)
+
+    def _backtrack_get_available_tracks(self, ts, rank, action_time, max_delay_time):
+        if self.config.tracks:
+            self.backtrack_track_queries += 1
+            self.candidates_scanned += len(self.scheduler.candidates[ts.id][rank])
+        self._backtracking = True
+        return self._probe(Scheduler.backtrack_get_available_tracks, ts, rank, action_time, max_delay_time)
+
+    def _backtrack_probe(self, method):
+        def wrapped(*args):
+            self._backtracking = True
+            return self._probe(method, *args)
+        return wrapped
+
+    # 放宽预算的查询：结果为非空的股道列表或时刻不为 -999 时可行
+    def _probe(self, method, *args):
+        if not self.config.probes:
+            return method(self.scheduler, *args)
+        self.backtrack_probes += 1
+        self._probing = True
+        try:
+            result = method(self.scheduler, *args)
+        finally:
+            self._probing = False
+        if result and (type(result) is list or result[0] != -999):
+            self.backtrack_feasible += 1
+        return result
+
+    def _entrance_free_time(self, eid, t) -> int:
+        if self._probing:
+            self.backtrack_iterations += 1
+        return Scheduler.entrance_free_time(self.scheduler, eid, t)
+
+    def _choose_track(self, available_tracks, strategy):
+        choice = Scheduler.choose_track(self.scheduler, available_tracks, strategy)
+        event = self._event
+        if event is not None:
+            self._record('track', track=self.scheduler.track_names[choice[0]], at=choice[1], delay=choice[1] - event[0],
+                         candidates=len(available_tracks), backtrack=self._backtracking, now=choice[3])
+        return choice
+
+    def _fail(self, tid) -> None:
+        if self._event is not None:
+            self._record('fail', conflict=self.conflict())
+        Scheduler._fail(self.scheduler, tid)
+
+    def _log(self, msg: str) -> None:
+        if self._event is not None:
+            self._record('log', message=msg)
+        Scheduler._log(self.scheduler, msg)
+
+    def _record(self, decision, **fields) -> None:
+        t, tid, rank, is_achieve, _ = self._event
+        record = {'decision': decision, 'kind': self._kind, 'time': t, 'tid': tid, 'rank': rank,
+                  'sid': self.scheduler.checi[tid].path[rank].id}
+        record.update(fields)
+        self.trace.append(record)
+
+    # 当前事件失败时的冲突资源：
+    # 通过站与离站为所需进路（进路ID与不可用窗口），到站与始发选股道为各候选股道（占用车次与最早空闲时刻）
+    def conflict(self) -> dict:
+        s = self.scheduler
+        t, tid, rank, is_achieve, _ = self._event
+        ts = s.checi[tid]
+        cands = s.candidates[tid][rank]
+        kind = self._kind
+        if kind == 'pass':
+            if not cands:
+                return {'entrances': []}
+            return {'entrances': [self._entrance(e) for e in (cands[0].entrance_in, cands[0].entrance_out)]}
+        track = s.res[tid][rank].track if rank < len(s.res[tid]) else None
+        if kind == 'departure' or kind == 'origin' and track is not None:
+            slot = s.net.slot_of[(ts.path[rank].id, track)]
+            eid = s.get_entrance(ts, rank, slot, FACHE)
+            return {'track': track, 'entrances': [self._entrance(eid)] if eid is not None else []}
+        tracks = []
+        for cand in cands:
+            free = Scheduler.track_free_time(s, cand.slot, t)
+            tracks.append({'track': s.track_names[cand.slot], 'occupant': s.track_occupant[cand.slot],
+                           'free': free})
+        return {'tracks': tracks}
+
+    def _entrance(self, eid) -> dict:
+        s = self.scheduler
+        return {'entrance': s.net.entrance_ids[eid], 'busy': s.entrance_busy[eid], 'free': s.entrance_free[eid]}
+
+    # 计数与计时（事件队列的统计一并给出）
+    def counters(self) -> dict:
+        config = self.config
+        counters = {}
+        if config.events:
+            counters['events'] = dict(self.events)
+            counters['queue'] = self.scheduler.queue.stats()
+        if config.tracks:
+            counters['track_queries'] = self.track_queries
+            counters['backtrack_track_queries'] = self.backtrack_track_queries
+            counters['candidates_scanned'] = self.candidates_scanned
+        if config.probes:
+            counters['backtrack_probes'] = self.backtrack_probes
+            counters['backtrack_feasible'] = self.backtrack_feasible
+            counters['backtrack_iterations'] = self.backtrack_iterations
+        if config.timing:
+            counters['seconds'] = dict(self.seconds)
+        return counters
+
+    # 导出决策追踪：每行一条 JSON 记录；counters=True 时首行为计数
+    def write_trace(self, path, counters: bool = True) -> int:
+        with open(path, 'w', encoding='utf-8') as f:
+            if counters:
+                f.write(json.dumps({'decision': 'counters', **self.counters()}, ensure_ascii=False) + '\n')
+            for record in self.trace:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return len(self.trace)
+
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+    from scheduler import SchedulerConfig
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--no-events', action='store_true')
+    parser.add_argument('--no-tracks', action='store_true')
+    parser.add_argument('--no-probes', action='store_true')
+    parser.add_argument('--timing', action='store_true')
+    parser.add_argument('--trace', help="决策追踪的输出文件（JSON lines）")
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+    t = time.perf_counter()
+    scheduler.run()
+    print(f"未插桩调度耗时 {time.perf_counter() - t:.3f}s，失败 {len(scheduler.fail_set)}")
+
+    config = InstrumentConfig(events=not args.no_events, tracks=not args.no_tracks, probes=not args.no_probes,
+                              timing=args.timing, trace=args.trace is not None)
+    scheduler.reset()
+    with Instrument(scheduler, config) as instrument:
+        t = time.perf_counter()
+        scheduler.run()
+        elapsed = time.perf_counter() - t
+    print(f"插桩调度耗时 {elapsed:.3f}s，失败 {len(scheduler.fail_set)}")
+    for name, value in instrument.counters().items():
+        print(f"{name}: {value}")
+    if args.trace:
+        n = instrument.write_trace(args.trace)
+        print(f"决策追踪 {n} 条 -> {args.trace}")
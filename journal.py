@@ -0,0 +1,316 @@
+# 撤销日志：记录调度状态的每一次修改，可在任意事件处打检查点，并以与其后修改量成正比的代价回滚
+#   mark = journal.mark(); ...修改...; journal.rollback(mark)
+# 每条记录为元组 (撤销函数, *参数)，回滚时按相反顺序调用；检查点为记录的绝对序号，丢弃旧记录（trim）后仍然有效
+from operator import setitem, delitem
+
+
+class Journal:
+    __slots__ = ('log', 'base')
+
+    def __init__(self) -> None:
+        self.log: list[tuple] = []
+        self.base = 0               # log[0] 的绝对序号（之前的记录已丢弃）
+
+    def __len__(self) -> int:
+        return len(self.log)
+
+    # 当前检查点
+    def mark(self) -> int:
+        return self.base + len(self.log)
+
+    # 登记一条撤销操作：回滚时调用 fn(*args)
+    def record(self, fn, *args) -> None:
+        self.log.append((fn, *args))
+
+    # 带记录的修改
+    def setitem(self, seq, i, value) -> None:
+        self.log.append((setitem, seq, i, seq[i]))
+        seq[i] = value
+
+    def setattr(self, obj, name: str, value) -> None:
+        self.log.append((setattr, obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def append(self, seq: list, value) -> None:
+        self.log.append((delitem, seq, -1))
+        seq.append(value)
+
+    # 字典的键：设置/删除
+    def setkey(self, d: dict, key, value) -> None:
+        if key in d:
+            self.log.append((setitem, d, key, d[key]))
+        else:
+            self.log.append((d.pop, key))
+        d[key] = value
+
+    def popkey(self, d: dict, key) -> None:
+        if key in d:
+            self.log.append((setitem, d, key, d.pop(key)))
+
+    # 替换列表的全部内容
+    def replace(self, seq: list, values: list) -> None:
+        self.log.append((setitem, seq, slice(None), seq[:]))
+        seq[:] = values
+
+    # 撤销检查点 mark 之后的全部修改
+    def rollback(self, mark: int) -> None:
+        if mark < self.base:
+            raise ValueError(f"检查点 {mark} 早于已丢弃的记录（{self.base}）")
+        log = self.log
+        n = mark - self.base
+        while len(log) > n:
+            entry = log.pop()
+            entry[0](*entry[1:])
+
+    # 丢弃检查点 mark 之前的记录（此后不能再回滚到 mark 之前）
+    def trim(self, mark: int) -> None:
+        n = mark - self.base
+        if n > 0:
+            del self.log[:n]
+            self.base = mark
+
+
+# 随机化的检查点/回滚等价性检查：
+#   python journal.py --check [--rounds 2000] [--seed 0] [--data data]
+# - Journal：对列表、字典与对象属性随机修改，嵌套打检查点，回滚后与检查点处的深拷贝比较；trim 之后回滚到更早的检查点应报错
+# - Timeline：随机 add/remove/prune，与按整数时刻的集合模型比较（区间合并、返回值），回滚后与检查点处的区间比较
+# - EventQueue：随机 push/cancel/pop，弹出顺序与按 (时刻, 序号) 的字典模型比较，回滚后比较待处理事件，并在回滚后排空队列核对顺序
+# - 给出 --data 时：以 reset(history=True) 运行 Scheduler，记录若干事件处理前的状态，逐个 rewind 后比较，再重新运行应得到相同结果
+if __name__ == '__main__':
+    import copy
+    import random
+    import argparse
+
+    import eventqueue
+    from timeline import Timeline
+    from eventqueue import EventQueue
+
+    class _Obj:
+        def __init__(self) -> None:
+            self.a = 0
+            self.b = None
+
+    def _marks(rng, journal, stack, snapshot, check) -> None:
+        # 随机打检查点或回滚到栈中的某个检查点
+        r = rng.random()
+        if r < 0.15:
+            stack.append((journal.mark(), snapshot()))
+        elif r < 0.25 and stack:
+            k = rng.randrange(len(stack))
+            mark, state = stack[k]
+            del stack[k + 1:]
+            journal.rollback(mark)
+            check(state, "回滚")
+
+    def check_journal(rng, rounds: int) -> None:
+        journal = Journal()
+        seq, d, obj = [], {}, _Obj()
+        snapshot = lambda: copy.deepcopy((seq, d, vars(obj)))
+
+        def check(state, where):
+            assert (seq, d, vars(obj)) == state, f"Journal {where}后状态不一致"
+
+        stack = [(journal.mark(), snapshot())]
+        for _ in range(rounds):
+            op = rng.randrange(7)
+            if op == 0 and seq:
+                journal.setitem(seq, rng.randrange(len(seq)), rng.randrange(100))
+            elif op == 1:
+                journal.setattr(obj, rng.choice('ab'), rng.randrange(100))
+            elif op == 2:
+                journal.append(seq, rng.randrange(100))
+            elif op == 3:
+                journal.setkey(d, rng.randrange(8), rng.randrange(100))
+            elif op == 4:
+                journal.popkey(d, rng.randrange(8))
+            elif op == 5:
+                journal.replace(seq, [rng.randrange(100) for _ in range(rng.randrange(5))])
+            elif op == 6 and len(stack) > 1 and rng.random() < 0.1:
+                # 丢弃最早检查点之前的记录：此后回滚到更早的位置应报错
+                k = rng.randrange(1, len(stack))
+                journal.trim(stack[k][0])
+                early = stack[0][0]
+                del stack[:k]
+                if early < stack[0][0]:
+                    try:
+                        journal.rollback(early)
+                    except ValueError:
+                        pass
+                    else:
+                        raise AssertionError("回滚到已丢弃的检查点未报错")
+            _marks(rng, journal, stack, snapshot, check)
+        journal.rollback(stack[0][0])
+        check(stack[0][1], "回滚到最早检查点")
+
+    def check_timeline(rng, rounds: int, span: int = 200) -> None:
+        journal = Journal()
+        timeline = Timeline(journal)
+        model: set[int] = set()
+        snapshot = lambda: (list(timeline), set(model))
+
+        def check(state, where):
+            assert list(timeline) == state[0], f"Timeline {where}后区间不一致：{timeline} != {state[0]}"
+            model.clear()
+            model.update(state[1])
+
+        def check_model():
+            items = list(timeline)
+            for (s1, e1), (s2, e2) in zip(items, items[1:]):
+                assert s1 < e1 < s2 < e2, f"Timeline 区间未合并或无序：{timeline}"
+            times = {t for s, e in items for t in range(s, e)}
+            assert times == model, f"Timeline 与集合模型不一致：{timeline}"
+            for _ in range(3):
+                t = rng.randrange(span)
+                assert timeline.busy(t) == (t in model)
+                e = t
+                while e in model:
+                    e += 1
+                assert timeline.earliest(t) == e
+
+        stack = [(journal.mark(), snapshot())]
+        for _ in range(rounds):
+            op = rng.random()
+            start = rng.randrange(span)
+            end = start + rng.randrange(1, 30)
+            if op < 0.6:
+                new = set(range(start, end)) - model
+                assert timeline.add(start, end) == bool(new), "Timeline.add 返回值错误"
+                model.update(new)
+            elif op < 0.9:
+                timeline.remove(start, end)
+                model.difference_update(range(start, end))
+            else:
+                kept = {t for s, e in timeline if e > start for t in range(s, e)}
+                timeline.prune(start)
+                model.intersection_update(kept)
+            check_model()
+            _marks(rng, journal, stack, snapshot, check)
+        journal.rollback(stack[0][0])
+        check(stack[0][1], "回滚到最早检查点")
+
+    def check_queue(rng, rounds: int, n_keys: int = 16) -> None:
+        journal = Journal()
+        queue = EventQueue(n_keys, journal)
+        model: dict[int, tuple] = {}        # 键 -> (时刻, 序号, 站序, 是否到达, 延迟预算)
+        snapshot = lambda: (list(queue.seq_of), list(queue.pending), queue.live, dict(model))
+
+        def drain() -> list[tuple]:
+            out = []
+            while queue:
+                out.append(queue.pop())
+            return out
+
+        def expected(m: dict) -> list[tuple]:
+            return [(t, key, rank, a, delay) for key, (t, _, rank, a, delay) in sorted(m.items(), key=lambda x: x[1][:2])]
+
+        def check(state, where):
+            assert (list(queue.seq_of), list(queue.pending), queue.live) == state[:3], f"EventQueue {where}后待处理事件不一致"
+            model.clear()
+            model.update(state[3])
+            # 回滚后排空队列，弹出顺序应与模型一致；再回滚到排空之前
+            mark = journal.mark()
+            assert drain() == expected(model), f"EventQueue {where}后弹出顺序不一致"
+            journal.rollback(mark)
+            assert (list(queue.seq_of), list(queue.pending), queue.live) == state[:3]
+
+        stack = [(journal.mark(), snapshot())]
+        for _ in range(rounds):
+            op = rng.random()
+            key = rng.randrange(n_keys)
+            if op < 0.5:
+                t = rng.randrange(100)
+                event = (t, queue.next_seq, rng.randrange(5), rng.random() < 0.5, rng.randrange(10))
+                queue.push(key, t, *event[2:])
+                model[key] = event
+            elif op < 0.7:
+                assert queue.cancel(key) == (key in model), "EventQueue.cancel 返回值错误"
+                model.pop(key, None)
+            elif queue:
+                first = expected(model)[0]
+                assert queue.pop() == first, "EventQueue 弹出顺序不一致"
+                del model[first[1]]
+            assert len(queue) == len(model)
+            assert all(queue.time_of(k) == (model[k][0] if k in model else None) for k in range(n_keys))
+            _marks(rng, journal, stack, snapshot, check)
+        journal.rollback(stack[0][0])
+        check(stack[0][1], "回滚到最早检查点")
+
+    # 调度状态中随事件处理与回退变化的部分（不含统计计数与处理序号）
+    def _freeze(value):
+        if isinstance(value, Timeline):
+            return tuple(value)
+        if isinstance(value, (list, tuple)):
+            return tuple(_freeze(v) for v in value)
+        if isinstance(value, dict):
+            return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+        if isinstance(value, set):
+            return frozenset(value)
+        if hasattr(value, '__dataclass_fields__'):
+            return tuple(getattr(value, f) for f in value.__dataclass_fields__)
+        return value
+
+    def scheduler_state(s) -> tuple:
+        names = ['res', 'fail_set', 'track_occupant', 'track_unlock', 'held_track', 'track_timeline',
+                 'checkpoint', 'rollbacks', 'excluded'] + sorted(n for n in vars(s) if n.startswith('entrance_'))
+        return tuple(_freeze(getattr(s, n)) for n in names) + (_freeze(s.queue.seq_of), _freeze(s.queue.pending))
+
+    def check_scheduler(rng, data_dir: str, samples: int) -> None:
+        from dataloader import TableLoader
+        from scheduler import Scheduler, SchedulerConfig
+        from validate import ScheduleValidator
+
+        loader = TableLoader(data_dir)
+        scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+        scheduler.reset(history=True)
+        # 首次运行中记录处理序号为 p 的事件处理前的状态；被回溯撤销的事件不在处理记录中，回退到它们时
+        # 实际回退到撤销范围的起点，因此只比较运行结束后仍在记录中的事件
+        targets = set(rng.sample(range(1, 4 * scheduler.queue.live), min(samples, 4 * scheduler.queue.live - 1)))
+        states = {}
+        pop = scheduler.queue.pop
+
+        def recording_pop():
+            if scheduler.processed + 1 in targets:
+                states[scheduler.processed + 1] = scheduler_state(scheduler)
+            return pop()
+
+        scheduler.queue.pop = recording_pop
+        scheduler.run()
+        del scheduler.queue.pop
+        final = scheduler_state(scheduler)
+        kept = {h[5] for h in scheduler.history}
+        positions = sorted((p for p in states if p in kept), reverse=True)
+        for p in positions:
+            scheduler.rewind(p)
+            assert scheduler_state(scheduler) == states[p], f"Scheduler 回退到处理序号 {p} 之前的状态不一致"
+        scheduler.run()
+        assert scheduler_state(scheduler) == final, "Scheduler 回退后重新运行的结果不一致"
+        # 回退到随机位置后立即重新运行
+        for i in rng.sample(range(len(scheduler.history)), min(5, len(scheduler.history))):
+            scheduler.rewind(scheduler.history[i][5])
+            scheduler.run()
+            assert scheduler_state(scheduler) == final, f"Scheduler 回退到第 {i} 个事件并重新运行的结果不一致"
+        print(f"Scheduler：{len(scheduler.history)} 个事件（回溯 {sum(scheduler.rollbacks)} 次），回退比较 {len(positions)} 处，一致")
+        report = ScheduleValidator(loader.load(), loader.get('整数索引')).check(scheduler.res)
+        print(f"约束{'满足' if report.ok else '不满足'}，{report.summary()}")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--check', action='store_true', help="随机化的检查点/回滚等价性检查")
+    parser.add_argument('--rounds', type=int, default=2000, help="每个结构的随机操作数")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=None, help="给出时同时检查 Scheduler 的回退")
+    parser.add_argument('--samples', type=int, default=50, help="Scheduler 回退比较的位置数")
+    args = parser.parse_args()
+
+    if args.check:
+        rng = random.Random(args.seed)
+        # 压缩阈值调小，使压缩与回滚交错发生
+        eventqueue.COMPACT_MIN = 8
+        check_journal(rng, args.rounds)
+        print(f"Journal：{args.rounds} 次操作，一致")
+        check_timeline(rng, args.rounds)
+        print(f"Timeline：{args.rounds} 次操作，一致")
+        check_queue(rng, args.rounds)
+        print(f"EventQueue：{args.rounds} 次操作，一致")
+        eventqueue.COMPACT_MIN = 1024
+        if args.data is not None:
+            check_scheduler(rng, args.data, args.samples)
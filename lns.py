@@ -0,0 +1,210 @@
+# 大邻域搜索：在贪心调度方案上反复“破坏—修复”，在时间预算内改进方案
+#   python lns.py [--data data] [--budget 10] [--seed 0] [--window 1800] [--check] [--validate]
+# - 目标：失败车次数（同一车次多次失败只计一次）最少，其次总偏移量（与 plan2.py 统计单元口径一致）最小
+# - 破坏：选一个目标车次（失败车次，或抽样中偏移量最大的车次），给出一组“到站不选某股道”的约束：
+#   车次邻域：目标车次在若干停车站不选当前股道；
+#   时间窗邻域：某站在 [t - window, t + window) 内到站的各车都不选各自的当前股道；
+#   放松：取消一条此前接受的约束
+# - 修复：约束经 Scheduler.avoid 加入所在分量的引擎（见 reschedule.py），引擎回退到受影响的最早事件，
+#   由调度模拟重新处理其后的事件，结果与调度模拟一样满足股道与进路间隔约束
+# - 评估：只对重新处理过事件的车次（Scheduler.touched）重算偏移量与失败状态，增量更新目标
+# - 接受：目标变好（放松时不变差）则保留；否则恢复约束并再次回退重放，得到原方案
+import gc
+import time
+import random
+import argparse
+from bisect import bisect_left
+from operator import itemgetter
+
+from scheduler import Scheduler, SchedulerConfig
+from reschedule import Rescheduler
+
+# 时间窗邻域最多破坏的车次数
+WINDOW_TRAINS = 6
+# 车次邻域最多破坏的停车站数
+TRAIN_STOPS = 2
+
+
+class LargeNeighborhoodSearch:
+    def __init__(self, rescheduler: Rescheduler, seed: int = 0, window: int = 1800) -> None:
+        self.rescheduler = rescheduler
+        self.checi = rescheduler.checi
+        self.rng = random.Random(seed)
+        self.window = window
+        self.tids = sorted(self.checi)
+        # 各车次的偏移量与失败车次集合，随每次修复增量更新
+        self.deviation = [0] * len(rescheduler.res)
+        for tid in self.tids:
+            self.deviation[tid] = rescheduler.engine_of[tid].train_deviation(tid)
+        self.failed = set(rescheduler.fail_set)
+        self.total = sum(self.deviation)
+        for engine in rescheduler.engines:
+            engine.touched.clear()
+        # 统计
+        self.moves = 0
+        self.accepted = 0
+        self.events = 0
+
+    # 当前目标：(失败车次数, 总偏移量)
+    def objective(self) -> tuple[int, int]:
+        return len(self.failed), self.total
+
+    # 在时间预算（秒）内搜索；返回 (尝试次数, 接受次数)
+    def run(self, budget: float, max_moves: int = None) -> tuple[int, int]:
+        deadline = time.perf_counter() + budget
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while time.perf_counter() < deadline and (max_moves is None or self.moves < max_moves):
+                self.step()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return self.moves, self.accepted
+
+    # 一次破坏—修复；返回是否接受
+    def step(self) -> bool:
+        rng = self.rng
+        if self.failed and rng.random() < 0.5:
+            tid = rng.choice(sorted(self.failed))
+        else:
+            tid = max(rng.sample(self.tids, min(4, len(self.tids))), key=self.deviation.__getitem__)
+        engine = self.rescheduler.engine_of[tid]
+        relax = engine.avoided and rng.random() < 0.1
+        if relax:
+            key = rng.choice(sorted(engine.avoided))
+            changes = {key: frozenset()}
+        elif tid in self.failed or rng.random() < 0.5:
+            changes = self._window_changes(engine, tid)
+        else:
+            changes = self._train_changes(engine, tid)
+        if not changes:
+            return False
+        self.moves += 1
+        before = self.objective()
+        old = {key: engine.avoided.get(key, frozenset()) for key in changes}
+        saved = self._apply(engine, changes)
+        after = self.objective()
+        if after < before or relax and after == before:
+            self.accepted += 1
+            return True
+        # 拒绝：恢复约束后重放，方案与目标回到修改前
+        self._apply(engine, old)
+        for tid, (deviation, failed) in saved.items():
+            self._set(tid, deviation, failed)
+        return False
+
+    # 加入约束并修复，增量更新目标；返回被重新处理车次的原 (偏移量, 是否失败)
+    def _apply(self, engine: Scheduler, changes: dict[tuple[int, int], frozenset[int]]) -> dict[int, tuple[int, bool]]:
+        n = engine.processed
+        for (tid, rank), slots in changes.items():
+            engine.avoid(tid, rank, slots)
+        engine.run()
+        self.events += engine.processed - n
+        touched = engine.touched
+        engine.touched = set()
+        failed = set(engine.fail_set)
+        saved = {}
+        for tid in touched:
+            saved[tid] = (self.deviation[tid], tid in self.failed)
+            self._set(tid, engine.train_deviation(tid), tid in failed)
+        return saved
+
+    def _set(self, tid, deviation, failed) -> None:
+        self.total += deviation - self.deviation[tid]
+        self.deviation[tid] = deviation
+        if failed:
+            self.failed.add(tid)
+        else:
+            self.failed.discard(tid)
+
+    # 在 (车次, 站序) 追加不选其当前股道的约束；股道未定或已无其他候选时返回 None
+    def _avoid_current(self, engine: Scheduler, tid, rank) -> frozenset[int]:
+        rows = engine.res[tid]
+        if rank >= len(rows) or rows[rank].track is None:
+            return None
+        slot = engine.net.slot_of[(rows[rank].station_id, rows[rank].track)]
+        slots = engine.avoided.get((tid, rank), frozenset()) | {slot}
+        if len(slots) >= len(engine.candidates[tid][rank]):
+            return None
+        return slots
+
+    # 车次邻域：目标车次在至多 TRAIN_STOPS 个已安排股道的停车站不选当前股道
+    def _train_changes(self, engine: Scheduler, tid) -> dict[tuple[int, int], frozenset[int]]:
+        path = self.checi[tid].path
+        ranks = [rank for rank in range(1, len(engine.res[tid])) if path[rank].is_ideal_stop]
+        changes = {}
+        for rank in self.rng.sample(ranks, min(TRAIN_STOPS, len(ranks))):
+            slots = self._avoid_current(engine, tid, rank)
+            if slots is not None:
+                changes[(tid, rank)] = slots
+        return changes
+
+    # 时间窗邻域：目标车次最后到达（失败车次为受阻）的车站，在其到达前后 window 内到站的车次不选各自的当前股道
+    def _window_changes(self, engine: Scheduler, tid) -> dict[tuple[int, int], frozenset[int]]:
+        rows = engine.res[tid]
+        row = rows[-1]
+        sid = row.station_id
+        t = row.achieve_time if row.achieve_time != -999 else row.setoff_time
+        # 处理记录基本按时刻排序（交路跨日对齐除外），二分定位时间窗后顺序扫描
+        history = engine.history
+        i = bisect_left(history, t - self.window, key=itemgetter(1))
+        group = []
+        while i < len(history) and history[i][1] < t + self.window:
+            _, _, _tid, rank, is_achieve, _ = history[i]
+            station = self.checi[_tid].path[rank]
+            if is_achieve and rank > 0 and station.id == sid and station.is_ideal_stop and (_tid, rank) not in group:
+                group.append((_tid, rank))
+            i += 1
+        changes = {}
+        for _tid, rank in self.rng.sample(group, min(WINDOW_TRAINS, len(group))):
+            slots = self._avoid_current(engine, _tid, rank)
+            if slots is not None:
+                changes[(_tid, rank)] = slots
+        return changes
+
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+    from validate import ScheduleValidator
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--budget', type=float, default=10.0, help="搜索时间（秒）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--window', type=int, default=1800, help="时间窗邻域的半宽（秒）")
+    parser.add_argument('--check', action='store_true', help="与带全部约束的整体调度比较结果与目标")
+    parser.add_argument('--validate', action='store_true', help="用 validate.py 校验贪心方案与改进方案")
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    info = loader.load()
+    net = loader.get('整数索引')
+    candidates = loader.get('候选股道')
+    config = SchedulerConfig(verbose=False)
+
+    rescheduler = Rescheduler(info, net, candidates, config)
+    search = LargeNeighborhoodSearch(rescheduler, args.seed, args.window)
+    print(f"贪心方案：失败 {search.objective()[0]}，总偏移量 {search.objective()[1]}")
+    if args.validate:
+        validator = ScheduleValidator(info, net)
+        print(validator.check(rescheduler.res).summary())
+    t = time.perf_counter()
+    moves, accepted = search.run(args.budget)
+    elapsed = time.perf_counter() - t
+    print(f"搜索 {elapsed:.1f}s：尝试 {moves} 次，接受 {accepted} 次，重新处理 {search.events} 个事件")
+    print(f"改进方案：失败 {search.objective()[0]}，总偏移量 {search.objective()[1]}")
+    if args.validate:
+        print(validator.check(rescheduler.res).summary())
+
+    if args.check:
+        scheduler = Scheduler(info, config, net=net, candidates=candidates)
+        for engine in rescheduler.engines:
+            for (tid, rank), slots in engine.avoided.items():
+                scheduler.avoid(tid, rank, slots)
+        scheduler.run()
+        same = scheduler.res == rescheduler.res
+        objective = (len(scheduler.fail_set), scheduler.total_deviation())
+        print(f"整体调度：结果{'相同' if same else '不同'}，目标 {objective}{'一致' if objective == search.objective() else '不一致'}")
+        report = ScheduleValidator(info, net).check(rescheduler.res)
+        print(f"约束{'满足' if report.ok else '不满足'}，{report.summary()}")
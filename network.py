@@ -0,0 +1,155 @@
+# 整数化路网索引：股道、作业类型、进路均映射为从 0 开始的连续整数，
+# 调度热路径上以列表下标代替 (站, 股道名, 作业类型) 等字符串组合键的哈希查找。
+import numpy as np
+
+# 作业类型编码
+JIECHE = 0          # 接车
+FACHE = 1           # 发车
+PASS_JIECHE = 2     # 通过接车
+PASS_FACHE = 3      # 通过发车
+WORKTYPES = ['接车', '发车', '通过接车', '通过发车']
+
+
+class NetworkIndex:
+    def __init__(self) -> None:
+        # 股道槽位：每个 (车站ID, 股道名) 对应一个槽位号
+        self.track_names: list[str] = []                      # 槽位 -> 股道名
+        self.track_station: list[int] = []                    # 槽位 -> 车站ID
+        self.slot_of: dict[tuple[int, str], int] = {}         # (车站ID, 股道名) -> 槽位
+        self.station_slots: dict[int, list[int]] = {}         # 车站ID -> 槽位列表（车站股道顺序）
+        # 列车可用股道
+        self.stop_slots: dict[tuple[int, int], list[int]] = {}   # (车次ID, 车站ID) -> 停站股道槽位列表
+        self.pass_slot: dict[tuple[int, int], int] = {}          # (车次ID, 车站ID) -> 通过股道槽位
+        # 进路：原进路ID <-> 连续编号
+        self.entrance_ids: list[int] = []                     # 编号 -> 进路ID
+        self.entrance_index: dict[int, int] = {}              # 进路ID -> 编号
+        # 槽位 -> {相邻站ID: [各作业类型的进路编号或 None]}
+        self.entrance_of: list[dict[int, list[int]]] = []
+        # 进路间隔图（按进路编号）：邻接表与 CSR 数组两种形式
+        self.gap_former: list[list[tuple[int, int]]] = []     # 编号 -> [(后车进路编号, 最小间隔)]
+        self.gap_latter: list[list[tuple[int, int]]] = []     # 编号 -> [(前车进路编号, 最小间隔)]
+        self.gap_ptr: np.ndarray = None                       # 编号 e 的后继为 gap_next[gap_ptr[e]:gap_ptr[e+1]]
+        self.gap_next: np.ndarray = None
+        self.gap_time: np.ndarray = None
+
+    def slot(self, sid: int, track: str) -> int:
+        if (sid, track) not in self.slot_of:
+            self.slot_of[(sid, track)] = len(self.track_names)
+            self.track_names.append(track)
+            self.track_station.append(sid)
+            self.entrance_of.append({})
+        return self.slot_of[(sid, track)]
+
+    def entrance(self, eid: int) -> int:
+        if eid not in self.entrance_index:
+            self.entrance_index[eid] = len(self.entrance_ids)
+            self.entrance_ids.append(eid)
+        return self.entrance_index[eid]
+
+    # 查找进路编号：当前股道槽位、相邻站、作业类型；不存在时返回 None
+    def get_entrance(self, slot: int, neighbor_sid: int, worktype: int) -> int:
+        by_worktype = self.entrance_of[slot].get(neighbor_sid)
+        return by_worktype[worktype] if by_worktype is not None else None
+
+
+def build_network_index(tracks: dict[int, list[str]],
+                        stop_tracks: dict[tuple[int, int], list[str]],
+                        pass_tracks: dict[tuple[int, int], str],
+                        entrances: dict[tuple[int, int, str, str], int],
+                        min_time_gaps: dict[tuple[int, int], int]) -> NetworkIndex:
+    net = NetworkIndex()
+    for sid, names in tracks.items():
+        net.station_slots[sid] = [net.slot(sid, name) for name in names]
+    for (tid, sid), names in stop_tracks.items():
+        net.stop_slots[(tid, sid)] = [net.slot(sid, name) for name in names]
+    for (tid, sid), name in pass_tracks.items():
+        net.pass_slot[(tid, sid)] = net.slot(sid, name)
+
+    worktype_code = {name: code for code, name in enumerate(WORKTYPES)}
+    for (curr_sid, prev_sid, track, worktype), eid in entrances.items():
+        e = net.entrance(eid)
+        if worktype not in worktype_code:
+            continue
+        by_worktype = net.entrance_of[net.slot(curr_sid, track)].setdefault(prev_sid, [None] * len(WORKTYPES))
+        by_worktype[worktype_code[worktype]] = e
+
+    for eid1, eid2 in min_time_gaps:
+        net.entrance(eid1)
+        net.entrance(eid2)
+    n = len(net.entrance_ids)
+    net.gap_former = [[] for _ in range(n)]
+    net.gap_latter = [[] for _ in range(n)]
+    for (eid1, eid2), gap in min_time_gaps.items():
+        e1 = net.entrance_index[eid1]
+        e2 = net.entrance_index[eid2]
+        net.gap_former[e1].append((e2, gap))
+        net.gap_latter[e2].append((e1, gap))
+    net.gap_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in net.gap_former], out=net.gap_ptr[1:])
+    net.gap_next = np.array([e2 for x in net.gap_former for e2, _ in x], dtype=np.int64)
+    net.gap_time = np.array([gap for x in net.gap_former for _, gap in x], dtype=np.int64)
+    return net
+
+
+# 列车在某站的一个候选股道：槽位、进出该站的进路编号及其静态属性
+# 停站：entrance_in 为接车进路、entrance_out 为发车进路；通过：分别为通过接车、通过发车进路
+# 始发站没有 entrance_in，终到站没有 entrance_out（均为 None）
+class TrackCandidate:
+    __slots__ = ('slot', 'entrance_in', 'entrance_out', 'fanout')
+
+    def __init__(self, slot: int, entrance_in: int, entrance_out: int, fanout: int) -> None:
+        self.slot = slot
+        self.entrance_in = entrance_in
+        self.entrance_out = entrance_out
+        # 发车进路在进路间隔图中的后继数量（始发选股道时优先选影响小的）
+        self.fanout = fanout
+
+    def __getstate__(self):
+        return (self.slot, self.entrance_in, self.entrance_out, self.fanout)
+
+    def __setstate__(self, state) -> None:
+        self.slot, self.entrance_in, self.entrance_out, self.fanout = state
+
+    def __repr__(self) -> str:
+        return f"TrackCandidate(slot={self.slot}, entrance_in={self.entrance_in}, entrance_out={self.entrance_out}, fanout={self.fanout})"
+
+
+# 预计算每个车次、每个站序的候选股道：车次ID -> [站序 -> [TrackCandidate]]
+# 只保留所需作业类型的进路均存在的股道：
+# - 停站：中间站需要接车与发车进路，始发站只需发车进路，终到站只需接车进路；
+#   终到站若有交路接续，后车在同一股道始发，还需要后车的发车进路
+# - 通过：需要通过接车与通过发车进路
+def build_candidate_table(checi, net: NetworkIndex, exchanges: dict[int, tuple[int, int, int, int]]) -> dict[int, list[list[TrackCandidate]]]:
+    table: dict[int, list[list[TrackCandidate]]] = {}
+    for tid, ts in checi.items():
+        path = ts.path
+        last = len(path) - 1
+        ranks: list[list[TrackCandidate]] = []
+        for rank, station in enumerate(path):
+            sid = station.id
+            prev_sid = path[rank - 1].id if rank > 0 else None
+            next_sid = path[rank + 1].id if rank < last else None
+            cands: list[TrackCandidate] = []
+            if station.is_ideal_stop:
+                # 交路后车的下一站（后车在本股道发车）
+                follow_sid = None
+                if rank == last and tid in exchanges and exchanges[tid][0] in checi:
+                    follow_path = checi[exchanges[tid][0]].path
+                    follow_sid = follow_path[1].id if len(follow_path) > 1 else None
+                for slot in net.stop_slots.get((tid, sid), []):
+                    e_in = net.get_entrance(slot, prev_sid, JIECHE) if rank > 0 else None
+                    e_out = net.get_entrance(slot, next_sid, FACHE) if rank < last else None
+                    if (rank > 0 and e_in is None) or (rank < last and e_out is None):
+                        continue
+                    if follow_sid is not None and net.get_entrance(slot, follow_sid, FACHE) is None:
+                        continue
+                    cands.append(TrackCandidate(slot, e_in, e_out, len(net.gap_former[e_out]) if e_out is not None else 0))
+            elif (tid, sid) in net.pass_slot and 0 < rank < last:
+                slot = net.pass_slot[(tid, sid)]
+                e_in = net.get_entrance(slot, prev_sid, PASS_JIECHE)
+                e_out = net.get_entrance(slot, next_sid, PASS_FACHE)
+                if e_in is not None and e_out is not None:
+                    cands.append(TrackCandidate(slot, e_in, e_out, len(net.gap_former[e_out])))
+            ranks.append(cands)
+        table[tid] = ranks
+    return table
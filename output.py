@@ -0,0 +1,195 @@
+# 调度结果的流式列式输出：车次到达终点站、结果不再变化后即写出其各站记录，不在控制台逐行打印
+#   python output.py [--data data] [--out schedule.csv|schedule.parquet|schedule.arrow] [--batch-rows 65536]
+# - ResultWriter：按列缓存结果行，满 batch_rows 行写出一批（内存占用与批大小成正比）；
+#   格式由扩展名决定：.csv（标准库 csv）、.parquet（Parquet）、.arrow / .feather（Arrow IPC 文件），后两者需要 pyarrow
+# - StreamingResults：经 Scheduler.on_finish 接收终到的车次，结果不会再变化时交给 ResultWriter：
+#   撤销日志中终到之后的位置不早于所有停站车次的检查点（回溯只回滚到这些检查点），
+#   且交路前车（会改写本车的结果行）已写出；finish() 在调度结束后写出其余车次（含失败车次已安排的部分）
+# 每行：车次ID、站序、车站ID、股道、到达、发车（-999 写为空）、偏移（始发为发车偏移、终到为到达偏移，与 plan2.py 口径相同，其余为空）、状态
+import os
+import csv
+import time
+import argparse
+
+from scheduler import Scheduler, ResultRow
+
+COLUMNS = ('tid', 'rank', 'station_id', 'track', 'arrive', 'depart', 'deviation', 'status')
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+# 每批写出的行数
+BATCH_ROWS = 65536
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("写出 Parquet / Arrow IPC 需要安装 pyarrow（CSV 不需要）") from e
+    return pyarrow
+
+
+class ResultWriter:
+    def __init__(self, path: str, format: str = None, batch_rows: int = BATCH_ROWS) -> None:
+        self.path = path
+        self.format = format or FORMATS.get(os.path.splitext(path)[1].lower())
+        if self.format not in ('csv', 'parquet', 'arrow'):
+            raise ValueError(f"未知的输出格式：{path}")
+        self.batch_rows = batch_rows
+        self.columns: dict[str, list] = {name: [] for name in COLUMNS}
+        self.rows = 0               # 已写出的行数
+        self.trains = 0             # 已写出的车次数
+        if self.format == 'csv':
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(COLUMNS)
+        else:
+            pa = _pyarrow()
+            self._pa = pa
+            self._schema = pa.schema([('tid', pa.int32()), ('rank', pa.int32()), ('station_id', pa.int32()),
+                                      ('track', pa.string()), ('arrive', pa.int64()), ('depart', pa.int64()),
+                                      ('deviation', pa.int64()), ('status', pa.string())])
+            if self.format == 'parquet':
+                self._writer = pa.parquet.ParquetWriter(path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(path, self._schema)
+
+    # 缓存一个车次的结果行；ideal 为 (理想发车, 理想到达)，终到的车次写出始发与终到的偏移
+    def write_train(self, tid, rows: list[ResultRow], ideal: tuple[int, int], finished: bool) -> None:
+        c = self.columns
+        n = len(rows)
+        c['tid'] += [tid] * n
+        c['rank'] += range(n)
+        c['station_id'] += [r.station_id for r in rows]
+        c['track'] += [r.track for r in rows]
+        c['arrive'] += [r.achieve_time if r.achieve_time != -999 else None for r in rows]
+        c['depart'] += [r.setoff_time if r.setoff_time != -999 else None for r in rows]
+        deviation = [None] * n
+        if finished:
+            deviation[0] = rows[0].setoff_time % 86400 - ideal[0]
+            deviation[-1] = rows[-1].achieve_time % 86400 - ideal[1]
+        c['deviation'] += deviation
+        c['status'] += ['ok' if finished else 'failed'] * n
+        self.trains += 1
+        if len(c['tid']) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        c = self.columns
+        n = len(c['tid'])
+        if not n:
+            return
+        if self.format == 'csv':
+            self._csv.writerows(zip(*(c[name] for name in COLUMNS)))
+        else:
+            pa = self._pa
+            batch = pa.record_batch([pa.array(c[name], field.type) for name, field in zip(COLUMNS, self._schema)],
+                                    schema=self._schema)
+            if self.format == 'parquet':
+                self._writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                self._writer.write_batch(batch)
+        self.rows += n
+        for col in c.values():
+            col.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self.format == 'csv':
+            self._file.close()
+        else:
+            self._writer.close()
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class StreamingResults:
+    # check_every：每收到这么多终到车次检查一次哪些结果已不再变化
+    def __init__(self, scheduler: Scheduler, writer: ResultWriter, check_every: int = 256) -> None:
+        self.scheduler = scheduler
+        self.writer = writer
+        self.check_every = check_every
+        self.pending: dict[int, int] = {}       # 已终到、尚未写出的车次 -> 终到后的撤销日志位置
+        self.written: set[int] = set()
+        self.prev = {exchange[0]: tid for tid, exchange in scheduler.exchanges.items()}     # 交路后车 -> 前车
+        self._count = 0
+
+    def attach(self) -> 'StreamingResults':
+        if self.scheduler.history is not None:
+            raise ValueError("保留处理记录的引擎之后仍可回退，不能流式输出")
+        self.scheduler.on_finish = self._finished
+        return self
+
+    def _finished(self, tid) -> None:
+        journal = self.scheduler.journal
+        self.pending[tid] = journal.mark() if journal is not None else 0
+        self._count += 1
+        if self._count % self.check_every == 0:
+            self._flush()
+
+    # 写出结果不再变化的已终到车次；all_final 表示调度已结束
+    def _flush(self, all_final: bool = False) -> None:
+        s = self.scheduler
+        safe = None
+        if not all_final and s.journal is not None and s.checkpoint:
+            safe = min(s.checkpoint.values())
+        res = s.res
+        prev = self.prev
+        written = self.written
+        # 按终到先后检查：交路前车先于后车终到，同一轮即可写出整条交路
+        for tid, mark in sorted(self.pending.items(), key=lambda x: x[1]):
+            if safe is not None and mark > safe:
+                break
+            p = prev.get(tid)
+            if not all_final and p is not None and p in s.checi and p not in written:
+                continue
+            del self.pending[tid]
+            rows = res[tid]
+            ts = s.checi[tid]
+            # 终到后被回滚或被交路前车重新对齐的车次不写出，之后再次终到时重新登记
+            if len(rows) == len(ts.path) and rows[-1].setoff_time == -999:
+                self.writer.write_train(tid, rows, (ts.ideally_time_setoff, ts.ideally_time_achieve), True)
+                written.add(tid)
+
+    # 调度结束后：写出其余已终到车次，以及未到终点（失败）车次已安排的部分
+    def finish(self) -> None:
+        self.scheduler.on_finish = None
+        self._flush(all_final=True)
+        s = self.scheduler
+        for tid in sorted(s.checi):
+            if tid not in self.written and s.res[tid]:
+                ts = s.checi[tid]
+                self.writer.write_train(tid, s.res[tid], (ts.ideally_time_setoff, ts.ideally_time_achieve), False)
+                self.written.add(tid)
+        self.writer.flush()
+
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+    from scheduler import SchedulerConfig
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--out', default="schedule.csv", help="输出文件（.csv / .parquet / .arrow）")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+    t = time.perf_counter()
+    scheduler.run()
+    print(f"调度耗时 {time.perf_counter() - t:.3f}s，失败 {len(scheduler.fail_set)}")
+
+    scheduler.reset()
+    t = time.perf_counter()
+    with ResultWriter(args.out, batch_rows=args.batch_rows) as writer:
+        stream = StreamingResults(scheduler, writer).attach()
+        scheduler.run()
+        streamed = writer.trains
+        stream.finish()
+    elapsed = time.perf_counter() - t
+    print(f"调度并流式写出耗时 {elapsed:.3f}s：{writer.trains} 个车次（调度中写出 {streamed} 个）、{writer.rows} 行 -> {args.out}")
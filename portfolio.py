@@ -0,0 +1,100 @@
+# 多策略组合调度：在进程池中并行运行多组股道选择策略与随机种子，
+# 取失败车次最少、其次总偏移量最小的方案，并在主进程中重放该方案得到完整结果
+#   python portfolio.py [--data data] [--seeds 4] [--workers 1 2 4]
+# 子进程以 fork 方式启动，直接继承主进程中已加载的数据与索引（写时复制），任务只传递调度参数、只返回统计值
+import gc
+import os
+import time
+import argparse
+import multiprocessing
+from dataclasses import replace
+
+from dataloader import TableLoader
+from scheduler import Scheduler, SchedulerConfig, TRACK_STRATEGIES
+
+# 使用随机数的策略：每个种子各运行一次；其余策略只运行一次
+RANDOM_STRATEGIES = ('random', 'earliest_random')
+
+# 子进程继承的调度引擎（由 run_portfolio 在创建进程池前设置）
+_scheduler: Scheduler = None
+
+
+# 策略组合：始发策略 × 到站策略，含随机策略时再乘以种子数
+def portfolio_configs(base: SchedulerConfig = None, seeds: int = 4) -> list[SchedulerConfig]:
+    base = base or SchedulerConfig(verbose=False)
+    configs = []
+    for origin in TRACK_STRATEGIES:
+        for track in TRACK_STRATEGIES:
+            randomized = origin in RANDOM_STRATEGIES or track in RANDOM_STRATEGIES
+            for seed in range(seeds if randomized else 1):
+                configs.append(replace(base, origin_strategy=origin, track_strategy=track, seed=seed, verbose=False))
+    return configs
+
+
+# 运行一组参数：返回 (序号, 失败车次数（去重）, 总偏移量, 耗时)
+def _run_one(task: tuple[int, SchedulerConfig]) -> tuple[int, int, int, float]:
+    i, config = task
+    t = time.perf_counter()
+    _scheduler.reset(config)
+    _scheduler.run()
+    return i, len(_scheduler.fail_set), _scheduler.total_deviation(), time.perf_counter() - t
+
+
+# 并行运行全部参数，返回最优参数与各组结果 [(失败车次数, 总偏移量, 耗时)]
+# 运行结束后 scheduler 保存最优方案的完整状态（res、fail_set 等）
+# workers 为 1 或平台不支持 fork 时在主进程中依次运行
+def run_portfolio(scheduler: Scheduler, configs: list[SchedulerConfig],
+                  workers: int = None) -> tuple[SchedulerConfig, list[tuple[int, int, float]]]:
+    global _scheduler
+    _scheduler = scheduler
+    workers = workers or os.cpu_count() or 1
+    tasks = list(enumerate(configs))
+    results = [None] * len(configs)
+    if workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for i, fails, deviation, seconds in map(_run_one, tasks):
+            results[i] = (fails, deviation, seconds)
+    else:
+        # 把已加载的对象移出分代 GC 的追踪范围：子进程中的 GC 不再写这些对象所在的页面，共享页面保持不复制
+        gc.freeze()
+        try:
+            with multiprocessing.get_context('fork').Pool(min(workers, len(tasks))) as pool:
+                for i, fails, deviation, seconds in pool.imap_unordered(_run_one, tasks):
+                    results[i] = (fails, deviation, seconds)
+        finally:
+            gc.unfreeze()
+    best = min(range(len(configs)), key=lambda i: (results[i][0], results[i][1], i))
+    # 各组参数的结果只由参数决定，在主进程中重放最优参数即可得到与子进程相同的完整结果
+    scheduler.reset(configs[best])
+    scheduler.run()
+    return configs[best], results
+
+
+def _label(config: SchedulerConfig) -> str:
+    label = f"{config.origin_strategy}/{config.track_strategy}"
+    if config.origin_strategy in RANDOM_STRATEGIES or config.track_strategy in RANDOM_STRATEGIES:
+        label += f" seed={config.seed}"
+    return label
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--seeds', type=int, default=4)
+    parser.add_argument('--workers', type=int, nargs='*', default=[None])
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+    configs = portfolio_configs(seeds=args.seeds)
+    baseline = None
+    for workers in args.workers:
+        t = time.perf_counter()
+        best, results = run_portfolio(scheduler, configs, workers)
+        wall = time.perf_counter() - t
+        baseline = baseline or wall
+        print(f"进程数 {workers or os.cpu_count()}：{len(configs)} 组参数，耗时 {wall:.3f}s，"
+              f"相对首次 {baseline / wall:.2f}x，单组耗时合计 {sum(r[2] for r in results):.3f}s")
+    print(f"{'策略':<36}{'失败':>6}{'总偏移量':>12}{'耗时(s)':>10}")
+    for config, (fails, deviation, seconds) in sorted(zip(configs, results), key=lambda x: (x[1][0], x[1][1])):
+        print(f"{_label(config):<36}{fails:>6}{deviation:>12}{seconds:>10.3f}")
+    print(f"最优：{_label(best)}，失败 {len(scheduler.fail_set)}，总偏移量 {scheduler.total_deviation()}")
@@ -0,0 +1,859 @@
+# 调度引擎：把 plan2.py 的事件驱动调度封装为可复用对象
+# - 构造时只保存/构建一次不可变索引（整数化路网、进路间隔图、候选股道）
+# - reset() 以 O(车次 + 股道 + 进路) 的代价重建每次运行的可变状态（事件队列、结果表、股道时间线、进路最早空闲时刻、失败集合）
+# - run() 处理事件直至堆空
+# - 启用回溯（rollback_limit > 0）时，全部可变状态的修改登记在撤销日志中（见 journal.py），
+#   列车离站进路不可行时回滚到其到达本站之前，排除当前股道后重新选择股道与到达时刻
+# - 以 reset(history=True) 运行时保留完整的撤销日志与事件处理记录，之后可加入扰动（hold、close_track），
+#   引擎回退到扰动最早可能产生影响的事件之前，再次 run() 只重新处理其后的事件（见 reschedule.py）
+# 同一进程内可用同一份数据依次运行多组配置：
+#   loader = TableLoader("data"); s = Scheduler.from_loader(loader)
+#   for cfg in configs: s.reset(cfg); s.run(); ...
+import gc
+import random
+from bisect import bisect_left
+from operator import itemgetter
+from dataclasses import dataclass
+
+from network import JIECHE, FACHE, PASS_JIECHE, PASS_FACHE, TrackCandidate, NetworkIndex, \
+    build_network_index, build_candidate_table
+from timeline import Timeline
+from eventqueue import EventQueue
+from journal import Journal
+
+# 股道选择策略：在可用股道候选 (槽位, 可执行时刻, 剩余延迟预算, 是否现在执行, 候选股道) 中选一个
+# - earliest：最早可行时刻（到站、终到的默认策略）
+# - fanout：发车进路的后继进路最少，即对后车影响最小（始发的默认策略）
+# - earliest_fanout：最早可行时刻，同时刻时取后继进路最少
+# - random：随机选择；earliest_random：最早可行时刻中随机选择（随机数由 SchedulerConfig.seed 决定）
+TRACK_STRATEGIES = {
+    'earliest': lambda x: x[1],
+    'fanout': lambda x: x[4].fanout,
+    'earliest_fanout': lambda x: (x[1], x[4].fanout),
+    'random': None,
+    'earliest_random': None,
+}
+
+# 撤销日志超过该长度时，丢弃所有检查点之前的记录（此后阈值取剩余长度的两倍，均摊代价为常数）
+JOURNAL_TRIM = 4096
+
+
+# 每一条调度结果记录：某车次在某站的股道与到/发时刻（-999 表示该方向无含义）
+@dataclass
+class ResultRow:
+    station_id: int = -1        # 站点ID
+    track: str = None           # 股道ID（字符串）
+    setoff_time: int = 0        # 发车时间（秒），-999 表示当前记录无发车
+    achieve_time: int = 0       # 到达时间（秒），-999 表示当前记录无到达
+    update_cnt: int = 0         # 版本计数：交路前车每次重新对齐本车始发时加一
+
+# 调度参数
+@dataclass
+class SchedulerConfig:
+    backtrack_enabled: bool = True      # 进路/股道在延迟预算内不可行时，是否放宽预算取最早可行时刻
+    backtrack_max_delay: int = 1800     # 放宽后的延迟预算上限（秒）
+    arrival_delay: int = 120            # 到站（含通过）事件的延迟预算（秒）
+    rollback_limit: int = 3             # 每车次离站不可行时回滚重选的次数上限（0 表示不回滚，直接记为失败）
+    origin_strategy: str = 'fanout'     # 始发站的股道选择策略（见 TRACK_STRATEGIES）
+    track_strategy: str = 'earliest'    # 到站、终到的股道选择策略
+    seed: int = 0                       # 随机策略的种子
+    verbose: bool = True                # 是否打印冲突信息
+
+
+class Scheduler:
+    def __init__(self, info, config: SchedulerConfig = None,
+                 net: NetworkIndex = None, candidates: dict[int, list[list[TrackCandidate]]] = None) -> None:
+        # 不可变数据与索引：未提供时由 info 构建
+        self.info = info
+        self.checi = info['车次信息']
+        self.exchanges = info['交路信息']
+        if net is None:
+            net = build_network_index(info['车站股道'], info['列车停站股道'], info['列车通过股道'],
+                                      info['进路信息'], info['间隔时间'])
+        if candidates is None:
+            candidates = build_candidate_table(self.checi, net, self.exchanges)
+        self.net = net
+        self.track_names = net.track_names          # 槽位 -> 股道名（写入结果时使用）
+        # 进路间隔索引（按进路编号）：
+        # - former_index[e] = [(next_e, gap), ...]
+        # - latter_index[e] = [(prev_e, gap), ...]
+        self.time_gap_former_index = net.gap_former
+        self.time_gap_latter_index = net.gap_latter
+        # 使用进路 e 后各相关进路的不可用区间（相对使用时刻）：后继进路 [0, gap)，前驱进路 (-gap, 0]；首次使用时生成
+        self._entrance_blocks: list[list[tuple[int, int, int]]] = [None] * len(net.entrance_ids)
+        # 候选股道（预计算）：tid -> [站序 -> [TrackCandidate]]，已剔除缺少所需进路的股道
+        self.candidates = candidates
+        # 始发事件与结果表头的初始值只依赖车次信息，预先算好供 reset() 复用
+        self._origins = [(tid, ts.ideally_time_setoff, ts.path[0].id) for tid, ts in self.checi.items()]
+        # 事件队列的键为车次ID
+        self.n_keys = max(self.checi, default=0) + 1
+        # 车次到达终点站后的回调 on_finish(tid)（见 output.py）；回溯可能撤销其后的处理，由调用方判断何时结果不再变化
+        self.on_finish = None
+        self.reset(config)
+
+    # 使用 TableLoader 已缓存的整数索引与候选股道构造
+    @classmethod
+    def from_loader(cls, loader, config: SchedulerConfig = None) -> 'Scheduler':
+        return cls(loader.load(), config, net=loader.get('整数索引'), candidates=loader.get('候选股道'))
+
+    # 重建每次运行的可变状态；给出 config 时同时替换调度参数
+    # history=True 时不丢弃撤销日志，并记录每个事件处理前的检查点，供加入扰动后回退（代价为日志占用的内存）
+    def reset(self, config: SchedulerConfig = None, history: bool = False) -> None:
+        if config is not None or not hasattr(self, 'config'):
+            self.config = config if config is not None else SchedulerConfig()
+        # 事件队列（见 eventqueue.py）：按 (时刻, 入队顺序) 排序，每个车次至多一个待处理事件 (站序, 是否到达, 延迟预算)；
+        # 交路后车被重新对齐时，新事件直接取代其待处理事件
+        for strategy in (self.config.origin_strategy, self.config.track_strategy):
+            if strategy not in TRACK_STRATEGIES:
+                raise ValueError(f"未知的股道选择策略：{strategy}")
+        self.rng = random.Random(self.config.seed)
+        # 撤销日志：仅在启用回溯或保留处理记录时记录
+        self.journal = Journal() if self.config.rollback_limit > 0 or history else None
+        # 事件处理记录：按处理顺序的 (处理前检查点, 时刻, 车次ID, 站序, 是否到达, 处理序号)
+        # 处理序号只增不减（回滚、回退后也不复用）；被回溯撤销的事件从记录中删除，
+        # 回退到这些事件时改为回退到撤销范围的起点（其后首个仍在记录中的事件）
+        self.history: list[tuple[int, int, int, int, bool, int]] = [] if history else None
+        self.processed = 0
+        self._first_pop: dict[tuple[int, int, bool], int] = {}     # (车次ID, 站序, 是否到达) -> 首次处理的处理序号（含已撤销的）
+        # 回溯记录：(处理序号, 车次ID, 站序, 被排除的股道, 时刻, 撤销范围起点的处理序号)
+        self._rollback_log: list[tuple[int, int, int, int, int, int]] = []
+        # 可回滚的状态修改：启用撤销日志时登记，否则直接修改
+        self._set_row = self.journal.setattr if self.journal is not None else setattr
+        self._append = self.journal.append if self.journal is not None else list.append
+        self._trim_at = JOURNAL_TRIM
+        self.queue = EventQueue(self.n_keys)
+        # 初始化：为每个车次在其理想发车时刻创建一条“始发事件”
+        for tid, setoff, _ in self._origins:
+            self.queue.push(tid, setoff, 0, False, 0)
+        # 初始事件入队之后才开始记录，回滚不会早于此
+        self.queue.journal = self.journal
+        # 记录当前已安排车次信息：res[tid] 为一个列表，保存该车在各站的结果行（不在本引擎车次信息中的ID为空列表）
+        # 每个车次的第一条记录：始发站、股道暂未选、理想发车时刻、到达置为-999、版本0
+        self.res: list[list[ResultRow]] = [[] for _ in range(self.n_keys)]
+        for tid, setoff, sid in self._origins:
+            self.res[tid].append(ResultRow(station_id=sid, track=None, setoff_time=setoff, achieve_time=-999, update_cnt=0))
+        # 记录当前车站股道状态：槽位 -> 占用车次ID（-1表示空闲）、计划解锁时间
+        # 占用车在计划解锁时刻之后仍未离开时，该股道不可用，直到实际发车
+        self.track_occupant: list[int] = [-1] * len(self.track_names)
+        self.track_unlock: list[int] = [0] * len(self.track_names)
+        self.held_track: list[int] = [-1] * self.n_keys     # 车次ID -> 其占用的股道槽位（-1 表示无）
+        # 股道时间线（见 timeline.py）：各车在该股道的占用区间 [到达, 发车)；
+        # 始发、通过与无交路的终到为瞬时使用，登记为 [时刻, 时刻 + 1)，同一时刻不再接入其他车次
+        self.track_timeline: list[Timeline] = [Timeline(self.journal) for _ in self.track_names]
+        # 进路不可用窗口 [entrance_busy[e], entrance_free[e])：前车使用进路后，其后继进路在 [使用时刻, 使用时刻 + 间隔) 内不可用，
+        # 相交的区间合并为一个窗口，查询时只与查询时刻比较，无需解锁事件
+        # 事件基本按时刻顺序处理，较早的窗口在后续查询时通常已结束，每条进路只保留终点最晚的窗口；
+        # 被取代时尚未结束（晚于当前事件时刻）的窗口，以及落在窗口之前的新区间（离站晚于事件时刻、交路跨日对齐），
+        # 移入该进路的较早窗口时间线 entrance_past[e]（按需创建，无则为 None），其中已结束的区间在下次登记时丢弃
+        self.entrance_busy: list[int] = [0] * len(self.net.entrance_ids)
+        self.entrance_free: list[int] = [0] * len(self.net.entrance_ids)
+        self.entrance_past: list[Timeline] = [None] * len(self.net.entrance_ids)
+        self.now = 0                            # 当前处理事件的时刻
+        # 调度失败的车次（发生不可化解冲突时记录，不重复）
+        self.fail_set: list[int] = []
+        # 回溯状态：
+        # - checkpoint：停站中的车次 -> 其到达事件处理前的检查点（随状态一起回滚）
+        # - rollbacks、excluded：各车次已回滚次数与各站被排除的股道，回滚后仍保留，保证回溯终止
+        self.checkpoint: dict[int, int] = {}
+        self.rollbacks: list[int] = [0] * self.n_keys
+        self.excluded: dict[tuple[int, int], set[int]] = {}
+        # 扰动（外部输入，不随回滚、回退撤销）：
+        # - holds：(车次ID, 站序) -> 离站不早于该时刻
+        # - closures：槽位 -> 封锁区间的时间线（封锁期间不接发车），无封锁为 None
+        # - avoided：(车次ID, 站序) -> 到站/终到时不选择的股道槽位（见 lns.py）
+        self.holds: dict[tuple[int, int], int] = {}
+        self.closures: list[Timeline] = [None] * len(self.track_names)
+        self.avoided: dict[tuple[int, int], frozenset[int]] = {}
+        # 保留处理记录时，处理过事件或被回退撤销了事件的车次（由调用方读取并清空），结果可能变化的车次都在其中
+        # （交路后车的结果行被前车改写时有新事件；被回退恢复为较早结果的车次不一定再有事件）
+        self.touched: set[int] = set()
+
+    def _log(self, msg: str) -> None:
+        if self.config.verbose:
+            print(msg)
+
+    # 记录调度失败的车次：交路后车失败后可能被前车终到重新安排始发并再次失败，每个车次只记录一次
+    def _fail(self, tid) -> None:
+        if self.journal is not None:
+            if tid not in self.fail_set:
+                self.journal.append(self.fail_set, tid)
+            self.journal.popkey(self.checkpoint, tid)
+        elif tid not in self.fail_set:
+            self.fail_set.append(tid)
+
+    # 股道不早于 t 的最早空闲时刻；占用车已过计划解锁时刻仍未离开时返回 None
+    def track_free_time(self, slot, t) -> int:
+        if self.track_occupant[slot] != -1 and self.track_unlock[slot] <= t:
+            return None
+        if self.closures[slot] is None:
+            return self.track_timeline[slot].earliest(t)
+        return self.track_earliest(slot, t)
+
+    # 股道时间线与封锁区间均空闲的最早时刻（不早于 t）
+    def track_earliest(self, slot, t) -> int:
+        closure = self.closures[slot]
+        if closure is None:
+            return self.track_timeline[slot].earliest(t)
+        while True:
+            s = closure.earliest(self.track_timeline[slot].earliest(t))
+            if s == t:
+                return t
+            t = s
+
+    # 进路不早于 t 的最早空闲时刻
+    def entrance_free_time(self, eid, t) -> int:
+        free = self.entrance_free[eid]
+        busy = self.entrance_busy[eid]
+        past = self.entrance_past[eid]
+        if past is None:
+            return free if free > t and busy <= t else t
+        # 有较早窗口时与当前窗口交替查询，直到两者给出同一时刻
+        while True:
+            s = past.earliest(free if free > t and busy <= t else t)
+            if s == t:
+                return t
+            t = s
+
+    # 股道与进路同时空闲的最早时刻（不早于 t）：交替查询直到两者给出同一时刻
+    def earliest_with_entrance(self, slot, eid, t) -> int:
+        track_earliest = self.track_timeline[slot].earliest if self.closures[slot] is None else \
+            lambda t: self.track_earliest(slot, t)
+        while True:
+            s = track_earliest(self.entrance_free_time(eid, t))
+            if s == t:
+                return t
+            t = s
+
+    def earliest_tracks(self, ts, rank, action_time, limit) -> list[(int, int, TrackCandidate)]:
+        # 枚举候选股道在 [action_time, action_time + limit] 内股道与对应进路同时空闲的最早时刻
+        # 返回：列表[(股道槽位, 最早可行时刻, 候选股道)]
+        earliest = []
+        tid = ts.id
+        deadline = action_time + limit
+        # 作业类型：如果不是始发站且上一条记录存在发车时间（说明刚到达过），则为“接车”，否则为“发车”
+        is_achieve = rank != 0 and self.res[tid][-1].setoff_time != -999
+        # 遍历该车次在该站的候选股道（预计算，均已具备所需进路）
+        for cand in self.candidates[tid][rank]:
+            track = cand.slot
+            free_time = self.track_free_time(track, action_time)
+            if free_time is None or free_time > deadline:
+                continue
+            eid = cand.entrance_in if is_achieve else cand.entrance_out   # 对应该动作的进路编号
+            free_time = self.earliest_with_entrance(track, eid, free_time)
+            if free_time <= deadline:
+                earliest.append((track, free_time, cand))
+        return earliest
+
+    def get_available_tracks(self, ts, rank, action_time, max_delay_time) -> list[(int, int, int, bool, TrackCandidate)]:
+        # 给定列车、站序、目标时刻和延迟预算，枚举“在该站可用”的股道候选
+        # 返回：列表[(股道槽位, 可执行时刻, 剩余延迟预算, 是否现在执行, 候选股道)]
+        return [(track, free_time, max_delay_time - (free_time - action_time), free_time == action_time, cand)
+                for track, free_time, cand in self.earliest_tracks(ts, rank, action_time, max_delay_time)]
+
+    # 按策略从可用股道候选中选择一个
+    def choose_track(self, available_tracks, strategy: str):
+        if strategy == 'random':
+            return available_tracks[self.rng.randrange(len(available_tracks))]
+        if strategy == 'earliest_random':
+            first = min(x[1] for x in available_tracks)
+            earliest = [x for x in available_tracks if x[1] == first]
+            return earliest[self.rng.randrange(len(earliest))]
+        return min(available_tracks, key=TRACK_STRATEGIES[strategy])
+
+    # 总偏移量（与 plan2.py 统计单元一致）：最后一条记录无发车的车次，始发与终到时刻相对理想时刻的偏移绝对值之和
+    def total_deviation(self) -> int:
+        return sum(self.train_deviation(tid) for tid in self.checi)
+
+    # 单个车次对总偏移量的贡献（最后一条记录仍有发车，即未到终点的车次为 0）
+    def train_deviation(self, tid) -> int:
+        ts = self.checi[tid]
+        rows = self.res[tid]
+        if rows[-1].setoff_time != -999:
+            return 0
+        return abs(rows[0].setoff_time % 86400 - ts.ideally_time_setoff) + \
+            abs(rows[-1].achieve_time % 86400 - ts.ideally_time_achieve)
+
+    def get_exchange_time(self, tid, action_time) -> tuple[int, int]:
+        # 计算交路衔接时后续车的开始时刻：在 [min, max] 窗口内对齐到最近的可行点
+        exchanges = self.exchanges
+        next_ts_id = exchanges[tid][0]                  # 后续车次ID
+        min_exchange_time = exchanges[tid][2] + action_time  # 交路最小连接时间
+        max_exchange_time = exchanges[tid][3] + action_time  # 交路最大连接时间
+        next_action_time = self.res[next_ts_id][0].setoff_time    # 后车当前计划的始发现有时刻
+        ###### 跨日班车 ######
+        if self.checi[tid].ideally_time_achieve > self.checi[next_ts_id].ideally_time_setoff:
+            next_action_time += 86400                        # 跨日对齐：后车理想发车早于前车理想到达，需加一天
+        if next_action_time < min_exchange_time:
+            next_action_time = min_exchange_time
+        elif next_action_time > max_exchange_time:
+            next_action_time = max_exchange_time
+        # 返回对齐到 86400 内的时刻，以及剩余延迟预算（窗口右端 - 对齐时刻）
+        return (next_action_time % 86400, max_exchange_time - next_action_time)
+
+    def get_entrance(self, ts, rank, track, worktype) -> int:
+        # 根据当前股道槽位（已含当前站）、相邻站与作业类型，查找对应的进路编号（若不存在返回 None）
+        prev_sid = ts.path[rank-1].id if worktype == JIECHE or worktype == PASS_JIECHE else ts.path[rank+1].id
+        return self.net.get_entrance(track, prev_sid, worktype)
+
+    def check_entrance(self, entrance, action_time, max_delay_time) -> tuple[int, int, bool]:
+        # 检查单条进路在 action_time 时是否可用；若需要推迟到进路最早空闲，则在延迟预算内对齐
+        free_time = self.entrance_free_time(entrance, action_time)
+        if free_time > action_time + max_delay_time:               # 超出延迟预算则不可行
+            return (-999, -999, False)
+        # 剩余延迟预算；无需等待时立刻可行
+        return (free_time, max_delay_time - (free_time - action_time), free_time == action_time)
+
+    def check_pass_entrance(self, ts, rank, action_time, max_delay_time) -> tuple[int, int, bool]:
+        # 检查“通过”场景：需要同时满足‘通过接车’与‘通过发车’两条进路以及通过股道的空闲时刻
+        cands = self.candidates[ts.id][rank]
+        if not cands:                               # 通过股道缺少通过进路，不可行
+            return (-999, -999, False)
+        slot, e_in, e_out = cands[0].slot, cands[0].entrance_in, cands[0].entrance_out
+        # 通过股道被停留的车次占用（如终到车等待交路后车）且已过计划解锁时刻，无法确定空闲时刻，不可行
+        free_time = self.track_free_time(slot, action_time)
+        if free_time is None:
+            return (-999, -999, False)
+        while True:
+            s = self.track_earliest(slot, self.entrance_free_time(e_out, self.entrance_free_time(e_in, free_time)))
+            if s == free_time:
+                break
+            free_time = s
+        if free_time > action_time + max_delay_time:
+            return (-999, -999, False)
+        return (free_time, max_delay_time - (free_time - action_time), free_time == action_time)
+
+    # 放宽延迟预算：延迟预算内不可行时，直接给出不超过 backtrack_max_delay 的最早可行时刻
+    # 预算恰好放宽到该时刻，剩余延迟预算为 0
+    def backtrack_check_entrance(self, eid, action_time, max_delay_time) -> tuple[int, int, bool]:
+        if not self.config.backtrack_enabled:
+            return (-999, -999, False)
+        (_action_time, _, _action_now) = self.check_entrance(eid, action_time, self.config.backtrack_max_delay)
+        if _action_time == -999:
+            return (-999, -999, False)
+        return (_action_time, 0, _action_now)
+
+    def backtrack_get_available_tracks(self, ts, rank, action_time, max_delay_time) -> list[(int, int, int, bool, TrackCandidate)]:
+        if not self.config.backtrack_enabled:
+            return []
+        earliest = self.earliest_tracks(ts, rank, action_time, self.config.backtrack_max_delay)
+        if not earliest:
+            return []
+        first = min(free_time for _, free_time, _ in earliest)
+        return [(track, free_time, 0, free_time == action_time, cand)
+                for track, free_time, cand in earliest if free_time == first]
+
+    def backtrack_check_pass(self, ts, rank, action_time, max_delay_time) -> tuple[int, int, bool]:
+        if not self.config.backtrack_enabled:
+            return (-999, -999, False)
+        (_action_time, _, _action_now) = self.check_pass_entrance(ts, rank, action_time, self.config.backtrack_max_delay)
+        if _action_time == -999:
+            return (-999, -999, False)
+        return (_action_time, 0, _action_now)
+
+    def update_entrance_state(self, tid, eid, action_time):
+        # 进路占用传播：根据“前后进路最小间隔”更新相关进路的不可用窗口（不产生事件）
+        # - 后继进路在 [使用时刻, 使用时刻 + 间隔) 内不可用
+        # - 前驱进路在 (使用时刻 - 间隔, 使用时刻] 内不可用：同一时刻（或更早时刻）稍后处理的车次不会再与本次使用冲突
+        # eid 为 None（未找到进路）或 -999（非进路）时不传播
+        if eid is not None and eid >= 0:
+            entrance_busy = self.entrance_busy
+            entrance_free = self.entrance_free
+            blocks = self._entrance_blocks[eid]
+            if blocks is None:
+                blocks = self._entrance_blocks[eid] = [(_eid, 0, _time_gap) for _eid, _time_gap in self.time_gap_former_index[eid]] + \
+                    [(_eid, 1 - _time_gap, 1) for _eid, _time_gap in self.time_gap_latter_index[eid]]
+            if self.journal is not None:
+                self.journal.log.append((_restore_entrances, self,
+                                         [(_eid, entrance_busy[_eid], entrance_free[_eid]) for _eid, _, _ in blocks]))
+            now = self.now
+            for _eid, start, end in blocks:
+                start += action_time
+                end += action_time
+                free = entrance_free[_eid]
+                if free < start:
+                    # 新区间在窗口之后：取代窗口；原窗口尚未结束时移入较早窗口
+                    if free > now:
+                        self._entrance_past(_eid).add(entrance_busy[_eid], free)
+                    entrance_busy[_eid] = start
+                    entrance_free[_eid] = end
+                elif entrance_busy[_eid] <= end:
+                    # 相交或相接：合并（起点取小、终点取大）
+                    if start < entrance_busy[_eid]:
+                        entrance_busy[_eid] = start
+                    if end > free:
+                        entrance_free[_eid] = end
+                elif end > now:
+                    # 新区间在窗口之前且尚未结束：登记到较早窗口
+                    self._entrance_past(_eid).add(start, end)
+
+    # 进路的较早窗口时间线：按需创建，已有时先丢弃在当前事件时刻之前结束的区间
+    def _entrance_past(self, eid) -> Timeline:
+        past = self.entrance_past[eid]
+        if past is None:
+            past = Timeline(self.journal)
+            if self.journal is not None:
+                self.journal.setitem(self.entrance_past, eid, past)
+            else:
+                self.entrance_past[eid] = past
+        else:
+            past.prune(self.now)
+        return past
+
+    # 股道占用：到达时登记 [到达, 计划解锁)
+    def occupy_track(self, tid, track, action_time, unlock_time):
+        if self.journal is not None:
+            self.journal.log.append((_restore_track, self, track, self.track_occupant[track], self.track_unlock[track],
+                                     tid, self.held_track[tid]))
+        self.track_occupant[track] = tid
+        self.held_track[tid] = track
+        self.track_unlock[track] = unlock_time
+        self.track_timeline[track].add(action_time, unlock_time)
+
+    # 股道瞬时使用（始发、通过、无交路的终到）
+    def use_track(self, track, action_time):
+        self.track_timeline[track].add(action_time, action_time + 1)
+
+    # 股道释放：实际发车时刻早于/晚于计划解锁时，相应截短/延长占用区间
+    def release_track(self, track, action_time):
+        occupied_tid = self.track_occupant[track]
+        if occupied_tid == -1:
+            return
+        if self.journal is not None:
+            self.journal.log.append((_restore_track, self, track, occupied_tid, self.track_unlock[track],
+                                     occupied_tid, self.held_track[occupied_tid]))
+        self.held_track[occupied_tid] = -1
+        unlock_time = self.track_unlock[track]
+        if action_time < unlock_time:
+            self.track_timeline[track].remove(action_time, unlock_time)
+        else:
+            self.track_timeline[track].add(unlock_time, action_time)
+        self.track_occupant[track] = -1
+        self.track_unlock[track] = 0
+
+    # 回退到处理序号为 processed 的事件处理之前：撤销其后的全部状态修改与回溯计数，返回回退的事件数
+    def rewind(self, processed: int) -> int:
+        history = self.history
+        if history is None:
+            raise ValueError("未保留处理记录（需以 reset(history=True) 运行）")
+        i = bisect_left(history, processed, key=itemgetter(5))
+        if i == len(history):
+            return 0
+        self.journal.rollback(history[i][0])
+        n = len(history) - i
+        # 检查点 history[i][0] 处的状态已包含此前的回溯（及其撤销的事件），只撤销此后发生的回溯
+        since = history[i][5]
+        self.touched.update(h[2] for h in history[i:])
+        del history[i:]
+        rollback_log = self._rollback_log
+        while rollback_log and rollback_log[-1][0] >= since:
+            _, tid, rank, track, _, _ = rollback_log.pop()
+            self.rollbacks[tid] -= 1
+            excluded = self.excluded[(tid, rank)]
+            excluded.discard(track)
+            if not excluded:
+                del self.excluded[(tid, rank)]
+        self._first_pop = {key: p for key, p in self._first_pop.items() if p < since}
+        return n
+
+    # 扰动：车次 tid 在站序 rank 离站不早于 t（须为始发站或停车站，且不是终到站）
+    # 已运行过且保留处理记录时，回退到该离站事件首次处理之前；否则只登记，在下次运行中生效
+    def hold(self, tid, rank, t) -> int:
+        path = self.checi[tid].path
+        if rank >= len(path) - 1 or not path[rank].is_ideal_stop:
+            raise ValueError(f"车次{tid}在站序{rank}没有离站作业")
+        self.holds[(tid, rank)] = max(t, self.holds.get((tid, rank), t))
+        processed = self._first_pop.get((tid, rank, False)) if self.history is not None else None
+        return self.rewind(processed) if processed is not None else 0
+
+    # 车次 tid 在站序 rank（中间停车站或终到站）到站时不选择 slots 中的股道（空集合即取消）
+    # 已运行过且保留处理记录时，回退到该到站事件首次处理之前
+    def avoid(self, tid, rank, slots) -> int:
+        path = self.checi[tid].path
+        if rank == 0 or not path[rank].is_ideal_stop:
+            raise ValueError(f"车次{tid}在站序{rank}没有到站作业")
+        if slots:
+            self.avoided[(tid, rank)] = frozenset(slots)
+        else:
+            self.avoided.pop((tid, rank), None)
+        processed = self._first_pop.get((tid, rank, True)) if self.history is not None else None
+        return self.rewind(processed) if processed is not None else 0
+
+    # 扰动：股道槽位 slot 在 [start, end) 内封锁
+    # 股道查询的前瞻不超过放宽后的延迟预算，回退到时刻不早于 start - backtrack_max_delay 的首个事件之前；
+    # 回溯范围内有此后时刻的事件时（以触发回溯的事件时刻为准），回退到该范围的起点
+    def close_track(self, slot, start, end) -> int:
+        if self.closures[slot] is None:
+            self.closures[slot] = Timeline()
+        self.closures[slot].add(start, end)
+        if not self.history:
+            return 0
+        return self.rewind(self._closure_point(start))
+
+    # 自时刻 start 起封锁股道最早可能影响的事件的处理序号
+    def _closure_point(self, start) -> int:
+        since = start - self.config.backtrack_max_delay
+        processed = next((p for _, action_time, _, _, _, p in self.history if action_time >= since), self.processed + 1)
+        for _, _, _, _, action_time, branch in self._rollback_log:
+            if action_time >= since and branch < processed:
+                processed = branch
+        return processed
+
+    # 取消全部扰动（holds、closures、avoided）；已运行过且保留处理记录时，回退到其中最早产生影响的事件之前，
+    # 再次运行即恢复无扰动的方案（只重新处理受扰动影响的事件）
+    def clear_disruptions(self) -> int:
+        points = []
+        if self.history is not None:
+            first_pop = self._first_pop
+            points += [first_pop.get((tid, rank, False)) for tid, rank in self.holds]
+            points += [first_pop.get((tid, rank, True)) for tid, rank in self.avoided]
+            starts = [closure.starts[0] for closure in self.closures if closure is not None and closure.starts]
+            if starts:
+                points.append(self._closure_point(min(starts)))
+        self.holds.clear()
+        self.avoided.clear()
+        self.closures[:] = [None] * len(self.closures)
+        points = [p for p in points if p is not None]
+        return self.rewind(min(points)) if points else 0
+
+    # 处理事件直至堆空
+    # 事件处理期间新建大量短命的小对象（事件、结果行、撤销记录），暂停分代 GC，避免反复扫描已加载的数据
+    def run(self) -> bool:
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._run()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _run(self) -> bool:
+        # 热路径上使用局部变量，避免反复的属性查找
+        queue = self.queue
+        push = queue.push
+        pop = queue.pop
+        checi = self.checi
+        res = self.res
+        exchanges = self.exchanges
+        candidates = self.candidates
+        net = self.net
+        track_names = self.track_names
+        track_occupant = self.track_occupant
+        fail = self._fail
+        set_row = self._set_row
+        append = self._append
+        journal = self.journal
+        checkpoint = self.checkpoint
+        rollback_limit = self.config.rollback_limit
+        choose_track = self.choose_track
+        origin_strategy = self.config.origin_strategy
+        track_strategy = self.config.track_strategy
+        arrival_delay = self.config.arrival_delay
+        get_available_tracks = self.get_available_tracks
+        check_entrance = self.check_entrance
+        update_entrance_state = self.update_entrance_state
+        occupy_track = self.occupy_track
+        release_track = self.release_track
+        use_track = self.use_track
+        log = self._log
+        history = self.history
+        first_pop = self._first_pop
+        holds = self.holds
+        avoided = self.avoided
+        touched = self.touched
+        on_finish = self.on_finish
+
+        while queue:
+            if journal is not None:
+                # 本事件处理前的检查点；日志过长时丢弃所有检查点之前的记录（保留处理记录时不丢弃）
+                mark = journal.mark()
+                if history is None and len(journal) > self._trim_at:
+                    journal.trim(min(checkpoint.values(), default=mark))
+                    self._trim_at = max(JOURNAL_TRIM, 2 * len(journal))
+            # 取出最早可执行事件（队列中只有有效事件，被取代的事件不会弹出）
+            action_time, tid, rank, is_achieve, max_delay_time = pop()
+            self.now = action_time
+            if history is not None:
+                self.processed += 1
+                history.append((mark, action_time, tid, rank, is_achieve, self.processed))
+                first_pop.setdefault((tid, rank, is_achieve), self.processed)
+                touched.add(tid)
+            # 扰动：离站不早于指定时刻
+            if holds and not is_achieve:
+                hold = holds.get((tid, rank))
+                if hold is not None and action_time < hold:
+                    push(tid, hold, rank, False, max_delay_time)
+                    continue
+
+            ts = checi[tid]                          # 车次对象
+            update_cnt = res[tid][0].update_cnt      # 当前版本，写入结果行
+            eid = -999                               # 普通事件没有进路（-999）
+            station = ts.path[rank]                  # 当前站对象
+            sid = station.id                         # 当前站ID
+
+            # 分两类处理：停车站（到/发）与通过站（不停车）
+            if station.is_ideal_stop:
+                ###### 处理始发站 ######
+                if rank == 0:
+                    track = res[tid][0].track     # 若之前已选定股道则复用
+                    action_now = True            # 默认认为可立刻执行，后续检查可能改变
+                    if track == None:
+                        # 首次选择始发股道：不允许延迟（延迟预算0），尝试按理想时刻发车
+                        available_tracks = get_available_tracks(ts, rank, action_time, 0)
+                        if len(available_tracks) == 0:
+                            if not candidates[tid][rank]:
+                                # 始发站没有具备发车进路的股道，无法发车
+                                log("交路冲突（始发站无可用股道）：站次{}，车次{}".format(sid, tid))
+                                fail(tid)
+                                continue
+                            ##### 无法按理想时间发车，寻找最早的可行发车时间 ######
+                            min_modified_setoff_time = None   # 各候选股道最早可行时刻的最小值（None 表示均不可用）
+                            for cand in candidates[tid][rank]:
+                                track = cand.slot
+                                occupied_tid = track_occupant[track]                # 当前占用的车次ID（或-1）
+                                occupied_station_info = None
+                                if occupied_tid == -1:
+                                    # 股道空闲：由股道与发车进路同时空闲的最早时刻决定可行时刻
+                                    modified_setoff_time = self.earliest_with_entrance(track, cand.entrance_out, action_time)
+                                else:
+                                    # 找到占用车在该站的站信息，以便计算其最早离站时间
+                                    for _station in checi[occupied_tid].path:
+                                        if _station.id == sid:
+                                            occupied_station_info = _station
+                                            break
+                                    if occupied_tid in exchanges and len(res[occupied_tid]) == len(checi[occupied_tid].path):
+                                        # 若占用车已终到，则由交路后车的始发时刻决定空档；跨日则加一天
+                                        leaving_tid = exchanges[occupied_tid][0]
+                                        modified_setoff_time = res[leaving_tid][0].setoff_time
+                                        if modified_setoff_time < action_time:
+                                            modified_setoff_time += 86400
+                                    else:
+                                        # 否则由其到达后最小停站时间形成最早离站空档
+                                        leaving_tid = occupied_tid
+                                        modified_setoff_time = res[occupied_tid][-1].achieve_time + occupied_station_info.stop_time_range[0]
+                                    if modified_setoff_time <= action_time:
+                                        # 计划离开时刻已过仍未发车（在等待发车进路）：以其待处理事件的时刻为准；
+                                        # 没有待处理事件（该车调度失败）时股道不会再释放
+                                        modified_setoff_time = queue.time_of(leaving_tid)
+                                        if modified_setoff_time is None:
+                                            continue
+                                if min_modified_setoff_time is None or modified_setoff_time < min_modified_setoff_time:
+                                    min_modified_setoff_time = modified_setoff_time
+                            if min_modified_setoff_time is None:
+                                log("交路冲突（始发站股道均被占用）：站次{}，车次{}".format(sid, tid))
+                                fail(tid)
+                                continue
+                            # 改签发车时刻为“最早可行”，并将该事件重新入堆
+                            set_row(res[tid][0], 'setoff_time', min_modified_setoff_time)
+                            push(tid, min_modified_setoff_time, 0, False, 0)
+                            continue
+                        # 始发选择策略：默认优先选择“后续进路影响更小”的股道（前向间隔数少）
+                        setoff_time = action_time
+                        (track, action_time, max_delay_time, action_now, cand) = choose_track(available_tracks, origin_strategy)
+                        set_row(res[tid][rank], 'track', track_names[track])
+                        eid = cand.entrance_out
+                        if not action_now:
+                            # 需等待发车进路时占用所选股道，实际发车时（已有股道选择的分支）释放
+                            occupy_track(tid, track, setoff_time, action_time)
+                    else:
+                        # 若已有股道选择（交路接续占用），检查发车进路是否在延迟预算内可行，实际发车时释放股道
+                        track = net.slot_of[(sid, track)]
+                        eid = self.get_entrance(ts, rank, track, FACHE)
+                        if eid is None:
+                            log("DO NOT FIND ENTRANCE!（发车）")
+                            break
+                        (_action_time, _max_delay_time, _action_now) = check_entrance(eid, action_time, max_delay_time)
+                        if _action_time == -999:
+                            (_action_time, _max_delay_time, _action_now) = self.backtrack_check_entrance(eid, action_time, max_delay_time)
+                            if _action_time == -999:
+                                log("交路冲突（始发站）：站次{}，车次{}".format(sid, tid))
+                                fail(tid)
+                                continue
+                        action_time, max_delay_time, action_now = _action_time, _max_delay_time, _action_now
+                        if action_now:
+                            # 前车跨日接续时股道占用至次日（计划解锁时刻已加一天），发车时刻同样按次日释放
+                            release_track(track, action_time + 86400 if action_time < 86400 <= self.track_unlock[track] else action_time)
+
+                    # 根据是否需要等待，决定入堆或执行并推进至下一站到达
+                    if not action_now:
+                        push(tid, action_time, rank, False, max_delay_time)
+                    else:
+                        update_entrance_state(tid, eid, action_time)
+                        use_track(track, action_time)
+                        r = ts.path[rank+1].ruler_info
+                        if r is not None:
+                            set_row(res[tid][rank], 'setoff_time', action_time)
+                            next_action_time = action_time + r.runtime + r.start
+                            if ts.path[rank + 1].is_ideal_stop:
+                                next_action_time += r.stop
+                            push(tid, next_action_time, rank + 1, True, arrival_delay)
+
+                ###### 处理终点站 ######
+                elif rank == len(ts.path) - 1:
+                    # 终到站：在允许延迟预算内选择最早可接车的股道
+                    excluded = avoided.get((tid, rank)) if avoided else None
+                    available_tracks = get_available_tracks(ts, rank, action_time, max_delay_time)
+                    if excluded:
+                        available_tracks = [x for x in available_tracks if x[0] not in excluded]
+                    if len(available_tracks) == 0:
+                        bt_tracks = self.backtrack_get_available_tracks(ts, rank, action_time, max_delay_time)
+                        if excluded:
+                            bt_tracks = [x for x in bt_tracks if x[0] not in excluded]
+                        if len(bt_tracks) == 0:
+                            log("交路冲突（终点站）：车次{}，站次{}".format(sid, tid))
+                            fail(tid)
+                            continue
+                        available_tracks = bt_tracks
+                    # 默认选择“最早可行时刻”的股道
+                    (track, action_time, max_delay_time, action_now, cand) = choose_track(available_tracks, track_strategy)
+                    if not action_now:
+                        push(tid, action_time, rank, True, max_delay_time)
+                    else:
+                        # 记录接车进路占用影响，并写入终到结果行
+                        eid = cand.entrance_in
+                        update_entrance_state(tid, eid, action_time)
+                        append(res[tid], ResultRow(station_id=sid, track=track_names[track], setoff_time=-999, achieve_time=action_time, update_cnt=update_cnt))
+                        if on_finish is not None:
+                            on_finish(tid)
+                        # 若存在交路，将后车的“始发事件”按交路窗口对齐并入堆；同时在同股道上设置接续占用
+                        if tid not in exchanges:
+                            use_track(track, action_time)
+                            continue
+                        else:
+                            next_tid = exchanges[tid][0]
+                            (next_action_time, max_delay_time) = self.get_exchange_time(tid, action_time)
+                            push(next_tid, next_action_time, 0, False, max_delay_time)
+                            # 后车已在途时从始发站重新开始，释放其当前占用的股道
+                            if self.held_track[next_tid] != -1:
+                                release_track(self.held_track[next_tid], action_time)
+                            row = ResultRow(station_id=sid, track=track_names[track], setoff_time=next_action_time, achieve_time=-999, update_cnt=update_cnt+1)
+                            if journal is not None:
+                                journal.replace(res[next_tid], [row])
+                                journal.popkey(checkpoint, next_tid)
+                            else:
+                                res[next_tid][:] = [row]
+                            # 后车次日始发（对齐后的时刻早于终到时刻）时，股道占用到次日的发车时刻
+                            occupy_track(tid, track, action_time, next_action_time if next_action_time >= action_time else next_action_time + 86400)
+
+                else:
+                    ###### 处理中间站：先到站后离站 ######
+                    if is_achieve:
+                        # 到站：允许延迟窗口为 arrival_delay，选择最早可接车股道
+                        # 回滚后重新到站时，排除已导致离站失败的股道（以及指定不选择的股道）
+                        excluded = self.excluded.get((tid, rank))
+                        if avoided and (tid, rank) in avoided:
+                            excluded = avoided[(tid, rank)] | excluded if excluded else avoided[(tid, rank)]
+                        available_tracks = get_available_tracks(ts, rank, action_time, arrival_delay)
+                        if excluded:
+                            available_tracks = [x for x in available_tracks if x[0] not in excluded]
+                        if len(available_tracks) == 0:
+                            bt_tracks = self.backtrack_get_available_tracks(ts, rank, action_time, arrival_delay)
+                            if excluded:
+                                bt_tracks = [x for x in bt_tracks if x[0] not in excluded]
+                            if len(bt_tracks) == 0:
+                                log("交路冲突（到站）：车次{}，站次{}".format(sid, tid))
+                                fail(tid)
+                                continue
+                            available_tracks = bt_tracks
+                        # 按策略选择股道（默认最早可行）
+                        (track, action_time, max_delay_time, action_now, cand) = choose_track(available_tracks, track_strategy)
+                        if not action_now:
+                            push(tid, action_time, rank, True, max_delay_time)
+                        else:
+                            # 记录接车进路占用与到达结果，并将“离站事件”按最小停站时间入堆，同时设置股道占用到该离站时刻
+                            # 启用回溯时记下本事件处理前的检查点，离站失败时回滚到此处
+                            if journal is not None:
+                                journal.setkey(checkpoint, tid, mark)
+                            eid = cand.entrance_in
+                            update_entrance_state(tid, eid, action_time)
+                            append(res[tid], ResultRow(station_id=sid, track=track_names[track], setoff_time=-999, achieve_time=action_time, update_cnt=update_cnt))
+                            next_action_time = action_time + station.stop_time_range[0]
+                            push(tid, next_action_time, rank, False, station.stop_time_range[1]-station.stop_time_range[0])
+                            occupy_track(tid, track, action_time, next_action_time)
+
+                    ###### 处理离站 ######
+                    else:
+                        # 离站/发车：检查发车进路可行，成功则释放股道占用并推进到下一站到达
+                        track = net.slot_of[(sid, res[tid][rank].track)]
+                        eid = self.get_entrance(ts, rank, track, FACHE)
+                        if eid is None:
+                            log("DO NOT FIND ENTRANCE!（发车）")
+                            break
+                        (_action_time, _max_delay_time, _action_now) = check_entrance(eid, action_time, max_delay_time)
+                        if _action_time == -999:
+                            (_action_time, _max_delay_time, _action_now) = self.backtrack_check_entrance(eid, action_time, max_delay_time)
+                            if _action_time == -999:
+                                # 回溯：回滚到本车到达本站之前（其后所有车次的修改一并撤销），排除当前股道后重新选择股道与到达时刻
+                                if tid in checkpoint and self.rollbacks[tid] < rollback_limit:
+                                    self.rollbacks[tid] += 1
+                                    self.excluded.setdefault((tid, rank), set()).add(track)
+                                    log("回溯（离站）：站次{}，车次{}，排除股道{}".format(sid, tid, res[tid][rank].track))
+                                    cp = checkpoint[tid]
+                                    journal.rollback(cp)
+                                    if history is not None:
+                                        # 被撤销的事件从处理记录中删除（检查点严格递增）
+                                        i = bisect_left(history, (cp,))
+                                        self._rollback_log.append((self.processed, tid, rank, track, action_time, history[i][5]))
+                                        del history[i:]
+                                    continue
+                                log("交路冲突（离站）：站次{}，车次{}".format(sid, tid))
+                                release_track(track, action_time)
+                                fail(tid)
+                                continue
+                        action_time, max_delay_time, action_now = _action_time, _max_delay_time, _action_now
+                        if not action_now:
+                            push(tid, action_time, rank, False, max_delay_time)
+                        else:
+                            release_track(track, action_time)
+                            if journal is not None:
+                                journal.popkey(checkpoint, tid)
+                            update_entrance_state(tid, eid, action_time)
+                            r = ts.path[rank+1].ruler_info
+                            if r is not None:
+                                set_row(res[tid][rank], 'setoff_time', action_time)
+                                next_action_time = action_time + r.runtime + r.start
+                                if ts.path[rank + 1].is_ideal_stop:
+                                    next_action_time += r.stop
+                                push(tid, next_action_time, rank + 1, True, arrival_delay)
+
+            ####### 处理过站 ######
+            else:
+                # 通过站：不停车，需同时满足两条通过进路的空闲时刻
+                (_action_time, _max_delay_time, _action_now) = self.check_pass_entrance(ts, rank, action_time, max_delay_time)
+                if _action_time == -999:
+                    (_action_time, _max_delay_time, _action_now) = self.backtrack_check_pass(ts, rank, action_time, max_delay_time)
+                    if _action_time == -999:
+                        log("交路冲突（通过接车/发车）：站次{}，车次{}".format(sid, tid))
+                        fail(tid)
+                        continue
+                action_time, max_delay_time, action_now = _action_time, _max_delay_time, _action_now
+                if not action_now:
+                    push(tid, action_time, rank, True, max_delay_time)
+                else:
+                    # 两条进路均占用与传播，并在同一时刻记录到达与发出
+                    cand = candidates[tid][rank][0]
+                    update_entrance_state(tid, cand.entrance_in, action_time)
+                    update_entrance_state(tid, cand.entrance_out, action_time)
+                    use_track(cand.slot, action_time)
+                    append(res[tid], ResultRow(station_id=sid, track=track_names[cand.slot], setoff_time=action_time, achieve_time=action_time, update_cnt=update_cnt))
+                    r = ts.path[rank+1].ruler_info
+                    if r is not None:
+                        next_action_time = action_time + r.runtime
+                        if ts.path[rank+1].is_ideal_stop:
+                            next_action_time += r.stop
+                        push(tid, next_action_time, rank + 1, True, arrival_delay)
+
+        return True
+
+
+# 撤销一次进路占用传播：恢复各后继进路的不可用窗口
+def _restore_entrances(scheduler: Scheduler, saved: list[tuple[int, int, int]]) -> None:
+    for _eid, busy, free in saved:
+        scheduler.entrance_busy[_eid] = busy
+        scheduler.entrance_free[_eid] = free
+
+
+# 撤销一次股道占用/释放：恢复股道的占用车次与计划解锁时刻，以及车次占用的股道
+def _restore_track(scheduler: Scheduler, track: int, occupant: int, unlock: int, tid: int, held: int) -> None:
+    scheduler.track_occupant[track] = occupant
+    scheduler.track_unlock[track] = unlock
+    scheduler.held_track[tid] = held
@@ -0,0 +1,338 @@
+# 本地调度服务：常驻进程只加载一次数据并建好索引，经 HTTP（TCP 或 Unix 套接字）接受调度与扰动推演请求
+#   python service.py [--data data] [--host 127.0.0.1] [--port 8765 | --unix /tmp/schedule.sock] [--workers 4] [--cache 256] [--warm 1]
+# - 请求（JSON）：
+#   POST /schedule  {"config": {SchedulerConfig 字段}, "rows": false}
+#   POST /whatif    {"config": {...}, "delays": [[车次ID, 站序, 秒]], "holds": [[车次ID, 站序, 时刻]],
+#                    "closures": [[车站ID, 股道名, 开始, 结束]], "rows": false}
+#   GET  /status    数据规模、进程池与缓存统计
+# - 调度在进程池中运行（fork 启动，子进程直接继承已加载的数据与索引），事件循环只做解析与缓存查找，可并发接受请求；
+#   workers 为 1 或平台不支持 fork 时在主进程的一个线程中依次运行
+# - 结果缓存：键为规范化后的请求参数（补全默认值、排序）的 SHA-256；LRU 保留 cache 条。
+#   相同参数的请求在计算期间到达时等待同一个计算，不重复提交
+# - 扰动推演：每个工作进程为最近使用的 warm 组参数各保留一个已按 config 调度完的 reschedule.Rescheduler 作为基准方案
+#   （按干涉图分量各一个引擎，保留处理记录）；delays 相对基准方案的离站时刻、holds 为绝对时刻、closures 封锁股道。
+#   只有上一次与本次推演的扰动所在分量的引擎参与：取消上一次的扰动、加入本次的扰动，回退到两者中最早受影响的事件之前，
+#   只重新处理其后的事件（Scheduler.clear_disruptions / hold / close_track），返回结果有变化的车次
+import gc
+import os
+import json
+import time
+import signal
+import asyncio
+import hashlib
+import argparse
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict, fields
+
+from dataloader import TableLoader
+from scheduler import Scheduler, SchedulerConfig
+from reschedule import Rescheduler
+
+# 请求体的大小上限（字节）
+MAX_BODY = 16 * 2 ** 20
+# 请求中可设置的调度参数（verbose 固定为 False）
+CONFIG_FIELDS = {f.name for f in fields(SchedulerConfig)} - {'verbose'}
+
+# 进程池中各进程使用的调度引擎（创建进程池前设置，fork 后由子进程继承）
+_scheduler: Scheduler = None
+# 各进程中扰动推演的基准方案：规范化的调度参数 -> _Base，LRU 保留 _warm_size 个
+_warm: OrderedDict[str, '_Base'] = OrderedDict()
+_warm_size = 1
+
+
+# 扰动推演的基准方案：各分量引擎停在无扰动的结果或上一次推演的结果上
+@dataclass
+class _Base:
+    rescheduler: Rescheduler
+    rows: dict[int, list]                   # 无扰动时各车次的结果行（_snapshot）
+    fails: int                              # 无扰动时的失败车次数
+    deviation: int                          # 无扰动时的总偏移量
+    deviations: dict[Scheduler, int]        # 各分量引擎无扰动时的总偏移量
+    disrupted: set[Scheduler] = field(default_factory=set)     # 带有上一次推演扰动的引擎
+
+
+# 规范化请求：补全默认值、校验字段，返回 (操作, 参数)；参数只含可 JSON 序列化的基本类型
+def normalize(op: str, body: dict) -> tuple[str, dict]:
+    if not isinstance(body, dict):
+        raise ValueError("请求体须为 JSON 对象")
+    config = body.get('config') or {}
+    unknown = set(config) - CONFIG_FIELDS
+    if unknown:
+        raise ValueError(f"未知的调度参数：{sorted(unknown)}")
+    config = asdict(SchedulerConfig(**config, verbose=False))
+    params = {'config': config, 'rows': bool(body.get('rows', False))}
+    if op == 'whatif':
+        params['delays'] = sorted([int(tid), int(rank), int(seconds)] for tid, rank, seconds in body.get('delays', []))
+        params['holds'] = sorted([int(tid), int(rank), int(t)] for tid, rank, t in body.get('holds', []))
+        params['closures'] = sorted([int(sid), str(track), int(start), int(end)]
+                                    for sid, track, start, end in body.get('closures', []))
+        if not (params['delays'] or params['holds'] or params['closures']):
+            raise ValueError("扰动推演需要 delays、holds 或 closures")
+    elif op != 'schedule':
+        raise ValueError(f"未知的操作：{op}")
+    return op, params
+
+
+def cache_key(op: str, params: dict) -> str:
+    text = json.dumps([op, params], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _rows(res, tids) -> dict[str, list]:
+    return {str(tid): [[r.station_id, r.track, r.achieve_time, r.setoff_time] for r in res[tid]] for tid in tids}
+
+
+def _snapshot(s: Scheduler | Rescheduler) -> dict[int, list]:
+    return {tid: [(r.station_id, r.track, r.setoff_time, r.achieve_time) for r in s.res[tid]] for tid in s.checi}
+
+
+# 取出（或新建并调度）config 对应的基准方案
+def _warm_base(config: dict) -> _Base:
+    key = cache_key('base', config)
+    base = _warm.get(key)
+    if base is not None:
+        _warm.move_to_end(key)
+        return base
+    rs = Rescheduler(_scheduler.info, _scheduler.net, _scheduler.candidates, SchedulerConfig(**config))
+    deviations = {engine: engine.total_deviation() for engine in rs.engines}
+    base = _warm[key] = _Base(rs, _snapshot(rs), len(rs.fail_set), sum(deviations.values()), deviations)
+    if len(_warm) > _warm_size:
+        _warm.popitem(last=False)
+    return base
+
+
+# 在工作进程中执行一个请求：返回可 JSON 序列化的结果
+def execute(op: str, params: dict) -> dict:
+    t = time.perf_counter()
+    out = {}
+    if op == 'whatif':
+        base = _warm_base(params['config'])
+        rs = base.rescheduler
+        # 先解析本次扰动：(引擎, 扰动方法, 参数)
+        disruptions = []
+        for tid, rank, seconds in params['delays']:
+            rows = base.rows.get(tid, [])
+            if rank >= len(rows) or rows[rank][2] == -999:
+                raise ValueError(f"车次{tid}在站序{rank}没有已安排的离站")
+            engine = rs.engine_of[tid]
+            disruptions.append((engine, engine.hold, (tid, rank, rows[rank][2] + seconds)))
+        for tid, rank, at in params['holds']:
+            if tid not in rs.checi:
+                raise ValueError(f"未知的车次：{tid}")
+            engine = rs.engine_of[tid]
+            disruptions.append((engine, engine.hold, (tid, rank, at)))
+        for sid, track, start, end in params['closures']:
+            slot = rs.net.slot_of.get((sid, track))
+            if slot is None:
+                raise ValueError(f"未知的股道：车站{sid} {track}")
+            engine = rs.slot_engine.get(slot)
+            if engine is not None:          # 没有车次使用的股道，封锁不影响结果
+                disruptions.append((engine, engine.close_track, (slot, start, end)))
+        # 取消上一次推演的扰动并加入本次扰动，各引擎回退到两者中最早受影响的事件之前；
+        # 中途出错时这些引擎仍记为带有扰动，下一次推演时一并取消
+        engines = base.disrupted | {engine for engine, _, _ in disruptions}
+        base.disrupted = engines
+        for engine in engines:
+            engine.touched.clear()
+            engine.clear_disruptions()
+        for _, disrupt, args in disruptions:
+            disrupt(*args)
+        events = 0
+        for engine in engines:
+            popped = engine.queue.popped
+            engine.run()
+            events += engine.queue.popped - popped
+        base.disrupted = {engine for engine, _, _ in disruptions}
+        # 结果可能变化的车次都在各引擎的 touched 中（含被回退撤销、重新处理的车次），与基准方案逐车比较
+        changed = set()
+        for engine in engines:
+            changed.update(tid for tid in engine.touched if tid in base.rows and
+                           [(r.station_id, r.track, r.setoff_time, r.achieve_time) for r in engine.res[tid]] != base.rows[tid])
+        out['base'] = {'fails': base.fails, 'deviation': base.deviation}
+        out['changed'] = sorted(changed)
+        fail_set = rs.fail_set
+        deviation = base.deviation + sum(engine.total_deviation() - base.deviations[engine] for engine in engines)
+        res = rs.res
+    else:
+        s = _scheduler
+        s.reset(SchedulerConfig(**params['config']))
+        s.run()
+        events = s.queue.popped
+        fail_set = s.fail_set
+        deviation = s.total_deviation()
+        res = s.res
+    out.update(fails=len(fail_set), fail_set=sorted(fail_set), deviation=deviation,
+               events=events, seconds=round(time.perf_counter() - t, 6))
+    if params['rows']:
+        out['rows'] = _rows(res, _scheduler.checi)
+    return out
+
+
+class ScheduleService:
+    def __init__(self, scheduler: Scheduler, workers: int = None, cache_size: int = 256, warm: int = 1) -> None:
+        global _scheduler, _warm_size
+        _scheduler = scheduler
+        _warm_size = warm
+        self.scheduler = scheduler
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, dict] = OrderedDict()
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        if self.workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            self.pool = ThreadPoolExecutor(1)
+            self.workers = 1
+        else:
+            # 已加载的对象移出分代 GC 的追踪范围，子进程中的 GC 不写这些页面，共享页面保持不复制
+            gc.freeze()
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+            # 在启动事件循环之前创建全部子进程
+            self.pool.submit(int).result()
+
+    # 处理一个请求：缓存命中直接返回；同一参数正在计算时等待其结果
+    async def submit(self, op: str, body: dict) -> tuple[dict, bool]:
+        op, params = normalize(op, body)
+        key = cache_key(op, params)
+        self.requests += 1
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key], True
+        future = self.inflight.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future), True
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.inflight[key] = future
+        try:
+            result = await loop.run_in_executor(self.pool, execute, op, params)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时也标记异常已读取，避免“异常未被获取”的警告
+            future.exception()
+            raise
+        finally:
+            del self.inflight[key]
+        future.set_result(result)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result, False
+
+    def status(self) -> dict:
+        s = self.scheduler
+        return {'trains': len(s.checi), 'tracks': len(s.track_names), 'workers': self.workers,
+                'requests': self.requests, 'cache': {'entries': len(self.cache), 'size': self.cache_size,
+                                                      'hits': self.hits, 'misses': self.misses,
+                                                      'inflight': len(self.inflight)}}
+
+    # HTTP/1.1：每个连接可依次发送多个请求（Connection: close 时处理完即关闭）
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, path, _ = line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "无法解析的请求行"}, close=True)
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = h.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0) or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': "请求体过大"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                close = headers.get('connection', '').lower() == 'close'
+                status, payload, cached = await self._route(method, path.split('?', 1)[0], body)
+                await self._respond(writer, status, payload, close=close, cached=cached)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple[int, dict, bool]:
+        if method == 'GET' and path == '/status':
+            return 200, self.status(), False
+        if method == 'POST' and path in ('/schedule', '/whatif'):
+            try:
+                request = json.loads(body or b'{}')
+                result, cached = await self.submit(path[1:], request)
+            except (ValueError, TypeError, KeyError) as e:
+                return 400, {'error': str(e)}, False
+            except Exception as e:
+                return 500, {'error': f"{type(e).__name__}: {e}"}, False
+            return 200, result, cached
+        return 404, {'error': f"未知的请求：{method} {path}"}, False
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: dict,
+                       close: bool = False, cached: bool = False) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                  500: 'Internal Server Error'}[status]
+        head = (f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\nX-Cache: {'hit' if cached else 'miss'}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, unix: str = None) -> None:
+        if unix is not None:
+            if os.path.exists(unix):
+                os.unlink(unix)
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        # SIGTERM 与 Ctrl-C 相同：停止监听、关闭进程池、删除套接字文件
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            if unix is not None and os.path.exists(unix):
+                os.unlink(unix)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help="监听 Unix 套接字路径（代替 TCP）")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', type=int, default=256, help="缓存的结果数")
+    parser.add_argument('--warm', type=int, default=1, help="每个工作进程保留的扰动推演基准方案数（按调度参数，各占撤销日志的内存）")
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    loader = TableLoader(args.data)
+    scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+    service = ScheduleService(scheduler, args.workers, args.cache, args.warm)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"加载 {len(scheduler.checi)} 个车次，耗时 {time.perf_counter() - t:.3f}s；{service.workers} 个工作进程，监听 {where}")
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,630 @@
+# 路网数据的共享列式存储：把加载好的 info 一次性导出为内存映射文件（类型化数组），
+# 各工作进程以 attach() 零拷贝映射同一文件，按 info 原有的方式查表
+#   python sharedinfo.py [--data data] [--out /dev/shm/network.info] [--workers 4] [--seeds 2]
+# - 文件布局：魔数、头部长度、JSON 头部（各数组的类型、长度、偏移与各表的结构），之后各数组按 64 字节对齐存放
+# - attach() 只解析头部并映射文件，耗时与数据规模无关；各进程共享页缓存中的同一份数据（计为文件页而非进程私有内存），
+#   文件放在 /dev/shm 下即为共享内存
+# - 表按原插入顺序存放（遍历顺序与 dict 相同，由其构建的路网索引槽位编号不变），另存打包键的排序及其位置，查找为二分；
+#   组合键按导出时各列的最大值分配位宽打包为一个 int64，字符串（股道名、作业类型等）编码为名称表下标
+# - '车次信息' 为 SharedCheci（compact.CompactCheci 的数组表示），车次ID -> 下标为稠密数组，不在映射时建字典
+# - 可同时导出路网整数索引与候选股道（export_info 的 net、candidates），attach_network() 返回 SharedNetwork、
+#   SharedCandidates：进路间隔图与候选股道为 CSR 数组，访问时构造列表/TrackCandidate，工作进程无需重建索引
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from compact import CompactCheci, TrainView
+from dataloader import RunRuler, INFO_TABLES
+from network import NetworkIndex, TrackCandidate, WORKTYPES
+
+MAGIC = b'NETINFO1'
+ALIGN = 64
+
+# 访问时构造的值（各车次的候选股道、查找表的查找结果）在各进程中的缓存条数上限：满时整体清空，
+# 私有内存有界、与数据规模无关；调度中同时在途的车次远少于此，命中率高
+CACHE_SIZE = 4096
+
+# 各表的键列类型与值的形式：
+# - 键：'int' 整数、'str' 名称（单列时键为标量，否则为元组）
+# - 值：'int' 整数、'ints' 整数元组、'intlist' 整数列表、'str' 名称、'strs' 名称列表、'ruler' 运行标尺
+TABLE_KINDS: dict[str, tuple[tuple[str, ...], str]] = {
+    '车站股道': (('int',), 'strs'),
+    '列车停站股道': (('int', 'int'), 'strs'),
+    '列车通过股道': (('int', 'int'), 'str'),
+    '运行标尺': (('int', 'int', 'int'), 'ruler'),
+    '交路信息': (('int',), 'ints'),
+    '进路信息': (('int', 'int', 'str', 'str'), 'int'),
+    '间隔时间': (('int', 'int'), 'int'),
+}
+
+# 路网整数索引中的查找表（NetworkIndex 的同名属性）
+NETWORK_KINDS: dict[str, tuple[tuple[str, ...], str]] = {
+    'slot_of': (('int', 'str'), 'int'),
+    'station_slots': (('int',), 'intlist'),
+    'stop_slots': (('int', 'int'), 'intlist'),
+    'pass_slot': (('int', 'int'), 'int'),
+    'entrance_index': (('int',), 'int'),
+}
+
+# SharedCheci 的数组列与名称列（与 CompactCheci 的构造参数相同）
+CHECI_ARRAYS = ('train_id', 'offsets', 'ideally_time_setoff', 'ideally_time_achieve', 'station_id',
+                'stop_min', 'stop_max', 'stop_strategy', 'is_ideal_stop', 'has_ruler',
+                'runtime', 'start', 'stop', 'direction', 'property')
+CHECI_NAMES = ('stop_strategy_names', 'direction_names', 'property_names')
+
+
+# 车次信息的共享表示：数组来自映射的文件
+# index[tid] 为车次下标（-1 表示无此车次；同一车次ID出现多段时为最后一段），order 为各车次ID首次出现的顺序（dict 的遍历顺序）
+class SharedCheci(CompactCheci):
+    def __init__(self, arrays: dict[str, np.ndarray], names: dict[str, list[str]]) -> None:
+        for name in CHECI_ARRAYS:
+            setattr(self, name, arrays[name])
+        for name in CHECI_NAMES:
+            setattr(self, name, names[name])
+        self.index = arrays['index']
+        self.order = arrays['order']
+
+    def __getitem__(self, tid: int) -> TrainView:
+        if not 0 <= tid < len(self.index) or self.index[tid] < 0:
+            raise KeyError(tid)
+        return TrainView(self, int(self.index[tid]))
+
+    def __contains__(self, tid) -> bool:
+        return isinstance(tid, (int, np.integer)) and 0 <= tid < len(self.index) and self.index[tid] >= 0
+
+    def __iter__(self):
+        return iter(self.order.tolist())
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+
+# 共享的查找表：键、值均为按插入顺序存放的列；sorted_keys 为打包键的升序，sorted_pos 为其在插入顺序中的位置
+class SharedTable(Mapping):
+    def __init__(self, kinds: tuple[tuple[str, ...], str], arrays: dict[str, np.ndarray],
+                 shifts: list[int], labels: list) -> None:
+        self.key_kinds, self.value_kind = kinds
+        self.keys_ = [arrays[f'key{j}'] for j in range(len(self.key_kinds))]
+        self.values = [arrays[f'value{j}'] for j in range(sum(1 for name in arrays if name.startswith('value')))]
+        self.ptr = arrays.get('ptr')
+        self.sorted_keys = arrays['sorted_keys']
+        self.sorted_pos = arrays['sorted_pos']
+        # 查找用：memoryview 的下标访问直接得到 int，二分比 np.searchsorted 对单个值快得多
+        self._sorted_keys = memoryview(self.sorted_keys)
+        self._sorted_pos = memoryview(self.sorted_pos)
+        self._parts = list(zip(self.key_kinds, shifts, [1 << (b - a) for a, b in zip(shifts, shifts[1:] + [63])]))
+        self.shifts = shifts
+        self.labels = labels
+        self._codes = None
+        self._cache = {}
+
+    # 名称 -> 名称表下标（首次查找含名称的键时建立，规模与名称数相同）
+    def _code(self, label) -> int:
+        if self._codes is None:
+            self._codes = {label: code for code, label in enumerate(self.labels)}
+        return self._codes[label]
+
+    def _key(self, i: int):
+        key = tuple(int(col[i]) if kind == 'int' else self.labels[col[i]]
+                    for kind, col in zip(self.key_kinds, self.keys_))
+        return key[0] if len(key) == 1 else key
+
+    def _value(self, i: int):
+        kind = self.value_kind
+        values = self.values
+        labels = self.labels
+        if kind == 'int':
+            return int(values[0][i])
+        if kind == 'ints':
+            return tuple(int(col[i]) for col in values)
+        if kind == 'str':
+            return labels[values[0][i]]
+        if kind == 'intlist':
+            return values[0][self.ptr[i]:self.ptr[i + 1]].tolist()
+        if kind == 'strs':
+            return [labels[code] for code in values[0][self.ptr[i]:self.ptr[i + 1]].tolist()]
+        runtime, start, stop, direction, prop = values
+        return RunRuler(type=labels[direction[i]], runtime=int(runtime[i]), start=int(start[i]),
+                        stop=int(stop[i]), property=labels[prop[i]])
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except (KeyError, TypeError):
+            pass
+        value = self._lookup(key)
+        cache = self._cache
+        if len(cache) >= CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
+        return value
+
+    def _lookup(self, key):
+        parts = key if len(self.key_kinds) > 1 else (key,)
+        if not isinstance(parts, tuple) or len(parts) != len(self.key_kinds):
+            raise KeyError(key)
+        packed = 0
+        try:
+            for (kind, shift, limit), part in zip(self._parts, parts):
+                code = part if kind == 'int' else self._code(part)
+                if not 0 <= code < limit:
+                    raise KeyError(key)
+                packed |= int(code) << shift
+        except (KeyError, TypeError):
+            raise KeyError(key) from None
+        sorted_keys = self._sorted_keys
+        j = bisect_left(sorted_keys, packed)
+        if j == len(sorted_keys) or sorted_keys[j] != packed:
+            raise KeyError(key)
+        return self._value(self._sorted_pos[j])
+
+    def __iter__(self):
+        for i in range(len(self.sorted_pos)):
+            yield self._key(i)
+
+    def __len__(self) -> int:
+        return len(self.sorted_pos)
+
+
+# 按下标取名称的只读序列（槽位 -> 股道名）
+class _Labels(Sequence):
+    def __init__(self, codes: np.ndarray, labels: list) -> None:
+        self.codes = memoryview(codes)
+        self.labels = labels
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.labels[code] for code in self.codes[i]]
+        return self.labels[self.codes[i]]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+# CSR 邻接表的只读序列：第 e 项为 [(相邻进路编号, 最小间隔)]，访问时构造
+class _Adjacency(Sequence):
+    def __init__(self, ptr: np.ndarray, nodes: np.ndarray, weights: np.ndarray) -> None:
+        self.ptr = memoryview(ptr)
+        self.nodes = memoryview(nodes)
+        self.weights = memoryview(weights)
+
+    def __getitem__(self, e: int) -> list[tuple[int, int]]:
+        ptr = self.ptr
+        a, b = ptr[e], ptr[e + 1]
+        return list(zip(self.nodes[a:b], self.weights[a:b]))
+
+    def __len__(self) -> int:
+        return len(self.ptr) - 1
+
+
+# 槽位 -> {相邻站ID: [各作业类型的进路编号或 None]}，访问时构造（NetworkIndex.entrance_of 的只读视图）
+class _EntranceOf(Sequence):
+    def __init__(self, net: 'SharedNetwork') -> None:
+        self.net = net
+
+    def __getitem__(self, slot: int) -> dict[int, list[int]]:
+        net = self.net
+        n = len(WORKTYPES)
+        return {net.entrance_neighbor[k]: [e if e >= 0 else None for e in net.entrance_code[n * k:n * (k + 1)]]
+                for k in range(net.entrance_ptr[slot], net.entrance_ptr[slot + 1])}
+
+    def __len__(self) -> int:
+        return len(self.net.entrance_ptr) - 1
+
+
+# 路网整数索引的共享表示：查找表为 SharedTable，其余属性为映射数组上的只读视图，用法与 NetworkIndex 相同
+# 进路按槽位存为 CSR：槽位 slot 的各相邻站为 entrance_neighbor[entrance_ptr[slot]:entrance_ptr[slot + 1]]，
+# 第 k 个相邻站的各作业类型进路编号为 entrance_code[4k:4k + 4]（-1 表示无）
+class SharedNetwork(NetworkIndex):
+    def __init__(self, arrays: dict[str, np.ndarray], tables: dict[str, 'SharedTable'], labels: list) -> None:
+        self.track_names = _Labels(arrays['track_names'], labels)
+        self.track_station = memoryview(arrays['track_station'])
+        self.entrance_ids = memoryview(arrays['entrance_ids'])
+        for name, table in tables.items():
+            setattr(self, name, table)
+        self.entrance_ptr = memoryview(arrays['entrance_ptr'])
+        self.entrance_neighbor = memoryview(arrays['entrance_neighbor'])
+        self.entrance_code = memoryview(arrays['entrance_code'])
+        self.entrance_of = _EntranceOf(self)
+        self.gap_ptr = arrays['gap_ptr']
+        self.gap_next = arrays['gap_next']
+        self.gap_time = arrays['gap_time']
+        self.gap_former = _Adjacency(self.gap_ptr, self.gap_next, self.gap_time)
+        self.gap_latter = _Adjacency(arrays['latter_ptr'], arrays['latter_prev'], arrays['latter_time'])
+
+    def get_entrance(self, slot: int, neighbor_sid: int, worktype: int) -> int:
+        neighbor = self.entrance_neighbor
+        for k in range(self.entrance_ptr[slot], self.entrance_ptr[slot + 1]):
+            if neighbor[k] == neighbor_sid:
+                e = self.entrance_code[len(WORKTYPES) * k + worktype]
+                return e if e >= 0 else None
+        return None
+
+
+# 候选股道的共享表示：车次ID -> [站序 -> [TrackCandidate]]（build_candidate_table 的只读视图）
+# 第 i 个车次的各站序为 rank_ptr[i]:rank_ptr[i + 1]，第 r 个站序的候选股道为 cand_ptr[r]:cand_ptr[r + 1]；
+# 车次的候选股道在访问时构造并缓存（至多 CACHE_SIZE 个车次）
+class SharedCandidates(Mapping):
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self.index = memoryview(arrays['index'])
+        self.order = arrays['order']
+        for name in ('rank_ptr', 'cand_ptr', 'slot', 'entrance_in', 'entrance_out', 'fanout'):
+            setattr(self, name, memoryview(arrays[name]))
+        self._cache = {}
+
+    def __getitem__(self, tid: int) -> list[list[TrackCandidate]]:
+        ranks = self._cache.get(tid)
+        if ranks is None:
+            if tid not in self:
+                raise KeyError(tid)
+            ranks = self._build(self.index[tid])
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[tid] = ranks
+        return ranks
+
+    def _build(self, i: int) -> list[list[TrackCandidate]]:
+        cand_ptr = self.cand_ptr
+        ranks = []
+        for r in range(self.rank_ptr[i], self.rank_ptr[i + 1]):
+            a, b = cand_ptr[r], cand_ptr[r + 1]
+            ranks.append([TrackCandidate(slot, e_in if e_in >= 0 else None, e_out if e_out >= 0 else None, fanout)
+                          for slot, e_in, e_out, fanout in zip(self.slot[a:b], self.entrance_in[a:b],
+                                                                self.entrance_out[a:b], self.fanout[a:b])])
+        return ranks
+
+    def __contains__(self, tid) -> bool:
+        return isinstance(tid, (int, np.integer)) and 0 <= tid < len(self.index) and self.index[tid] >= 0
+
+    def __iter__(self):
+        return iter(self.order.tolist())
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+
+# 车次信息的数组列：紧凑表示直接取其数组，车次对象逐站展开
+def _checi_arrays(checi) -> tuple[dict[str, np.ndarray], dict[str, list[str]], list[int]]:
+    if isinstance(checi, CompactCheci):
+        arrays = {name: getattr(checi, name) for name in CHECI_ARRAYS}
+        names = {name: list(getattr(checi, name)) for name in CHECI_NAMES}
+        rows = [checi._index[tid] for tid in checi] if not isinstance(checi, SharedCheci) else \
+            [int(checi.index[tid]) for tid in checi]
+        return arrays, names, rows
+    codes: dict[str, dict[str, int]] = {name: {} for name in CHECI_NAMES}
+
+    def encode(name: str, value) -> int:
+        return -1 if value is None else codes[name].setdefault(value, len(codes[name]))
+
+    cols: dict[str, list] = {name: [] for name in CHECI_ARRAYS}
+    cols['offsets'].append(0)
+    for tid, ts in checi.items():
+        cols['train_id'].append(tid)
+        cols['ideally_time_setoff'].append(ts.ideally_time_setoff)
+        cols['ideally_time_achieve'].append(ts.ideally_time_achieve)
+        for st in ts.path:
+            r = st.ruler_info
+            cols['station_id'].append(st.id)
+            cols['stop_min'].append(st.stop_time_range[0])
+            cols['stop_max'].append(st.stop_time_range[1])
+            cols['stop_strategy'].append(encode('stop_strategy_names', st.stop_strategy))
+            cols['is_ideal_stop'].append(st.is_ideal_stop)
+            cols['has_ruler'].append(r is not None)
+            cols['runtime'].append(r.runtime if r is not None else 0)
+            cols['start'].append(r.start if r is not None else 0)
+            cols['stop'].append(r.stop if r is not None else 0)
+            cols['direction'].append(encode('direction_names', r.type) if r is not None else -1)
+            cols['property'].append(encode('property_names', r.property) if r is not None else -1)
+        cols['offsets'].append(len(cols['station_id']))
+    dtypes = {'train_id': np.int64, 'offsets': np.int64, 'stop_strategy': np.int8, 'direction': np.int8,
+              'property': np.int8, 'is_ideal_stop': bool, 'has_ruler': bool}
+    arrays = {name: np.array(col, dtype=dtypes.get(name, np.int32)) for name, col in cols.items()}
+    names = {name: list(codes[name]) for name in CHECI_NAMES}
+    return arrays, names, list(range(len(checi)))
+
+
+# 整数列取能容纳其取值的最小类型（int32 或 int64）
+def _ints(values) -> np.ndarray:
+    col = np.array(values, dtype=np.int64)
+    if len(col) and (col.min() < -2 ** 31 or col.max() >= 2 ** 31):
+        return col
+    return col.astype(np.int32)
+
+
+# 一张表的数组列：返回 (数组, 各键列的位移)
+def _table_arrays(table: Mapping, kinds: tuple[tuple[str, ...], str],
+                  label_code) -> tuple[dict[str, np.ndarray], list[int]]:
+    key_kinds, value_kind = kinds
+    items = list(table.items())
+    keys = [key if len(key_kinds) > 1 else (key,) for key, _ in items]
+    arrays: dict[str, np.ndarray] = {}
+    shifts = []
+    shift = 0
+    packed = np.zeros(len(keys), dtype=np.int64)
+    for j, kind in enumerate(key_kinds):
+        col = _ints([k[j] if kind == 'int' else label_code(k[j]) for k in keys])
+        if len(col) and col.min() < 0:
+            raise ValueError("共享存储的键须为非负整数")
+        arrays[f'key{j}'] = col
+        shifts.append(shift)
+        packed |= col.astype(np.int64) << shift
+        shift += max(1, int(col.max()).bit_length() if len(col) else 1)
+    if shift > 63:
+        raise ValueError(f"组合键超过 63 位：{key_kinds}")
+    order = np.argsort(packed, kind='stable')
+    arrays['sorted_keys'] = packed[order]
+    arrays['sorted_pos'] = _ints(order)
+    values = [v for _, v in items]
+    if value_kind == 'int':
+        arrays['value0'] = _ints(values)
+    elif value_kind == 'ints':
+        width = len(values[0]) if values else 0
+        for j in range(width):
+            arrays[f'value{j}'] = _ints([v[j] for v in values])
+    elif value_kind == 'str':
+        arrays['value0'] = np.array([label_code(v) for v in values], dtype=np.int32)
+    elif value_kind in ('intlist', 'strs'):
+        arrays['ptr'] = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in values], out=arrays['ptr'][1:])
+        if value_kind == 'intlist':
+            arrays['value0'] = _ints([x for v in values for x in v])
+        else:
+            arrays['value0'] = np.array([label_code(x) for v in values for x in v], dtype=np.int32)
+    else:
+        arrays['value0'] = np.array([r.runtime for r in values], dtype=np.int32)
+        arrays['value1'] = np.array([r.start for r in values], dtype=np.int32)
+        arrays['value2'] = np.array([r.stop for r in values], dtype=np.int32)
+        arrays['value3'] = np.array([label_code(r.type) for r in values], dtype=np.int32)
+        arrays['value4'] = np.array([label_code(r.property) for r in values], dtype=np.int32)
+    return arrays, shifts
+
+
+# 路网整数索引的数组：查找表按 NETWORK_KINDS 存放（结构记入 tables），进路与进路间隔图为 CSR 数组
+def _network_arrays(net: NetworkIndex, label_code, tables: dict) -> dict[str, np.ndarray]:
+    arrays: dict[str, np.ndarray] = {}
+    for name, kinds in NETWORK_KINDS.items():
+        table_arrays, shifts = _table_arrays(getattr(net, name), kinds, label_code)
+        for col, array in table_arrays.items():
+            arrays[f'{name}/{col}'] = array
+        tables[name] = {'shifts': shifts, 'columns': list(table_arrays)}
+    arrays['track_names'] = np.array([label_code(name) for name in net.track_names], dtype=np.int32)
+    arrays['track_station'] = _ints(net.track_station)
+    arrays['entrance_ids'] = _ints(net.entrance_ids)
+    arrays['entrance_ptr'] = np.zeros(len(net.entrance_of) + 1, dtype=np.int64)
+    np.cumsum([len(by_neighbor) for by_neighbor in net.entrance_of], out=arrays['entrance_ptr'][1:])
+    arrays['entrance_neighbor'] = _ints([sid for by_neighbor in net.entrance_of for sid in by_neighbor])
+    arrays['entrance_code'] = _ints([-1 if e is None else e for by_neighbor in net.entrance_of
+                                     for by_worktype in by_neighbor.values() for e in by_worktype])
+    arrays['gap_ptr'] = np.asarray(net.gap_ptr, dtype=np.int64)
+    arrays['gap_next'] = np.asarray(net.gap_next, dtype=np.int64)
+    arrays['gap_time'] = np.asarray(net.gap_time, dtype=np.int64)
+    arrays['latter_ptr'] = np.zeros(len(net.gap_latter) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in net.gap_latter], out=arrays['latter_ptr'][1:])
+    arrays['latter_prev'] = np.array([e for x in net.gap_latter for e, _ in x], dtype=np.int64)
+    arrays['latter_time'] = np.array([gap for x in net.gap_latter for _, gap in x], dtype=np.int64)
+    return arrays
+
+
+# 候选股道的数组：各车次按遍历顺序，车次ID -> 下标为稠密数组 index；无进路记为 -1
+def _candidate_arrays(candidates: Mapping) -> dict[str, np.ndarray]:
+    order = np.array(list(candidates), dtype=np.int64)
+    if len(order) and order.min() < 0:
+        raise ValueError("共享存储的车次ID须为非负整数")
+    index = np.full(int(order.max()) + 1 if len(order) else 0, -1, dtype=np.int64)
+    index[order] = np.arange(len(order))
+    ranks = [cands for tid in order.tolist() for cands in candidates[tid]]
+    flat = [c for cands in ranks for c in cands]
+    arrays = {'index': index, 'order': order}
+    arrays['rank_ptr'] = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum([len(candidates[tid]) for tid in order.tolist()], out=arrays['rank_ptr'][1:])
+    arrays['cand_ptr'] = np.zeros(len(ranks) + 1, dtype=np.int64)
+    np.cumsum([len(cands) for cands in ranks], out=arrays['cand_ptr'][1:])
+    arrays['slot'] = _ints([c.slot for c in flat])
+    arrays['entrance_in'] = _ints([-1 if c.entrance_in is None else c.entrance_in for c in flat])
+    arrays['entrance_out'] = _ints([-1 if c.entrance_out is None else c.entrance_out for c in flat])
+    arrays['fanout'] = _ints([c.fanout for c in flat])
+    return arrays
+
+
+# 导出 info 到 path（先写临时文件再替换，映射中的旧文件不受影响）；返回写入的字节数
+# 给出 net、candidates（TableLoader 的 '整数索引'、'候选股道'）时一并导出，供 attach_network() 映射
+def export_info(info, path: str, net: NetworkIndex = None, candidates: Mapping = None) -> int:
+    labels: dict = {}
+
+    def label_code(label) -> int:
+        return labels.setdefault(label, len(labels))
+
+    arrays: dict[str, np.ndarray] = {}
+    tables = {}
+    for name, kinds in TABLE_KINDS.items():
+        table_arrays, shifts = _table_arrays(info[name], kinds, label_code)
+        for col, array in table_arrays.items():
+            arrays[f'{name}/{col}'] = array
+        tables[name] = {'shifts': shifts, 'columns': list(table_arrays)}
+    if (net is None) != (candidates is None):
+        raise ValueError("整数索引与候选股道须一并导出")
+    if net is not None:
+        for col, array in _network_arrays(net, label_code, tables).items():
+            arrays[f'整数索引/{col}'] = array
+        for col, array in _candidate_arrays(candidates).items():
+            arrays[f'候选股道/{col}'] = array
+    checi_arrays, checi_names, rows = _checi_arrays(info['车次信息'])
+    train_id = checi_arrays['train_id']
+    order = np.array([int(train_id[i]) for i in rows], dtype=np.int64)
+    if len(order) and order.min() < 0:
+        raise ValueError("共享存储的车次ID须为非负整数")
+    index = np.full(int(order.max()) + 1 if len(order) else 0, -1, dtype=np.int64)
+    index[order] = rows
+    checi_arrays = dict(checi_arrays, index=index, order=order)
+    for col, array in checi_arrays.items():
+        arrays[f'车次信息/{col}'] = np.ascontiguousarray(array)
+    header = {'labels': list(labels), 'tables': tables, 'checi_names': checi_names, 'arrays': {},
+              'network': net is not None}
+
+    offset = 0
+    for key, array in arrays.items():
+        header['arrays'][key] = [array.dtype.str, len(array), offset]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    start = -(-(len(MAGIC) + 8 + len(head)) // ALIGN) * ALIGN
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(head).to_bytes(8, 'little'))
+        f.write(head)
+        for key, array in arrays.items():
+            f.seek(start + header['arrays'][key][2])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+    return start + offset
+
+
+# 读取头部并映射全部数组：返回 (头部, 数组)
+def _map(path: str) -> tuple[dict, dict[str, np.ndarray]]:
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是共享路网文件：{path}")
+        n = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(n).decode('utf-8'))
+    start = -(-(len(MAGIC) + 8 + n) // ALIGN) * ALIGN
+    buf = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {key: np.frombuffer(buf, dtype=np.dtype(dtype), count=count, offset=start + offset)
+              for key, (dtype, count, offset) in header['arrays'].items()}
+    return header, arrays
+
+
+# 映射导出的文件：返回与 load() 相同键的 info（各表为只读的 SharedTable / SharedCheci）
+def attach(path: str) -> dict[str, any]:
+    header, arrays = _map(path)
+    labels = header['labels']
+    info: dict[str, any] = {}
+    for name in INFO_TABLES:
+        if name == '车次信息':
+            columns = {col: arrays[f'{name}/{col}'] for col in CHECI_ARRAYS + ('index', 'order')}
+            info[name] = SharedCheci(columns, header['checi_names'])
+        else:
+            spec = header['tables'][name]
+            columns = {col: arrays[f'{name}/{col}'] for col in spec['columns']}
+            info[name] = SharedTable(TABLE_KINDS[name], columns, spec['shifts'], labels)
+    return info
+
+
+# 映射导出的路网整数索引与候选股道：返回 (SharedNetwork, SharedCandidates)，可直接传给 Scheduler(info, net=, candidates=)
+def attach_network(path: str) -> tuple[SharedNetwork, SharedCandidates]:
+    header, arrays = _map(path)
+    if not header.get('network'):
+        raise ValueError(f"共享路网文件未导出整数索引与候选股道：{path}")
+    labels = header['labels']
+    tables = {}
+    for name, kinds in NETWORK_KINDS.items():
+        spec = header['tables'][name]
+        columns = {col: arrays[f'整数索引/{name}/{col}'] for col in spec['columns']}
+        tables[name] = SharedTable(kinds, columns, spec['shifts'], labels)
+    net = SharedNetwork({key[len('整数索引/'):]: array for key, array in arrays.items() if key.startswith('整数索引/')},
+                        tables, labels)
+    candidates = SharedCandidates({key[len('候选股道/'):]: array for key, array in arrays.items()
+                                   if key.startswith('候选股道/')})
+    return net, candidates
+
+
+# 工作进程：映射共享文件并建立调度引擎（进程启动方式为 spawn，不继承主进程的数据）
+# 整数索引与候选股道同样来自映射，引擎构造只分配每次运行的状态
+_scheduler = None
+_attach_seconds = 0.0
+_init_seconds = 0.0
+
+
+def _init_worker(path: str) -> None:
+    global _scheduler, _attach_seconds, _init_seconds
+    from scheduler import Scheduler, SchedulerConfig
+    t = time.perf_counter()
+    info = attach(path)
+    net, candidates = attach_network(path)
+    _attach_seconds = time.perf_counter() - t
+    t = time.perf_counter()
+    _scheduler = Scheduler(info, SchedulerConfig(verbose=False), net=net, candidates=candidates)
+    _init_seconds = time.perf_counter() - t
+
+
+# 进程内存（KB）：私有（匿名）页与文件映射页
+def _rss() -> tuple[int, int]:
+    fields = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                fields[key] = int(value.split()[0]) if key in ('RssAnon', 'RssFile', 'RssShmem') else None
+    except OSError:
+        return 0, 0
+    return fields.get('RssAnon', 0), fields.get('RssFile', 0) + fields.get('RssShmem', 0)
+
+
+def _run_worker(config) -> tuple[int, int, int, float, float, int, int, int]:
+    anon_start, _ = _rss()
+    _scheduler.reset(config)
+    _scheduler.run()
+    anon, mapped = _rss()
+    return os.getpid(), len(_scheduler.fail_set), _scheduler.total_deviation(), _attach_seconds, _init_seconds, \
+        anon_start, anon, mapped
+
+
+if __name__ == '__main__':
+    import pickle
+    from dataloader import TableLoader
+    from portfolio import portfolio_configs
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--out', default="/dev/shm/network.info" if os.path.isdir("/dev/shm") else "network.info")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seeds', type=int, default=2)
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data, compact=True)
+    info = loader.load()
+    net = loader.get('整数索引')
+    candidates = loader.get('候选股道')
+    t = time.perf_counter()
+    size = export_info(info, args.out, net, candidates)
+    print(f"导出 {size / 2 ** 20:.1f} MB -> {args.out}，耗时 {time.perf_counter() - t:.3f}s"
+          f"（info 序列化为 pickle 约 {len(pickle.dumps(info)) / 2 ** 20:.1f} MB）")
+    t = time.perf_counter()
+    shared = attach(args.out)
+    shared_net, shared_candidates = attach_network(args.out)
+    print(f"映射耗时 {(time.perf_counter() - t) * 1000:.2f}ms")
+    # 核对查找结果与原表一致
+    for name in TABLE_KINDS:
+        assert list(shared[name].items()) == list(info[name].items()), name
+    checi = info['车次信息']
+    assert list(shared['车次信息']) == list(checi)
+    assert all(shared['车次信息'][tid].ideally_time_setoff == checi[tid].ideally_time_setoff and
+               [s.id for s in shared['车次信息'][tid].path] == [s.id for s in checi[tid].path] for tid in checi)
+    for name in ('track_names', 'track_station', 'entrance_ids', 'entrance_of', 'gap_former', 'gap_latter'):
+        assert list(getattr(shared_net, name)) == list(getattr(net, name)), name
+    for name in NETWORK_KINDS:
+        assert dict(getattr(shared_net, name).items()) == getattr(net, name), name
+    assert list(shared_candidates) == list(candidates)
+    assert all([[repr(c) for c in cands] for cands in shared_candidates[tid]] ==
+               [[repr(c) for c in cands] for cands in candidates[tid]] for tid in candidates)
+
+    configs = portfolio_configs(seeds=args.seeds)
+    t = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.workers, _init_worker, (args.out,)) as pool:
+        results = pool.map(_run_worker, configs)
+    print(f"{args.workers} 个工作进程运行 {len(configs)} 组参数，耗时 {time.perf_counter() - t:.2f}s")
+    first, last = {}, {}
+    for pid, fails, deviation, attach_seconds, init_seconds, anon_start, anon, mapped in results:
+        first.setdefault(pid, anon_start)
+        last[pid] = (attach_seconds, init_seconds, anon, mapped)
+    for pid, (attach_seconds, init_seconds, anon, mapped) in sorted(last.items()):
+        print(f"  进程 {pid}：映射 {attach_seconds * 1000:.2f}ms，构造引擎 {init_seconds * 1000:.1f}ms，"
+              f"私有内存 {first[pid] / 1024:.1f} MB（运行后 {anon / 1024:.1f} MB），共享映射 {mapped / 1024:.1f} MB")
+    best = min(results, key=lambda r: (r[1], r[2]))
+    print(f"最好结果：失败 {best[1]}，总偏移量 {best[2]}")
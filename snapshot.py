@@ -0,0 +1,98 @@
+# 解析结果的磁盘快照：每张表一个 pickle 文件，按源文件（大小、修改时间、内容哈希）与依赖表版本失效
+import gc
+import os
+import json
+import pickle
+import hashlib
+
+# 快照格式版本：快照文件结构变化时递增，使旧快照整体失效；单张表的构造逻辑变化见 dataloader.BUILDER_VERSIONS
+SNAPSHOT_FORMAT = 1
+
+# 可共享（需保持对象同一性）的值：排除不可变的基本类型
+_PLAIN_TYPES = (int, float, str, bool, tuple, type(None))
+
+
+class Snapshot:
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        # 源文件清单：路径 -> [大小, 修改时间(ns), 内容哈希]
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        try:
+            with open(self._manifest_path, encoding="utf-8") as f:
+                self._manifest: dict[str, list] = json.load(f)
+        except (OSError, ValueError):
+            self._manifest = {}
+        self._dirty = False
+
+    # 文件内容哈希：大小与修改时间均未变时直接复用清单中的哈希，不重读文件
+    def file_digest(self, path: str) -> str:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self._manifest.get(key)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._manifest[key] = [st.st_size, st.st_mtime_ns, digest]
+        self._dirty = True
+        return digest
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+
+    # 读取快照：版本不符或文件损坏时返回 None
+    # resolve((表名, 键)) 用于还原对依赖表中对象的引用（如 TrainStation.ruler_info -> 运行标尺）
+    def read(self, name: str, version: str, resolve):
+        try:
+            with open(self._path(name), "rb") as f:
+                if pickle.load(f) != version:
+                    return None
+                unpickler = pickle.Unpickler(f)
+                unpickler.persistent_load = resolve
+                # 反序列化大量小对象时暂停分代 GC，避免反复扫描新建对象
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    return (unpickler.load(),)
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, KeyError):
+            return None
+
+    # 写入快照：依赖表中的对象以 (表名, 键) 引用保存，加载后与依赖表共享同一对象
+    def write(self, name: str, version: str, value, deps: dict[str, dict]) -> None:
+        refs = {}
+        for dep, table in deps.items():
+            if isinstance(table, dict):
+                for k, v in table.items():
+                    if not isinstance(v, _PLAIN_TYPES):
+                        refs[id(v)] = (dep, k)
+        tmp = self._path(name) + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(version, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = lambda obj: refs.get(id(obj))
+            pickler.dump(value)
+        os.replace(tmp, self._path(name))
+
+    # 保存源文件清单
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp, self._manifest_path)
+        self._dirty = False
+
+
+# 表版本：构造函数版本、源文件哈希与依赖表版本共同决定
+def table_version(name: str, builder_version: int, file_digests: list[str], dep_versions: list[str]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((SNAPSHOT_FORMAT, name, builder_version, file_digests, dep_versions)).encode("utf-8"))
+    return h.hexdigest()
@@ -0,0 +1,118 @@
+# 资源时间线：按开始时刻排序、互不相交的占用区间 [start, end)，
+# “t 之后最早空闲时刻”等查询为一次二分查找。
+# 设置 journal（见 journal.py）后，每次修改都登记撤销操作，可随调度状态一起回滚。
+from bisect import bisect_left, bisect_right
+
+
+class Timeline:
+    __slots__ = ('starts', 'ends', 'journal')
+
+    def __init__(self, journal=None) -> None:
+        # 相交或首尾相接的区间在插入时合并，因此 starts、ends 均严格递增
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.journal = journal
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __repr__(self) -> str:
+        return f"Timeline({list(self)})"
+
+    # t 时刻是否被占用
+    def busy(self, t: int) -> bool:
+        i = bisect_right(self.starts, t) - 1
+        return i >= 0 and self.ends[i] > t
+
+    # 不早于 t 的最早空闲时刻（区间已合并，所在区间的结束时刻即空闲）
+    def earliest(self, t: int) -> int:
+        i = bisect_right(self.starts, t) - 1
+        if i >= 0 and self.ends[i] > t:
+            return self.ends[i]
+        return t
+
+    # 修改前登记撤销：区间 [i, j) 将被替换为 k 个区间
+    def _log(self, i: int, j: int, k: int) -> None:
+        self.journal.log.append((_restore, self, i, i + k, self.starts[i:j], self.ends[i:j]))
+
+    # 标记 [start, end) 为占用，与已有区间合并；返回是否有新的时刻变为占用
+    def add(self, start: int, end: int) -> bool:
+        if end <= start:
+            return False
+        starts, ends = self.starts, self.ends
+        # 常见情形：按时间顺序登记，只涉及最后一个区间
+        if not ends or start > ends[-1]:
+            if self.journal is not None:
+                self._log(len(ends), len(ends), 1)
+            starts.append(start)
+            ends.append(end)
+            return True
+        if start >= starts[-1]:
+            if end <= ends[-1]:
+                return False
+            if self.journal is not None:
+                self._log(len(ends) - 1, len(ends), 1)
+            ends[-1] = end
+            return True
+        k = bisect_right(starts, start) - 1
+        if k >= 0 and ends[k] >= end:
+            return False
+        i = bisect_left(ends, start)
+        j = bisect_right(starts, end)
+        if i < j:
+            start = min(start, starts[i])
+            end = max(end, ends[j - 1])
+        if self.journal is not None:
+            self._log(i, j, 1)
+        starts[i:j] = [start]
+        ends[i:j] = [end]
+        return True
+
+    # 释放 [start, end)：与之相交的区间被截去相交部分
+    def remove(self, start: int, end: int) -> None:
+        if end <= start:
+            return
+        starts, ends = self.starts, self.ends
+        i = bisect_right(ends, start)
+        j = bisect_left(starts, end)
+        if i >= j:
+            return
+        pieces_s, pieces_e = [], []
+        if starts[i] < start:
+            pieces_s.append(starts[i])
+            pieces_e.append(start)
+        if ends[j - 1] > end:
+            pieces_s.append(end)
+            pieces_e.append(ends[j - 1])
+        if self.journal is not None:
+            self._log(i, j, len(pieces_s))
+        starts[i:j] = pieces_s
+        ends[i:j] = pieces_e
+
+    # 丢弃在 t 及之前已结束的区间
+    def prune(self, t: int) -> None:
+        i = bisect_right(self.ends, t)
+        if i:
+            if self.journal is not None:
+                self._log(0, i, 0)
+            del self.starts[:i]
+            del self.ends[:i]
+
+
+def _restore(timeline: Timeline, i: int, j: int, starts: list[int], ends: list[int]) -> None:
+    timeline.starts[i:j] = starts
+    timeline.ends[i:j] = ends
+
+
+# 多条时间线同时空闲的最早时刻（不早于 t）：交替查询直到各时间线给出同一时刻
+def earliest_common(timelines: list[Timeline], t: int) -> int:
+    while True:
+        s = t
+        for timeline in timelines:
+            s = timeline.earliest(s)
+        if s == t:
+            return t
+        t = s
@@ -0,0 +1,322 @@
+# 调度结果校验：独立于调度引擎，检查 res 是否满足进路间隔、股道独占、停站时间与交路接续约束
+#   python validate.py [--data data] [--repeat 5]
+# 从 res 提取各资源的使用记录，按 (资源, 时刻) 排序后用 NumPy 二分查找/前缀最大值一次性检查，代价 O(n log n)：
+# - 进路间隔（headway）：前车在 t 使用进路 e 后，其后继进路 e2 在 [t, t + 间隔) 内不能被其他车次使用
+#   （列车使用的进路：到站“接车”、离站“发车”、通过站“通过接车”与“通过发车”，由股道与相邻站确定）
+# - 股道独占（track）：同一股道上的占用区间互不相交，且始发、终到、通过的瞬时使用不落在其他车次的占用区间内
+#   （占用区间：中间停站 [到达, 发车)；交路前车终到至后车在同一股道始发 [到达, 后车发车)）
+# - 停站时间（stop_time）：中间停站的停站时间在 stop_time_range 内（调度放宽延迟预算时可能超出上限）
+# - 交路（exchange）：后车始发与前车终到的间隔（跨日按 86400 取模）在 [最小, 最大] 连接时间内；
+#   交路股道（exchange_track）：后车在前车的终到股道始发
+# 只检查 res 中已有的记录：调度失败的车次只检查其已安排的部分。
+# 不随调度结果变化的部分（各车次各站的相邻站、停站时间、交路、进路查找表）在构造时展平为数组，
+# 每次校验只从结果行读出股道与到/发时刻，其余均为数组运算，可在每次组合调度或局部搜索迭代后运行。
+import time
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from network import JIECHE, FACHE, PASS_JIECHE, PASS_FACHE, NetworkIndex
+
+# 排序键 = 资源编号 * KEY_SCALE + 时刻（时刻含跨日的延迟，远小于该值）
+KEY_SCALE = 1 << 32
+
+
+# 一条违反约束的记录
+@dataclass
+class Violation:
+    kind: str                   # headway / track / stop_time / exchange / exchange_track
+    tid: int                    # 车次ID
+    rank: int                   # 站序
+    time: int                   # 发生时刻
+    other_tid: int = -1         # 冲突的另一车次（无则 -1）
+    other_rank: int = -1
+    resource: object = None     # 进路ID、(车站ID, 股道名) 等
+    detail: str = ''
+
+
+# 校验结果
+@dataclass
+class ValidationReport:
+    violations: list[Violation] = field(default_factory=list)
+    checked: dict[str, int] = field(default_factory=dict)     # 各类约束检查的记录数
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    # 各类违反约束的条数
+    def counts(self) -> dict[str, int]:
+        counts = {}
+        for v in self.violations:
+            counts[v.kind] = counts.get(v.kind, 0) + 1
+        return counts
+
+    def summary(self) -> str:
+        counts = self.counts()
+        items = '，'.join(f"{kind} {n}/{self.checked.get(kind, 0)}" for kind, n in counts.items())
+        return f"校验 {self.seconds * 1000:.1f}ms：" + (items if items else "无违反约束")
+
+
+class ScheduleValidator:
+    def __init__(self, info, net: NetworkIndex) -> None:
+        self.checi = info['车次信息']
+        self.exchanges = info['交路信息']
+        self.net = net
+        # 不随调度结果变化的数据，按 (车次, 站序) 展平：车次 tid 的站序 rank 位于下标 base[tid] + rank
+        self.tids = sorted(self.checi)
+        self.base: dict[int, int] = {}
+        tid_of, rank_of, prev_sid, next_sid, is_stop, is_last, stop_min, stop_max, pass_slot = ([] for _ in range(9))
+        for tid in self.tids:
+            path = self.checi[tid].path
+            self.base[tid] = len(tid_of)
+            for rank, station in enumerate(path):
+                tid_of.append(tid)
+                rank_of.append(rank)
+                prev_sid.append(path[rank - 1].id if rank > 0 else -1)
+                next_sid.append(path[rank + 1].id if rank + 1 < len(path) else -1)
+                is_stop.append(station.is_ideal_stop)
+                is_last.append(rank == len(path) - 1)
+                stop_min.append(station.stop_time_range[0])
+                stop_max.append(station.stop_time_range[1])
+                # 结果行未记录通过股道时取通过股道表
+                track = info['列车通过股道'].get((tid, station.id))
+                pass_slot.append(net.slot_of.get((station.id, track), -1) if track is not None else -1)
+        self.tid_of = np.array(tid_of, dtype=np.int64)
+        self.rank_of = np.array(rank_of, dtype=np.int64)
+        self.prev_sid = np.array(prev_sid, dtype=np.int64)
+        self.next_sid = np.array(next_sid, dtype=np.int64)
+        self.is_stop = np.array(is_stop, dtype=bool)
+        self.is_first = self.rank_of == 0
+        self.is_last = np.array(is_last, dtype=bool)
+        self.stop_min = np.array(stop_min, dtype=np.int64)
+        self.stop_max = np.array(stop_max, dtype=np.int64)
+        self.pass_slot = np.array(pass_slot, dtype=np.int64)
+        # 交路：前车终到的下标 -> 后车始发的下标（无交路为 -1）
+        succ = np.full(len(tid_of), -1, dtype=np.int64)
+        self.exchange_min = np.zeros(len(tid_of), dtype=np.int64)
+        self.exchange_max = np.zeros(len(tid_of), dtype=np.int64)
+        for tid, exchange in self.exchanges.items():
+            if tid in self.base and exchange[0] in self.base:
+                k = self.base[tid] + len(self.checi[tid].path) - 1
+                succ[k] = self.base[exchange[0]]
+                self.exchange_min[k], self.exchange_max[k] = exchange[2], exchange[3]
+        self.succ = succ
+        # 进路查找表：键 (槽位, 相邻站ID, 作业类型) 编码为整数后排序，批量二分查找
+        self._sid_scale = 4 * (max([sid for sid in net.track_station] + [int(x) for x in prev_sid + next_sid], default=0) + 2)
+        keys, values = [], []
+        for slot, by_neighbor in enumerate(net.entrance_of):
+            for neighbor, by_worktype in by_neighbor.items():
+                for worktype, e in enumerate(by_worktype):
+                    if e is not None:
+                        keys.append(self._entrance_key(slot, neighbor, worktype))
+                        values.append(e)
+        order = np.argsort(np.array(keys, dtype=np.int64), kind='stable')
+        self.entrance_keys = np.array(keys, dtype=np.int64)[order]
+        self.entrance_values = np.array(values, dtype=np.int64)[order]
+
+    def _entrance_key(self, slot, neighbor, worktype):
+        return slot * self._sid_scale + (neighbor + 1) * 4 + worktype
+
+    # 批量查找进路编号：返回 (进路编号, 是否存在)
+    def _entrances(self, slot: np.ndarray, neighbor: np.ndarray, worktype: int) -> tuple[np.ndarray, np.ndarray]:
+        keys = self._entrance_key(slot, neighbor, worktype)
+        i = np.searchsorted(self.entrance_keys, keys)
+        i = np.minimum(i, len(self.entrance_keys) - 1)
+        found = (self.entrance_keys[i] == keys) if len(self.entrance_keys) else np.zeros(len(keys), dtype=bool)
+        return self.entrance_values[i] if len(self.entrance_keys) else keys, found
+
+    # 校验 res（与 Scheduler.res 相同形式：按车次ID索引的结果行列表）
+    def check(self, res) -> ValidationReport:
+        t0 = time.perf_counter()
+        report = ValidationReport()
+        slot_get = self.net.slot_of.get
+        # 结果行按展平下标放入稠密数组：槽位（-1 表示无结果行或未选股道）、到达、发车
+        n = len(self.tid_of)
+        index, slots, arrive, depart = [], [], [], []
+        for tid in self.tids:
+            rows = res[tid]
+            if not rows:
+                continue
+            base = self.base[tid]
+            index.extend(range(base, base + len(rows)))
+            slots += [slot_get((r.station_id, r.track), -1) for r in rows]
+            arrive += [r.achieve_time for r in rows]
+            depart += [r.setoff_time for r in rows]
+        index = np.array(index, dtype=np.int64)
+        slot = np.full(n, -1, dtype=np.int64)
+        slot[index] = slots
+        arr = np.full(n, -999, dtype=np.int64)
+        arr[index] = arrive
+        dep = np.full(n, -999, dtype=np.int64)
+        dep[index] = depart
+        present = np.zeros(n, dtype=bool)
+        present[index] = True
+        is_stop = self.is_stop
+        passing = present & ~is_stop
+        slot = np.where(passing & (slot < 0), self.pass_slot, slot)
+        present &= slot >= 0                                    # 始发即失败、未选股道的记录不占用资源
+        passing &= present
+        stopping = present & is_stop
+
+        # 进路使用
+        parts = []
+        for mask, times, neighbor, worktype in (
+                (passing, arr, self.prev_sid, PASS_JIECHE),
+                (passing, arr, self.next_sid, PASS_FACHE),
+                (stopping & ~self.is_first & (arr != -999), arr, self.prev_sid, JIECHE),
+                (stopping & ~self.is_last & (dep != -999), dep, self.next_sid, FACHE)):
+            k = np.flatnonzero(mask)
+            e, found = self._entrances(slot[k], neighbor[k], worktype)
+            parts.append((e[found], times[k[found]], k[found]))
+        e = np.concatenate([p[0] for p in parts])
+        t = np.concatenate([p[1] for p in parts])
+        k = np.concatenate([p[2] for p in parts])
+        self._check_headway(report, e, t, self.tid_of[k], self.rank_of[k])
+
+        # 股道：交路前车终到至后车在同一股道始发为占用区间，其余终到、始发、通过为瞬时使用
+        middle = stopping & ~self.is_first & ~self.is_last
+        succ = self.succ
+        linked = stopping & self.is_last & (succ >= 0)
+        linked_k = np.flatnonzero(linked)
+        same = present[succ[linked_k]] & (slot[succ[linked_k]] == slot[linked_k])
+        linked[linked_k[~same]] = False
+        end = np.where(linked, dep[np.maximum(succ, 0)], dep)
+        end = np.where(linked & (end < arr), end + 86400, end)
+        occupied = (middle & (dep != -999)) | linked
+        point_arrive = passing | (middle & (dep == -999)) | (stopping & self.is_last & ~linked)
+        point_depart = stopping & self.is_first & (dep != -999)
+        o = np.flatnonzero(occupied)
+        pa, pd = np.flatnonzero(point_arrive), np.flatnonzero(point_depart)
+        pk = np.concatenate([pa, pd])
+        self._check_tracks(report, slot[o], arr[o], end[o], self.tid_of[o], self.rank_of[o],
+                           slot[pk], np.concatenate([arr[pa], dep[pd]]), self.tid_of[pk], self.rank_of[pk])
+
+        # 停站时间
+        s = np.flatnonzero(middle & (dep != -999))
+        self._check_stops(report, np.stack([arr[s], dep[s], self.stop_min[s], self.stop_max[s],
+                                            self.tid_of[s], self.rank_of[s]], axis=1))
+
+        # 交路：前车已终到（终到结果行存在）且后车有始发结果行
+        x = np.flatnonzero(present & self.is_last & (succ >= 0))
+        x = x[present[succ[x]]]
+        self._check_exchanges(report, x, slot, arr, dep)
+        report.seconds = time.perf_counter() - t0
+        return report
+
+    # 进路间隔：对每次使用 (e, t) 与 e 的每个后继 (e2, gap)，二分查找 e2 在 [t, t + gap) 内的使用
+    def _check_headway(self, report, e, t, tid, rank) -> None:
+        net = self.net
+        report.checked['headway'] = len(e)
+        keys = e * KEY_SCALE + t
+        order = np.argsort(keys, kind='stable')
+        keys, e, t, tid, rank = keys[order], e[order], t[order], tid[order], rank[order]
+        # 展开 (使用, 后继进路) 对：CSR 数组中第 i 次使用的后继为 gap_next[gap_ptr[e[i]] : gap_ptr[e[i] + 1]]
+        start = net.gap_ptr[e]
+        fan = net.gap_ptr[e + 1] - start
+        src = np.repeat(np.arange(len(e)), fan)
+        offset = np.arange(len(src)) - np.repeat(np.cumsum(fan) - fan, fan)
+        pos = start[src] + offset
+        e2 = net.gap_next[pos]
+        gap = net.gap_time[pos]
+        t1 = t[src]
+        # 查询按键排序后二分查找（有序查询的访存局部性好得多），再按原顺序放回
+        queries = e2 * KEY_SCALE + t1
+        q = np.argsort(queries)
+        lo = np.empty_like(queries)
+        hi = np.empty_like(queries)
+        lo[q] = np.searchsorted(keys, queries[q], 'left')
+        hi[q] = np.searchsorted(keys, queries[q] + gap[q], 'left')
+        # 展开命中的 (使用, 后继进路上的使用) 对，排除同一车次（通过站的两条进路同时使用）
+        count = hi - lo
+        pair = np.repeat(np.arange(len(src)), count)
+        j = lo[pair] + np.arange(len(pair)) - np.repeat(np.cumsum(count) - count, count)
+        i = src[pair]
+        keep = tid[j] != tid[i]
+        entrance_ids = net.entrance_ids
+        for p, i, j in zip(pair[keep].tolist(), i[keep].tolist(), j[keep].tolist()):
+            report.violations.append(Violation(
+                'headway', int(tid[j]), int(rank[j]), int(t[j]), int(tid[i]), int(rank[i]),
+                entrance_ids[e2[p]],
+                f"进路{entrance_ids[e[i]]}在{t[i]}使用后，进路{entrance_ids[e2[p]]}需间隔{gap[p]}秒"))
+
+    # 股道独占：按 (槽位, 开始) 排序，开始早于同一槽位此前区间的最大结束时刻即相交；瞬时使用查找其所在的区间
+    def _check_tracks(self, report, s, a, b, tid, rank, ps, pt, ptid, prank) -> None:
+        net = self.net
+        report.checked['track'] = len(s) + len(ps)
+        start_keys = s * KEY_SCALE + a
+        order = np.argsort(start_keys, kind='stable')
+        start_keys, s, a, b, tid, rank = start_keys[order], s[order], a[order], b[order], tid[order], rank[order]
+        end_keys = s * KEY_SCALE + b
+        # 同一槽位内结束时刻的前缀最大值及取得该值的区间（槽位偏移保证不跨槽位）
+        cummax = np.maximum.accumulate(end_keys) if len(s) else end_keys
+        holder = np.maximum.accumulate(np.where(end_keys == cummax, np.arange(len(s)), 0)) if len(s) else end_keys
+
+        # 区间与此前区间相交：与取得前缀最大结束时刻的区间冲突
+        later = np.flatnonzero(start_keys[1:] < cummax[:-1]) + 1
+        earlier = holder[later - 1]
+        conflicts = [(later, earlier, a[later], tid[later], rank[later])]
+        # 瞬时使用落在某区间内
+        if len(ps) and len(s):
+            point_keys = ps * KEY_SCALE + pt
+            k = np.searchsorted(start_keys, point_keys, 'right') - 1
+            kk = np.maximum(k, 0)
+            hit = np.flatnonzero((k >= 0) & (cummax[kk] > point_keys) & (s[kk] == ps))
+            owner = holder[kk[hit]]
+            other = tid[owner] != ptid[hit]
+            hit, owner = hit[other], owner[other]
+            conflicts.append((owner, owner, pt[hit], ptid[hit], prank[hit]))
+        track_station, track_names = net.track_station, net.track_names
+        for slot_at, other_at, when, who, where in conflicts:
+            for i, j, t, x, r in zip(slot_at.tolist(), other_at.tolist(), when.tolist(), who.tolist(), where.tolist()):
+                slot = int(s[i])
+                report.violations.append(Violation('track', x, r, t, int(tid[j]), int(rank[j]),
+                                                   (track_station[slot], track_names[slot])))
+
+    # 停站时间：发车 - 到达 在 [最小, 最大] 内
+    def _check_stops(self, report, stops) -> None:
+        report.checked['stop_time'] = len(stops)
+        dwell = stops[:, 1] - stops[:, 0]
+        for i in np.flatnonzero((dwell < stops[:, 2]) | (dwell > stops[:, 3])):
+            arrive, depart, lo, hi, tid, rank = (int(x) for x in stops[i])
+            report.violations.append(Violation('stop_time', tid, rank, arrive,
+                                               detail=f"停站{depart - arrive}秒，范围[{lo}, {hi}]"))
+
+    # 交路：后车始发与前车终到的间隔（对 86400 取模）在连接时间窗内，且在同一股道
+    def _check_exchanges(self, report, x, slot, arr, dep) -> None:
+        net = self.net
+        report.checked['exchange'] = len(x)
+        y = self.succ[x]
+        for i in np.flatnonzero(slot[x] != slot[y]):
+            a, b = int(slot[x[i]]), int(slot[y[i]])
+            report.violations.append(Violation(
+                'exchange_track', int(self.tid_of[y[i]]), 0, int(dep[y[i]]), int(self.tid_of[x[i]]), int(self.rank_of[x[i]]),
+                (net.track_station[a], net.track_names[a]), f"前车终到股道{net.track_names[a]}，后车始发股道{net.track_names[b]}"))
+        gap = (dep[y] - arr[x]) % 86400
+        lo, hi = self.exchange_min[x], self.exchange_max[x]
+        for i in np.flatnonzero((gap < lo) | (gap > hi)):
+            report.violations.append(Violation(
+                'exchange', int(self.tid_of[y[i]]), 0, int(dep[y[i]]), int(self.tid_of[x[i]]), int(self.rank_of[x[i]]),
+                detail=f"接续{int(gap[i])}秒，范围[{int(lo[i])}, {int(hi[i])}]"))
+
+if __name__ == '__main__':
+    from dataloader import TableLoader
+    from scheduler import Scheduler, SchedulerConfig
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default="data")
+    parser.add_argument('--repeat', type=int, default=5, help="重复校验次数（取最短耗时）")
+    args = parser.parse_args()
+
+    loader = TableLoader(args.data)
+    scheduler = Scheduler.from_loader(loader, SchedulerConfig(verbose=False))
+    t = time.perf_counter()
+    scheduler.run()
+    print(f"调度耗时 {time.perf_counter() - t:.3f}s，失败 {len(scheduler.fail_set)}")
+    validator = ScheduleValidator(loader.load(), loader.get('整数索引'))
+    report = min((validator.check(scheduler.res) for _ in range(args.repeat)), key=lambda r: r.seconds)
+    print(report.summary())
+    for v in report.violations[:20]:
+        print(v)